@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import require_role
+from app.db.database import get_db
+from app.models.user import User
+from app.schemas.schemas import AnalyticsDay, Principal, PropertyAnalytics, RoomAnalytics
+from app.services import booking_analytics
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def date_range(
+    start: Optional[date] = Query(None, description="First day (default: 29 days before end)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today)"),
+) -> Tuple[date, date]:
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if (end - start).days + 1 > settings.ANALYTICS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {settings.ANALYTICS_MAX_DAYS} days"
+        )
+    return start, end
+
+
+@router.get("/daily", response_model=List[AnalyticsDay])
+async def get_daily_analytics(
+    days: Tuple[date, date] = Depends(date_range),
+    property_id: Optional[str] = None,
+    room_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role("admin", "property_sales", read_only=True))
+):
+    return await booking_analytics.daily_series(db, *days, property_id=property_id, room_id=room_id)
+
+
+@router.get("/properties", response_model=List[PropertyAnalytics])
+async def get_property_analytics(
+    days: Tuple[date, date] = Depends(date_range),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role("admin", "property_sales", read_only=True))
+):
+    return await booking_analytics.property_totals(db, *days)
+
+
+@router.get("/properties/{property_id}/rooms", response_model=List[RoomAnalytics])
+async def get_room_analytics(
+    property_id: str,
+    days: Tuple[date, date] = Depends(date_range),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role("admin", "property_sales", read_only=True))
+):
+    return await booking_analytics.room_totals(db, property_id, *days)
+
+
+@router.post("/rebuild")
+async def rebuild_analytics(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    rows = await booking_analytics.rebuild_async(db)
+    return {"message": "Analytics rebuilt", "rows": rows}
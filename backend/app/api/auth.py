@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from app.db.database import get_db
@@ -8,9 +9,10 @@ from app.models.user import User
 from app.schemas.schemas import (
     UserCreate, UserResponse, Token, LoginRequest
 )
-from app.core.security import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_user
+from app.core.security import create_access_token, get_current_user, invalidate_principal
+from app.core.passwords import password_hasher
+from app.core.rate_limit import (
+    client_ip, enforce, login_ip_limiter, login_email_limiter, register_ip_limiter
 )
 from app.core.config import settings
 
@@ -18,8 +20,9 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+async def register(request: Request, user: UserCreate, db: AsyncSession = Depends(get_db)):
+    await enforce(register_ip_limiter, client_ip(request))
+    existing_user = await db.scalar(select(User).where(User.email == user.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,36 +31,52 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     
     db_user = User(
         email=user.email,
-        password_hash=get_password_hash(user.password),
+        password_hash=await password_hasher.hash(user.password),
         full_name=user.full_name,
         role=user.role,
         phone=user.phone
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+    email_key = login_data.email.lower()
+    await enforce(login_ip_limiter, client_ip(request))
+    await enforce(login_email_limiter, email_key)
+    
+    user = await db.scalar(select(User).where(User.email == login_data.email))
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await password_hasher.verify(login_data.password, user.password_hash)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
+    await login_email_limiter.reset(email_key)
+    
+    if new_hash:
+        # The stored hash predates the current BCRYPT_ROUNDS; upgrade it now
+        # that we have the plaintext.
+        user.password_hash = new_hash
+        await db.commit()
+        await invalidate_principal(user.id)
     
     access_token = create_access_token(
-        data={"sub": user.id},
+        data={"sub": user.id, "role": user.role},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -1,46 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import date
 import uuid
 import random
 import string
 
 from app.db.database import get_db
-from app.models.user import User, Booking, Room, Property
+from app.models.user import User, Booking, BookingTransition, Room, Property
 from app.schemas.schemas import (
-    BookingResponse, BookingCreate, BookingUpdate
+    BookingResponse, BookingCreate, BookingUpdate, BookingTransitionResponse, Principal
 )
-from app.core.security import get_current_user, require_role
+from app.core.pagination import PageParams, cursor_headers, fetch_page_rows
+from app.core.serialization import RawJSONResponse, response_columns
+from app.services.availability import availability_index, RoomUnavailableError
+from app.services import booking_lifecycle
+from app.services.booking_lifecycle import CANCEL, CONFIRM, IDEMPOTENCY_HEADER, PAY, IdempotencyMismatch
+from app.core.security import get_current_user, get_current_principal, require_role
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
+VOUCHER_ATTEMPTS = 3
+
 
 def generate_voucher_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
 
+def idempotency_key(
+    key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255)
+) -> Optional[str]:
+    return key
+
+
+async def replay(db: AsyncSession, user_id: str, key: Optional[str], scope: str, digest: str) -> Optional[Booking]:
+    if not key:
+        return None
+    try:
+        return await booking_lifecycle.replay(db, user_id, key, scope, digest)
+    except IdempotencyMismatch:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{IDEMPOTENCY_HEADER} was already used for a different request"
+        )
+
+
 @router.get("/", response_model=List[BookingResponse])
-def get_bookings(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_bookings(
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    if current_user.role == "admin":
-        bookings = db.query(Booking).all()
-    elif current_user.role == "property_sales":
-        bookings = db.query(Booking).join(Property).all()
-    else:
-        bookings = db.query(Booking).filter(Booking.user_id == current_user.id).all()
-    return bookings
+    stmt = select(*response_columns(Booking, BookingResponse))
+    if current_user.role == "property_sales":
+        stmt = stmt.join(Property)
+    elif current_user.role != "admin":
+        stmt = stmt.where(Booking.user_id == current_user.id)
+    bookings = await fetch_page_rows(db, stmt, Booking, page, response)
+    return RawJSONResponse(bookings, headers=cursor_headers(response))
 
 
 @router.get("/{booking_id}", response_model=BookingResponse)
-def get_booking(
+async def get_booking(
     booking_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -55,19 +84,58 @@ def get_booking(
     return booking
 
 
+@router.get("/{booking_id}/transitions", response_model=List[BookingTransitionResponse])
+async def get_booking_transitions(
+    booking_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    booking = await db.get(Booking, booking_id)
+    if not booking:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Booking not found"
+        )
+    
+    if current_user.role not in ["admin", "property_sales"] and booking.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this booking"
+        )
+    return list(await db.scalars(
+        select(BookingTransition)
+        .where(BookingTransition.booking_id == booking_id)
+        .order_by(BookingTransition.created_at, BookingTransition.id)
+    ))
+
+
 @router.post("/", response_model=BookingResponse)
-def create_booking(
+async def create_booking(
     booking_data: BookingCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    key: Optional[str] = Depends(idempotency_key)
 ):
-    room = db.query(Room).filter(Room.id == booking_data.room_id).first()
+    # Read before any rollback expires current_user.
+    user_id = current_user.id
+    digest = booking_lifecycle.fingerprint("create", booking_data.model_dump(mode="json"))
+    replayed = await replay(db, user_id, key, "create", digest)
+    if replayed is not None:
+        return replayed
+
+    room = await db.get(Room, booking_data.room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
     
+    if room.property_id != booking_data.property_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Room does not belong to this property"
+        )
+    
     if booking_data.check_in >= booking_data.check_out:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -78,92 +146,165 @@ def create_booking(
     total_amount = float(room.base_rate) * nights
     
     booking = Booking(
-        user_id=current_user.id,
+        user_id=user_id,
         total_amount=total_amount,
         status="pending",
         payment_status="pending",
         **booking_data.model_dump()
     )
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
+    try:
+        async with availability_index.reserve(
+            db, room.id, booking_data.check_in, booking_data.check_out
+        ):
+            await booking_lifecycle.create(db, booking, user_id)
+            if key:
+                booking_lifecycle.remember(db, user_id, key, "create", digest, booking.id)
+            await db.commit()
+    except (RoomUnavailableError, IntegrityError):
+        await db.rollback()
+        # A retry racing the original request finds the room taken by the
+        # booking it is retrying.
+        replayed = await replay(db, user_id, key, "create", digest)
+        if replayed is not None:
+            return replayed
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Room is not available for the selected dates"
+        )
+    await availability_index.booked(booking)
+    await db.refresh(booking)
     return booking
 
 
+@router.post("/complete")
+async def complete_bookings(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    completed = await booking_lifecycle.complete_past(db)
+    return {"message": "Past bookings completed", "completed": completed}
+
+
 @router.put("/{booking_id}/confirm", response_model=BookingResponse)
-def confirm_booking(
+async def confirm_booking(
     booking_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin", "property_sales"))
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if not booking:
+    # Only the request that moves the booking out of pending gets to issue
+    # a voucher; a concurrent confirm finds it confirmed and gets 409.
+    for _ in range(VOUCHER_ATTEMPTS):
+        try:
+            booking = await booking_lifecycle.apply(
+                db, CONFIRM, booking_id, current_user.id, voucher_code=generate_voucher_code()
+            )
+            if booking is None:
+                break
+            await db.commit()
+            return booking
+        except IntegrityError:
+            # The voucher code collided with an existing one.
+            await db.rollback()
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not issue a voucher code, please retry"
+        )
+
+    current = await db.scalar(select(Booking.status).where(Booking.id == booking_id))
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Booking not found"
         )
-    
-    booking.status = "confirmed"
-    booking.voucher_code = generate_voucher_code()
-    db.commit()
-    db.refresh(booking)
-    return booking
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Booking is {current} and cannot be confirmed"
+    )
 
 
 @router.put("/{booking_id}/pay", response_model=BookingResponse)
-def pay_booking(
+async def pay_booking(
     booking_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    key: Optional[str] = Depends(idempotency_key)
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if not booking:
+    digest = booking_lifecycle.fingerprint("pay", {"booking_id": booking_id})
+    replayed = await replay(db, current_user.id, key, "pay", digest)
+    if replayed is not None:
+        return replayed
+
+    booking = await booking_lifecycle.apply(
+        db, PAY, booking_id, current_user.id,
+        Booking.user_id == current_user.id,
+        stripe_payment_id=f"pi_{uuid.uuid4().hex}",
+    )
+    if booking is not None:
+        if key:
+            booking_lifecycle.remember(db, current_user.id, key, "pay", digest, booking.id)
+        await db.commit()
+        return booking
+
+    # The request being retried may have paid the booking meanwhile.
+    replayed = await replay(db, current_user.id, key, "pay", digest)
+    if replayed is not None:
+        return replayed
+    current = (await db.execute(
+        select(Booking.user_id, Booking.status, Booking.payment_status).where(Booking.id == booking_id)
+    )).first()
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Booking not found"
         )
     
-    if booking.user_id != current_user.id:
+    if current.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to pay for this booking"
         )
     
-    if booking.status != "confirmed":
+    if current.status not in PAY.status:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Booking must be confirmed before payment"
         )
-    
-    booking.payment_status = "paid"
-    booking.stripe_payment_id = f"pi_{uuid.uuid4().hex}"
-    db.commit()
-    db.refresh(booking)
-    return booking
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Booking is already {current.payment_status}"
+    )
 
 
 @router.put("/{booking_id}/cancel", response_model=BookingResponse)
-def cancel_booking(
+async def cancel_booking(
     booking_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if not booking:
+    staff = current_user.role in ["admin", "property_sales"]
+    conditions = [] if staff else [Booking.user_id == current_user.id]
+    booking = await booking_lifecycle.apply(db, CANCEL, booking_id, current_user.id, *conditions)
+    if booking is not None:
+        await db.commit()
+        await availability_index.released(booking)
+        return booking
+
+    current = (await db.execute(
+        select(Booking.user_id, Booking.status).where(Booking.id == booking_id)
+    )).first()
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Booking not found"
         )
     
-    if current_user.role not in ["admin", "property_sales"] and booking.user_id != current_user.id:
+    if not staff and current.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to cancel this booking"
         )
-    
-    booking.status = "cancelled"
-    if booking.payment_status == "paid":
-        booking.payment_status = "refunded"
-    db.commit()
-    db.refresh(booking)
-    return booking
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Booking is {current.status} and cannot be cancelled"
+    )
@@ -1,45 +1,47 @@
+import json
+import logging
+import re
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
-from app.models.user import User, Message, Document, Property, Room
+from app.core.config import settings
+from app.db.database import get_db, AsyncSessionLocal
+from app.models.user import User, Message
 from app.schemas.schemas import ChatRequest, ChatResponse
 from app.core.security import get_current_user
+from app.services.knowledge_base import search_documents
+from app.services import property_search
+from app.services.response_cache import response_cache
+from app.services.conversation_context import context_store
+from app.services.escalations import Ticket, escalation_queue
+from app.services.llm import (
+    LLMError, llm_enabled, build_messages, complete_chat, stream_chat_completion
+)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
+logger = logging.getLogger(__name__)
 
+INTERRUPTED = "The assistant's reply was interrupted"
+FAILED = "The assistant could not reply, please try again"
 
-def search_knowledge_base(query: str, db: Session) -> str:
-    documents = db.query(Document).all()
-    if not documents:
-        return ""
-    
-    query_lower = query.lower()
-    for doc in documents:
-        if query_lower in doc.content.lower() or query_lower in doc.title.lower():
-            return doc.content
-    return ""
 
+def search_knowledge_base(query: str, top_k: Optional[int] = None) -> list:
+    return search_documents(query, top_k)
 
-def search_properties(query: str, db: Session) -> list:
-    query_lower = query.lower()
-    properties = db.query(Property).all()
-    results = []
-    
-    for prop in properties:
-        if (query_lower in prop.name.lower() or 
-            query_lower in prop.location.lower() or
-            query_lower in prop.description.lower()):
-            rooms = db.query(Room).filter(Room.property_id == prop.id).all()
-            results.append({
-                "property": prop,
-                "rooms": rooms
-            })
-    return results
-
-
-def generate_ai_response(user_message: str, context: str, properties: list, db: Session) -> tuple:
+
+async def search_properties(query: str, db: AsyncSession) -> list:
+    return [
+        {"property": prop, "rooms": prop.rooms}
+        for prop in await property_search.search_properties(db, query)
+    ]
+
+
+def generate_ai_response(user_message: str, context: str, properties: list, db: AsyncSession) -> tuple:
     needs_escalation = False
     response_parts = []
     
@@ -66,52 +68,236 @@ def generate_ai_response(user_message: str, context: str, properties: list, db:
     return "\n".join(response_parts), needs_escalation
 
 
+def uses_response_cache(history: list) -> bool:
+    # LLM replies depend on earlier turns, so only opening turns are shared
+    # through the response cache; template replies never look at history.
+    return not (history and llm_enabled())
+
+
+def assistant_message(conversation_id: str, user_id: str, content: str, needs_escalation: bool) -> Message:
+    if needs_escalation:
+        return Message(
+            conversation_id=conversation_id,
+            role="assistant",
+            user_id=user_id,
+            content=content,
+            is_escalation=True,
+            escalation_status="pending"
+        )
+    return Message(
+        conversation_id=conversation_id,
+        role="assistant",
+        user_id=user_id,
+        content=content,
+        is_escalation=False
+    )
+
+
+def property_card(prop_data: dict) -> dict:
+    prop = prop_data["property"]
+    return {
+        "id": prop.id,
+        "name": prop.name,
+        "location": prop.location,
+        "description": prop.description,
+        "images": prop.images or [],
+        "rooms": [
+            {"id": room.id, "name": room.name, "base_rate": float(room.base_rate or 0)}
+            for room in prop_data["rooms"]
+        ],
+    }
+
+
+async def record(db: AsyncSession, message: Message) -> None:
+    # Ends the read transaction first, so the connection is back in the pool
+    # while the message writer waits for its batch to commit.
+    await db.commit()
+    await context_store.record(message)
+
+
+async def chat_events(chat_request: ChatRequest, user_id: str) -> AsyncIterator[dict]:
+    # Streaming responses outlive the request-scoped session, so the stream
+    # owns its own.
+    async with AsyncSessionLocal() as db:
+        window = await context_store.load(db, chat_request.conversation_id)
+        history = window.prompt_messages(settings.CONTEXT_TOKEN_BUDGET)
+        await record(db, Message(
+            conversation_id=chat_request.conversation_id,
+            role="user",
+            user_id=user_id,
+            content=chat_request.message
+        ))
+        
+        use_cache = uses_response_cache(history)
+        fingerprint = response_cache.fingerprint()
+        cached = response_cache.get(chat_request.message) if use_cache else None
+        parts = []
+        if cached is not None:
+            needs_escalation = cached["needs_escalation"]
+            yield {"type": "properties", "properties": cached["properties"]}
+            parts.append(cached["response"])
+            yield {"type": "token", "text": cached["response"]}
+        else:
+            passages = await run_in_threadpool(search_knowledge_base, chat_request.message)
+            context = "\n\n".join(p["passage"] for p in passages)
+            properties = await search_properties(chat_request.message, db)
+            # Gives the connection back before the LLM round trip, which can
+            # take seconds; the loaded properties and rooms stay usable.
+            await db.commit()
+            cards = [property_card(p) for p in properties[:3]]
+            yield {"type": "properties", "properties": cards}
+            
+            fallback_text, needs_escalation = generate_ai_response(
+                chat_request.message, context, properties, db
+            )
+            cacheable = True
+            if llm_enabled():
+                try:
+                    async for token in stream_chat_completion(
+                        build_messages(chat_request.message, context, properties, history)
+                    ):
+                        parts.append(token)
+                        yield {"type": "token", "text": token}
+                except LLMError:
+                    cacheable = False
+                    if parts:
+                        # Tokens already sent cannot be replaced with the
+                        # fallback; the partial reply is kept as it stands.
+                        logger.warning("LLM stream failed after %d tokens", len(parts), exc_info=True)
+                        yield {"type": "error", "detail": INTERRUPTED}
+            if not parts:
+                for token in re.findall(r"\S+\s*|\s+", fallback_text):
+                    parts.append(token)
+                    yield {"type": "token", "text": token}
+            if cacheable and use_cache:
+                response_cache.set(chat_request.message, {
+                    "response": "".join(parts),
+                    "needs_escalation": needs_escalation,
+                    "properties": cards,
+                }, fingerprint)
+        
+        message = assistant_message(
+            chat_request.conversation_id, user_id, "".join(parts), needs_escalation
+        )
+        await record(db, message)
+        if needs_escalation:
+            await escalation_queue.add(Ticket.from_message(message, chat_request.message))
+        yield {
+            "type": "done",
+            "conversation_id": chat_request.conversation_id,
+            "message_id": message.id,
+            "needs_escalation": needs_escalation,
+        }
+
+
 @router.post("", response_model=ChatResponse)
-def chat(
+async def chat(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    window = await context_store.load(db, chat_request.conversation_id)
+    history = window.prompt_messages(settings.CONTEXT_TOKEN_BUDGET)
     user_message = Message(
         conversation_id=chat_request.conversation_id,
         role="user",
         user_id=current_user.id,
         content=chat_request.message
     )
-    db.add(user_message)
-    db.commit()
+    await record(db, user_message)
     
-    context = search_knowledge_base(chat_request.message, db)
-    properties = search_properties(chat_request.message, db)
-    
-    response_text, needs_escalation = generate_ai_response(
-        chat_request.message, context, properties, db
-    )
-    
-    if needs_escalation:
-        escalation_message = Message(
-            conversation_id=chat_request.conversation_id,
-            role="assistant",
-            user_id=current_user.id,
-            content=response_text,
-            is_escalation=True,
-            escalation_status="pending"
-        )
-        db.add(escalation_message)
+    use_cache = uses_response_cache(history)
+    fingerprint = response_cache.fingerprint()
+    cached = response_cache.get(chat_request.message) if use_cache else None
+    if cached is not None:
+        response_text, needs_escalation = cached["response"], cached["needs_escalation"]
     else:
-        ai_message = Message(
-            conversation_id=chat_request.conversation_id,
-            role="assistant",
-            user_id=current_user.id,
-            content=response_text,
-            is_escalation=False
+        passages = await run_in_threadpool(search_knowledge_base, chat_request.message)
+        context = "\n\n".join(p["passage"] for p in passages)
+        properties = await search_properties(chat_request.message, db)
+        # Gives the connection back before the LLM round trip.
+        await db.commit()
+        
+        response_text, needs_escalation = generate_ai_response(
+            chat_request.message, context, properties, db
         )
-        db.add(ai_message)
+        cacheable = True
+        if llm_enabled():
+            try:
+                response_text = await complete_chat(
+                    build_messages(chat_request.message, context, properties, history)
+                ) or response_text
+            except LLMError:
+                cacheable = False
+        if cacheable and use_cache:
+            response_cache.set(chat_request.message, {
+                "response": response_text,
+                "needs_escalation": needs_escalation,
+                "properties": [property_card(p) for p in properties[:3]],
+            }, fingerprint)
     
-    db.commit()
+    message = assistant_message(
+        chat_request.conversation_id, current_user.id, response_text, needs_escalation
+    )
+    await record(db, message)
+    if needs_escalation:
+        await escalation_queue.add(Ticket.from_message(message, chat_request.message))
     
     return ChatResponse(
         response=response_text,
         conversation_id=chat_request.conversation_id,
         needs_escalation=needs_escalation
     )
+
+
+@router.post("/stream")
+async def chat_stream(
+    chat_request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    async def event_source():
+        try:
+            async for event in chat_events(chat_request, current_user.id):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception:
+            # The status line is long gone; all that is left is to say so in
+            # the stream before it ends.
+            logger.exception("Chat stream failed")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': FAILED})}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    async with AsyncSessionLocal() as db:
+        try:
+            current_user = await get_current_user(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    user_id = current_user.id
+    
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                chat_request = ChatRequest(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError):
+                await websocket.send_json({"type": "error", "detail": "Invalid chat request"})
+                continue
+            try:
+                async for event in chat_events(chat_request, user_id):
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception:
+                # One failed reply should not end the conversation.
+                logger.exception("Chat reply failed")
+                await websocket.send_json({"type": "error", "detail": FAILED})
+    except WebSocketDisconnect:
+        pass
@@ -1,47 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List
 
 from app.db.database import get_db
 from app.models.user import User, Document
 from app.schemas.schemas import DocumentResponse, DocumentCreate
+from app.core.http_cache import http_cache
+from app.core.pagination import PageParams, cursor_headers, fetch_page_rows
+from app.core.serialization import dumps, response_columns
 from app.core.security import get_current_user, require_role
+from app.services.knowledge_base import announce_document, index_document, unindex_document
+from app.services.response_cache import response_cache
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
-
 @router.get("/", response_model=List[DocumentResponse])
-def get_documents(db: Session = Depends(get_db)):
-    documents = db.query(Document).order_by(Document.created_at.desc()).all()
-    return documents
+async def get_documents(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    key = http_cache.key(request, "documents", response_cache.version("documents"))
+    cached = http_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+    documents = await fetch_page_rows(
+        db, select(*response_columns(Document, DocumentResponse)), Document, page, response
+    )
+    return http_cache.store(request, key, dumps(documents), cursor_headers(response))
 
 
 @router.post("/", response_model=DocumentResponse)
-def create_document(
+async def create_document(
     document_data: DocumentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin"))
 ):
     document = Document(**document_data.model_dump())
     db.add(document)
-    db.commit()
-    db.refresh(document)
+    await db.commit()
+    await db.refresh(document)
+    await run_in_threadpool(index_document, document)
+    await announce_document(document.id)
+    await response_cache.invalidate("documents")
     return document
 
 
 @router.delete("/{document_id}")
-def delete_document(
+async def delete_document(
     document_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin"))
 ):
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found"
         )
     
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.commit()
+    await run_in_threadpool(unindex_document, document_id)
+    await announce_document(document_id)
+    await response_cache.invalidate("documents")
     return {"message": "Document deleted successfully"}
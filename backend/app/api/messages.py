@@ -1,35 +1,50 @@
+import asyncio
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.database import get_db, AsyncSessionLocal
 from app.models.user import User, Message, Document, Property, Room, Booking
 from app.schemas.schemas import (
-    MessageResponse, MessageCreate, ChatRequest, ChatResponse, EscalationUpdate
+    MessageResponse, MessageCreate, ChatRequest, ChatResponse, EscalationUpdate, Principal,
+    EscalationTicket
 )
-from app.core.security import get_current_user, require_role
+from app.core.pagination import PageParams, cursor_headers, fetch_page_rows
+from app.core.serialization import RawJSONResponse, response_columns
+from app.core.security import get_current_user, get_current_principal, require_role
+from app.services.conversation_context import context_store
+from app.services.escalations import EscalationClaimedError, escalation_queue, load_ticket
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
 
 @router.get("/conversations/{conversation_id}", response_model=List[MessageResponse])
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at).all()
-    return messages
+    messages = await fetch_page_rows(
+        db,
+        select(*response_columns(Message, MessageResponse)).where(Message.conversation_id == conversation_id),
+        Message, page, response, descending=False
+    )
+    return RawJSONResponse(messages, headers=cursor_headers(response))
 
 
 @router.post("/conversations/{conversation_id}", response_model=MessageResponse)
-def create_message(
+async def create_message(
     conversation_id: str,
     message_data: MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     message = Message(
@@ -38,39 +53,55 @@ def create_message(
         user_id=current_user.id,
         **message_data.model_dump()
     )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
+    # Nothing to write here; ending the transaction frees the connection
+    # while the message writer waits for its batch.
+    await db.commit()
+    await context_store.record(message)
     return message
 
 
 @router.get("/escalations", response_model=List[MessageResponse])
-def get_escalations(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("admin"))
+async def get_escalations(
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role("admin", read_only=True))
 ):
-    messages = db.query(Message).filter(
-        Message.is_escalation == True
-    ).order_by(Message.created_at.desc()).all()
-    return messages
+    messages = await fetch_page_rows(
+        db,
+        select(*response_columns(Message, MessageResponse)).where(Message.is_escalation == True),
+        Message, page, response
+    )
+    return RawJSONResponse(messages, headers=cursor_headers(response))
 
 
 @router.put("/escalations/{message_id}", response_model=MessageResponse)
-def respond_to_escalation(
+async def respond_to_escalation(
     message_id: str,
     escalation_data: EscalationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin"))
 ):
-    message = db.query(Message).filter(Message.id == message_id).first()
-    if not message:
+    message = await db.get(Message, message_id)
+    if not message or not message.is_escalation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Escalation not found"
         )
+    # Answering takes the claim (or keeps the one already held), so two
+    # admins can never both answer the same ticket.
+    ticket = None
+    if message.escalation_status == "pending":
+        ticket = await claim_pending(db, message, current_user.id)
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Escalation was already resolved"
+        )
     
     message.admin_response = escalation_data.admin_response
     message.escalation_status = escalation_data.status
+    await db.commit()
     
     response_message = Message(
         conversation_id=message.conversation_id,
@@ -79,7 +110,117 @@ def respond_to_escalation(
         is_escalation=False,
         escalation_status="resolved"
     )
-    db.add(response_message)
-    db.commit()
-    db.refresh(message)
+    await context_store.record(response_message)
+    if message.escalation_status != "pending":
+        await escalation_queue.resolve(message_id, current_user.id)
     return message
+
+
+async def claim_pending(db: AsyncSession, message: Message, admin_id: str):
+    # Returns None only when another worker already resolved the ticket.
+    missing = None
+    if escalation_queue.get(message.id) is None:
+        missing = await load_ticket(db, message)
+    try:
+        return await escalation_queue.claim(message.id, admin_id, missing)
+    except EscalationClaimedError as exc:
+        raise claimed_conflict(exc)
+
+
+def claimed_conflict(exc: EscalationClaimedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "Escalation is being handled by another admin",
+            "claimed_by": exc.ticket.claimed_by,
+            "lease_expires_at": exc.ticket.lease_expires_at.isoformat(),
+        }
+    )
+
+
+@router.get("/escalations/queue", response_model=List[EscalationTicket])
+async def get_escalation_queue(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: Principal = Depends(require_role("admin", read_only=True))
+):
+    return [ticket.as_dict() for ticket in escalation_queue.pending(limit)]
+
+
+@router.post("/escalations/{message_id}/claim", response_model=EscalationTicket)
+async def claim_escalation(
+    message_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    message = await db.get(Message, message_id)
+    ticket = None
+    if message is not None and message.is_escalation and message.escalation_status == "pending":
+        ticket = await claim_pending(db, message, current_user.id)
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Escalation not found or already resolved"
+        )
+    return ticket.as_dict()
+
+
+@router.post("/escalations/{message_id}/release", response_model=EscalationTicket)
+async def release_escalation(
+    message_id: str,
+    current_user: User = Depends(require_role("admin"))
+):
+    try:
+        ticket = await escalation_queue.release(message_id, current_user.id)
+    except EscalationClaimedError as exc:
+        raise claimed_conflict(exc)
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Escalation not found or already resolved"
+        )
+    return ticket.as_dict()
+
+
+@router.get("/escalations/stream")
+async def escalation_stream(
+    current_user: Principal = Depends(require_role("admin", read_only=True))
+):
+    async def event_source():
+        async for event in escalation_queue.feed(settings.ESCALATION_FEED_HEARTBEAT):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/escalations/ws")
+async def escalation_websocket(websocket: WebSocket, token: str = Query(...)):
+    async with AsyncSessionLocal() as db:
+        try:
+            current_user = await get_current_user(token, db)
+        except HTTPException:
+            current_user = None
+    if current_user is None or current_user.role != "admin":
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    
+    async def push_events():
+        async with aclosing(escalation_queue.feed(settings.ESCALATION_FEED_HEARTBEAT)) as feed:
+            async for event in feed:
+                await websocket.send_json(event)
+    
+    # The feed is push-only; reading lets a closed dashboard unsubscribe
+    # immediately instead of at the next heartbeat.
+    pusher = asyncio.create_task(push_events())
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
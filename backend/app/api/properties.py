@@ -1,114 +1,193 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date
 
 from app.db.database import get_db
 from app.models.user import User
 from app.schemas.schemas import (
     PropertyResponse, PropertyCreate, PropertyUpdate,
-    RoomResponse, RoomCreate, RoomUpdate
+    RoomResponse, RoomCreate, RoomUpdate, InventoryImportReport
 )
+from app.core.concurrency import compare_and_swap, if_match_version, version_conflict
+from app.core.http_cache import http_cache
+from app.core.pagination import PageParams, cursor_headers, fetch_page_rows
+from app.core.serialization import dumps, response_columns, serialize
+from app.services.availability import available_rooms
+from app.services import inventory
+from app.services.response_cache import response_cache
 from app.core.security import get_current_user, require_role
 
 router = APIRouter(prefix="/properties", tags=["Properties"])
 
+property_detail = TypeAdapter(PropertyResponse)
+
 
 @router.get("/", response_model=List[PropertyResponse])
-def get_properties(db: Session = Depends(get_db)):
-    properties = db.query(User).filter(
-        User.__table__.c.id != None
-    ).all()
+async def get_properties(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
     from app.models.user import Property
-    properties = db.query(Property).all()
-    return properties
+    key = http_cache.key(request, "catalog", response_cache.version("catalog"))
+    cached = http_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+    properties = await fetch_page_rows(
+        db, select(*response_columns(Property, PropertyResponse)), Property, page, response
+    )
+    return http_cache.store(request, key, dumps(properties), cursor_headers(response))
+
+
+@router.get("/export")
+async def export_properties(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(require_role("admin", "property_sales", read_only=True))
+):
+    return StreamingResponse(
+        inventory.export_inventory(format),
+        media_type=inventory.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="inventory.{format}"'},
+    )
+
+
+@router.post("/import", response_model=InventoryImportReport)
+async def import_properties(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_role("admin", "property_sales"))
+):
+    format = format or inventory.format_for(request.headers.get("content-type"))
+    report = await inventory.import_inventory(db, inventory.iter_records(request.stream(), format))
+    if report.properties_created or report.rooms_created:
+        await response_cache.invalidate("catalog")
+    return report.as_dict()
 
 
 @router.get("/{property_id}", response_model=PropertyResponse)
-def get_property(property_id: str, db: Session = Depends(get_db)):
+async def get_property(property_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     from app.models.user import Property
-    property = db.query(Property).filter(Property.id == property_id).first()
+    key = http_cache.key(request, "catalog", response_cache.version("catalog"))
+    cached = http_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+    property = await db.get(Property, property_id)
     if not property:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Property not found"
         )
-    return property
+    return http_cache.store(request, key, serialize(property_detail, property))
 
 
 @router.post("/", response_model=PropertyResponse)
-def create_property(
+async def create_property(
     property_data: PropertyCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin", "property_sales"))
 ):
     from app.models.user import Property
     property = Property(**property_data.model_dump())
     db.add(property)
-    db.commit()
-    db.refresh(property)
+    await db.commit()
+    await response_cache.invalidate("catalog")
+    await db.refresh(property)
     return property
 
 
 @router.put("/{property_id}", response_model=PropertyResponse)
-def update_property(
+async def update_property(
     property_id: str,
     property_data: PropertyUpdate,
-    db: Session = Depends(get_db),
+    if_match: Optional[int] = Depends(if_match_version),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin", "property_sales"))
 ):
     from app.models.user import Property
-    property = db.query(Property).filter(Property.id == property_id).first()
-    if not property:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
+    values = {
+        key: value for key, value in property_data.model_dump(exclude={"version"}).items() if value is not None
+    }
+    expected = property_data.version if property_data.version is not None else if_match
+    property = await compare_and_swap(db, Property, property_id, values, expected_version=expected)
+    if property is None:
+        current = await db.scalar(select(Property.version).where(Property.id == property_id))
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Property not found"
+            )
+        raise version_conflict("Property", current)
     
-    for key, value in property_data.model_dump().items():
-        if value is not None:
-            setattr(property, key, value)
-    
-    db.commit()
-    db.refresh(property)
+    await db.commit()
+    await response_cache.invalidate("catalog")
     return property
 
 
 @router.delete("/{property_id}")
-def delete_property(
+async def delete_property(
     property_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin"))
 ):
     from app.models.user import Property
-    property = db.query(Property).filter(Property.id == property_id).first()
+    property = await db.get(Property, property_id)
     if not property:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Property not found"
         )
     
-    db.delete(property)
-    db.commit()
+    await db.delete(property)
+    await db.commit()
+    await response_cache.invalidate("catalog")
     return {"message": "Property deleted successfully"}
 
 
 @router.get("/{property_id}/rooms", response_model=List[RoomResponse])
-def get_rooms(property_id: str, db: Session = Depends(get_db)):
+async def get_rooms(property_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     from app.models.user import Room
-    rooms = db.query(Room).filter(Room.property_id == property_id).all()
-    return rooms
+    key = http_cache.key(request, "catalog", response_cache.version("catalog"))
+    cached = http_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+    rooms = (await db.execute(
+        select(*response_columns(Room, RoomResponse)).where(Room.property_id == property_id)
+    )).mappings().all()
+    return http_cache.store(request, key, dumps([dict(room) for room in rooms]))
+
+
+@router.get("/{property_id}/availability", response_model=List[RoomResponse])
+async def get_available_rooms(
+    property_id: str,
+    check_in: date,
+    check_out: date,
+    guests: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    if check_in >= check_out:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Check-out date must be after check-in date"
+        )
+    return await available_rooms(db, property_id, check_in, check_out, guests)
 
 
 @router.post("/{property_id}/rooms", response_model=RoomResponse)
-def create_room(
+async def create_room(
     property_id: str,
     room_data: RoomCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin", "property_sales"))
 ):
     from app.models.user import Property, Room
     
-    property = db.query(Property).filter(Property.id == property_id).first()
+    property = await db.get(Property, property_id)
     if not property:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -117,49 +196,53 @@ def create_room(
     
     room = Room(property_id=property_id, **room_data.model_dump())
     db.add(room)
-    db.commit()
-    db.refresh(room)
+    await db.commit()
+    await response_cache.invalidate("catalog")
+    await db.refresh(room)
     return room
 
 
 @router.put("/rooms/{room_id}", response_model=RoomResponse)
-def update_room(
+async def update_room(
     room_id: str,
     room_data: RoomUpdate,
-    db: Session = Depends(get_db),
+    if_match: Optional[int] = Depends(if_match_version),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin", "property_sales"))
 ):
     from app.models.user import Room
-    room = db.query(Room).filter(Room.id == room_id).first()
-    if not room:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
-    
-    for key, value in room_data.model_dump().items():
-        if value is not None:
-            setattr(room, key, value)
+    values = {key: value for key, value in room_data.model_dump(exclude={"version"}).items() if value is not None}
+    expected = room_data.version if room_data.version is not None else if_match
+    room = await compare_and_swap(db, Room, room_id, values, expected_version=expected)
+    if room is None:
+        current = await db.scalar(select(Room.version).where(Room.id == room_id))
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Room not found"
+            )
+        raise version_conflict("Room", current)
     
-    db.commit()
-    db.refresh(room)
+    await db.commit()
+    await response_cache.invalidate("catalog")
     return room
 
 
 @router.delete("/rooms/{room_id}")
-def delete_room(
+async def delete_room(
     room_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_role("admin"))
 ):
     from app.models.user import Room
-    room = db.query(Room).filter(Room.id == room_id).first()
+    room = await db.get(Room, room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
     
-    db.delete(room)
-    db.commit()
+    await db.delete(room)
+    await db.commit()
+    await response_cache.invalidate("catalog")
     return {"message": "Room deleted successfully"}
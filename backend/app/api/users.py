@@ -1,36 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from app.db.database import get_db
 from app.models.user import User
-from app.schemas.schemas import UserResponse, UserUpdate
-from app.core.security import get_current_user, require_role
+from app.schemas.schemas import UserResponse, UserUpdate, Principal
+from app.core.pagination import PageParams, fetch_page
+from app.core.security import (
+    get_current_user, get_current_principal, require_role, invalidate_principal
+)
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("admin"))
+async def get_users(
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role("admin", read_only=True))
 ):
-    users = db.query(User).all()
+    users = await fetch_page(db, select(User), User, page, response)
     return users
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if current_user.id != user_id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this user"
         )
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,10 +46,10 @@ def get_user(
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: str,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.id != user_id and current_user.role != "admin":
@@ -52,7 +58,7 @@ def update_user(
             detail="Not authorized to update this user"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,6 +70,7 @@ def update_user(
     if user_update.phone is not None:
         user.phone = user_update.phone
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await invalidate_principal(user.id)
+    await db.refresh(user)
     return user
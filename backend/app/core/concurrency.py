@@ -0,0 +1,45 @@
+from typing import Any, Dict, Optional
+
+from fastapi import Header, HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def compare_and_swap(
+    db: AsyncSession,
+    model,
+    row_id: str,
+    values: Dict[str, Any],
+    *conditions,
+    expected_version: Optional[int] = None,
+):
+    # One UPDATE ... RETURNING that only touches the row while it still
+    # matches `conditions` (and the version the caller read), bumping the
+    # version so anyone holding the old one fails in turn. Returns None when
+    # nothing matched; the caller decides whether that is 404, 403 or 409.
+    stmt = update(model).where(model.id == row_id, *conditions)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    stmt = stmt.values(**values, version=model.version + 1).returning(model)
+    return await db.scalar(stmt)
+
+
+def version_conflict(name: str, current_version: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"{name} was changed by another request (now at version {current_version})"
+    )
+
+
+def if_match_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    # If-Match: "<version>" is the header form of an update's `version`;
+    # "*" (or no header) asks for no check.
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='If-Match must be a quoted version number, e.g. "3"'
+        )
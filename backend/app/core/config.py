@@ -8,14 +8,102 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     
     DATABASE_URL: str = "sqlite:///./travelmate.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER_MODE: bool = False
+    SLOW_QUERY_MS: float = 200
+    N_PLUS_ONE_THRESHOLD: int = 5
+    SERVER_TIMING: bool = False
+    
+    WEB_BIND: str = "0.0.0.0:8000"
+    # 0 starts one worker per CPU core.
+    WEB_CONCURRENCY: int = 0
+    WEB_TIMEOUT: int = 120
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    WEB_KEEPALIVE: int = 5
+    WEB_MAX_REQUESTS: int = 0
+    WEB_MAX_REQUESTS_JITTER: int = 0
+    # Migrations and index builds; gunicorn.conf.py turns this off for the
+    # workers after running them once in a child of the master.
+    PREPARE_ON_STARTUP: bool = True
+    COORDINATION_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_PREFIX: str = "travelagent:"
+    COORDINATION_MAX_KEYS: int = 100000
     
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 60
+    AUTH_TRUST_TOKEN_ROLE: bool = False
+    
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5
+    LOGIN_RATE_LIMIT_PER_IP: int = 30
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 10
+    REGISTER_RATE_LIMIT_PER_IP: int = 10
+    LOGIN_RATE_WINDOW: float = 60
+    # Off unless the backend is only reachable through the proxies listed in
+    # TRUSTED_PROXIES (comma-separated addresses or networks).
+    TRUST_PROXY_HEADERS: bool = False
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
     
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    LLM_TIMEOUT: float = 60
+    LLM_CONNECT_TIMEOUT: float = 5
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BACKOFF: float = 0.5
     STRIPE_API_KEY: Optional[str] = None
     
+    KNOWLEDGE_INDEX_PATH: Optional[str] = "./knowledge_index.json"
+    KNOWLEDGE_TOP_K: int = 3
+    KNOWLEDGE_PERSIST_DELAY: float = 5
+    VECTOR_SEARCH_ENABLED: bool = True
+    VECTOR_INDEX_PATH: Optional[str] = "./knowledge_vectors"
+    VECTOR_NPROBE: int = 8
+    EMBEDDING_BACKEND: str = "hashing"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIM: int = 384
+    HYBRID_LEXICAL_WEIGHT: float = 0.6
+    HYBRID_MIN_SCORE: float = 0.15
+    PROPERTY_SEARCH_LIMIT: int = 5
+    CHAT_CACHE_SIZE: int = 2048
+    CHAT_CACHE_TTL: float = 600
+    CHAT_CACHE_SEMANTIC: bool = False
+    CHAT_CACHE_SIMILARITY: float = 0.92
+    HTTP_CACHE_SIZE: int = 512
+    HTTP_CACHE_TTL: float = 30
+    # Browsers revalidate every time (a cheap 304); nginx may reuse a
+    # response for a few seconds.
+    HTTP_CACHE_CONTROL: str = "public, max-age=0, s-maxage=5, stale-while-revalidate=30"
+    CONTEXT_MAX_TURNS: int = 12
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_SUMMARY_TOKENS: int = 300
+    CONTEXT_CACHE_SIZE: int = 1024
+    MESSAGE_WRITE_MODE: str = "group"
+    MESSAGE_WRITE_BATCH_SIZE: int = 200
+    MESSAGE_WRITE_FLUSH_INTERVAL: float = 0.01
+    MESSAGE_WRITE_QUEUE_SIZE: int = 10000
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 500
+    ANALYTICS_MAX_DAYS: int = 366
+    INVENTORY_BATCH_SIZE: int = 1000
+    INVENTORY_MAX_ERRORS: int = 1000
+    AVAILABILITY_CACHE_TTL: float = 30
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    ESCALATION_LEASE_SECONDS: float = 300
+    ESCALATION_FEED_BUFFER: int = 100
+    ESCALATION_FEED_HEARTBEAT: float = 20
+    
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+import weakref
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.serialization import dumps
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import LockError
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("memory", "redis")
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class LockTimeout(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"Timed out waiting for lock {name}")
+        self.name = name
+
+
+class CoordinationBackend:
+    # State every worker process must agree on: small string values with
+    # optional TTLs, counters, sliding-window rate limits, named locks and
+    # pub/sub channels. A worker applies its own changes locally before
+    # publishing them, so messages are delivered to the other workers only.
+    shared = False
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._on_connect: List[Callable[[], Awaitable[None]]] = []
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_connect(self, callback: Callable[[], Awaitable[None]]) -> None:
+        # Runs on startup and after every reconnect, when messages may have
+        # been missed: the place to reload state from shared values.
+        self._on_connect.append(callback)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self._send(channel, dumps({"origin": self.worker_id, "message": message}))
+
+    async def start(self) -> None:
+        # Ids are assigned here rather than at import: workers forked from a
+        # gunicorn master would otherwise share one.
+        self.worker_id = uuid.uuid4().hex
+        await self._connected()
+
+    async def close(self) -> None:
+        pass
+
+    async def _connected(self) -> None:
+        for callback in self._on_connect:
+            try:
+                await callback()
+            except Exception:
+                logger.exception("Coordination resync failed")
+
+    async def _deliver(self, channel: str, data) -> None:
+        envelope = json.loads(data)
+        if envelope["origin"] == self.worker_id:
+            return
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(envelope["message"])
+            except Exception:
+                logger.exception("Coordination handler for %s failed", channel)
+
+    async def _send(self, channel: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        # Records an attempt; returns seconds to wait if the key is over its limit.
+        raise NotImplementedError
+
+    def lock(self, name: str, timeout: float = 10.0):
+        raise NotImplementedError
+
+
+class MemoryBroker:
+    # What Redis holds, kept in one process. Backends sharing a broker behave
+    # like workers sharing a Redis server.
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.values = TTLCache(maxsize=max_keys, ttl=float("inf"))
+        self.windows: "OrderedDict[str, deque]" = OrderedDict()
+        self.locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.backends: "weakref.WeakSet[MemoryBackend]" = weakref.WeakSet()
+
+
+class MemoryBackend(CoordinationBackend):
+    # Single-process deployments and tests.
+    def __init__(self, broker: Optional[MemoryBroker] = None):
+        super().__init__()
+        self.broker = broker or MemoryBroker(settings.COORDINATION_MAX_KEYS)
+        self.broker.backends.add(self)
+
+    async def _send(self, channel: str, data: bytes) -> None:
+        for backend in list(self.broker.backends):
+            await backend._deliver(channel, data)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.broker.values.get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.broker.values.set(key, value, float("inf") if ttl is None else ttl)
+
+    async def delete(self, key: str) -> None:
+        self.broker.values.delete(key)
+        self.broker.windows.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self.broker.values.get(key) or 0) + 1
+        self.broker.values.set(key, str(value))
+        return value
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        now = time.monotonic()
+        windows = self.broker.windows
+        hits = windows.get(key)
+        if hits is None:
+            hits = windows[key] = deque()
+        windows.move_to_end(key)
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return hits[0] + window - now
+        hits.append(now)
+        # Keys are LRU-bounded so a flood of distinct keys cannot grow
+        # memory without limit.
+        while len(windows) > self.broker.max_keys:
+            windows.popitem(last=False)
+        return None
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float = 10.0) -> AsyncIterator[None]:
+        lock = self.broker.locks.get(name)
+        if lock is None:
+            lock = self.broker.locks[name] = asyncio.Lock()
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise LockTimeout(name)
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+# Sliding-window log in a sorted set, timed by the Redis clock so workers
+# on different hosts agree.
+RATE_LIMIT_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local window = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return tostring(tonumber(oldest[2]) + window - now)
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return false
+"""
+
+
+class RedisBackend(CoordinationBackend):
+    shared = True
+
+    def __init__(self, url: str, prefix: str):
+        if aioredis is None:
+            raise RuntimeError("COORDINATION_BACKEND=redis requires the redis package")
+        super().__init__()
+        self.prefix = prefix
+        # Connections are opened lazily, inside each worker's event loop.
+        self._client = aioredis.from_url(url, decode_responses=True)
+        self._rate_limit = self._client.register_script(RATE_LIMIT_SCRIPT)
+        self._listener: Optional[asyncio.Task] = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def start(self) -> None:
+        self.worker_id = uuid.uuid4().hex
+        if self._handlers:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        else:
+            await self._connected()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._client.aclose()
+
+    async def _listen(self) -> None:
+        channels = [self._key(channel) for channel in self._handlers]
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(*channels)
+                await self._connected()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._deliver(message["channel"][len(self.prefix):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the coordination channel; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+    async def _send(self, channel: str, data: bytes) -> None:
+        await self._client.publish(self._key(channel), data)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self._key(key))
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self._client.set(self._key(key), value, px=None if ttl is None else max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self._key(key))
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self._key(key))
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        retry_after = await self._rate_limit(keys=[self._key(key)], args=[window, limit, uuid.uuid4().hex])
+        return float(retry_after) if retry_after is not None else None
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float = 10.0) -> AsyncIterator[None]:
+        # timeout bounds both the wait and how long a crashed holder keeps it.
+        lock = self._client.lock(self._key(f"lock:{name}"), timeout=timeout, blocking_timeout=timeout)
+        if not await lock.acquire():
+            raise LockTimeout(name)
+        try:
+            yield
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                # Held past its timeout and already taken over.
+                pass
+
+
+def create_backend() -> CoordinationBackend:
+    if settings.COORDINATION_BACKEND not in BACKENDS:
+        raise ValueError(f"COORDINATION_BACKEND must be one of {', '.join(BACKENDS)}")
+    if settings.COORDINATION_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL, settings.REDIS_PREFIX)
+    return MemoryBackend()
+
+
+coordination = create_backend()
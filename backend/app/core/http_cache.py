@@ -0,0 +1,87 @@
+import hashlib
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import registry
+
+cache_lookups = registry.counter(
+    "http_cache_lookups_total",
+    "Cached GET lookups by result (not_modified, hit, miss)",
+    ["result"],
+)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def make_etag(version: str, body: bytes) -> str:
+    return f'"{version}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: a W/ prefix is ignored.
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class HTTPCache:
+    # Serialized GET responses keyed by request and the version of the data
+    # they were built from. Writes bump the version, so a stale entry is
+    # never matched again; the TTL bounds staleness for writes made outside
+    # the API, and for version messages a worker missed.
+    def __init__(self, maxsize: int, ttl: float, cache_control: str):
+        self.cache_control = cache_control
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, request: Request, scope: str, version: str) -> Hashable:
+        return (scope, version, request.url.path, str(request.query_params))
+
+    def lookup(self, request: Request, key: Hashable) -> Optional[Response]:
+        entry: Optional[CachedResponse] = self._entries.get(key)
+        if entry is None:
+            cache_lookups.inc(result="miss")
+            return None
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            cache_lookups.inc(result="not_modified")
+            return self._not_modified(entry.etag)
+        cache_lookups.inc(result="hit")
+        return self._response(entry)
+
+    def store(
+        self,
+        request: Request,
+        key: Hashable,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        entry = CachedResponse(body, make_etag(key[1], body), dict(headers or {}))
+        self._entries.set(key, entry)
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return self._not_modified(entry.etag)
+        return self._response(entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _response(self, entry: CachedResponse) -> Response:
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": self.cache_control}
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def _not_modified(self, etag: str) -> Response:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": self.cache_control})
+
+
+http_cache = HTTPCache(
+    maxsize=settings.HTTP_CACHE_SIZE,
+    ttl=settings.HTTP_CACHE_TTL,
+    cache_control=settings.HTTP_CACHE_CONTROL,
+)
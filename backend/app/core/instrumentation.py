@@ -0,0 +1,153 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter as TallyCounter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+slow_query_logger = logging.getLogger("app.sql.slow")
+n_plus_one_logger = logging.getLogger("app.sql.n_plus_one")
+
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+)\s*,?)+\)")
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time until the response started, by route", ["method", "route", "status"]
+)
+request_db_time = registry.histogram(
+    "http_request_db_seconds", "Database time spent per request", ["route"]
+)
+request_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per request", ["route"], buckets=STATEMENT_BUCKETS
+)
+query_duration = registry.histogram("db_query_duration_seconds", "Duration of individual SQL statements")
+slow_queries = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["route"])
+failed_queries = registry.counter("db_query_errors_total", "Statements the database rejected", ["route"])
+n_plus_one = registry.counter(
+    "db_n_plus_one_total", "Requests that repeated one statement at least N_PLUS_ONE_THRESHOLD times", ["route"]
+)
+
+
+class RequestStats:
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes: TallyCounter = TallyCounter()
+
+    @property
+    def route(self) -> str:
+        # The router records the matched route in the scope before the
+        # handler runs.
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def statement_shape(statement: str) -> str:
+    # Expanded IN lists differ in length between otherwise identical queries.
+    return IN_LIST_RE.sub("(...)", statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Kept on the execution context, which is discarded with the statement
+    # whether it succeeds or raises.
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    _record(statement, time.perf_counter() - context._query_start, failed=False)
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute never runs for a statement that raises.
+    started = getattr(exception_context.execution_context, "_query_start", None)
+    if started is not None:
+        _record(exception_context.statement, time.perf_counter() - started, failed=True)
+
+
+def _record(statement: str, elapsed: float, failed: bool) -> None:
+    query_duration.observe(elapsed)
+    stats = current_request.get()
+    route = stats.route if stats is not None else "background"
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        stats.shapes[statement_shape(statement)] += 1
+    if failed:
+        failed_queries.inc(route=route)
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.inc(route=route)
+        slow_query_logger.warning(
+            "%.1f ms on %s%s: %s", elapsed * 1000, route, " (failed)" if failed else "",
+            " ".join(statement.split())[:1000],
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _report_repeats(stats: RequestStats) -> None:
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if not threshold:
+        return
+    repeated = [(shape, count) for shape, count in stats.shapes.items() if count >= threshold]
+    if repeated:
+        n_plus_one.inc(route=stats.route)
+        for shape, count in repeated:
+            n_plus_one_logger.warning(
+                "Possible N+1 on %s: statement ran %d times: %s", stats.route, count, " ".join(shape.split())[:500]
+            )
+
+
+class InstrumentationMiddleware:
+    # Pure ASGI so streaming responses pass through untouched. Handler time
+    # is measured to the start of the response, which is also where the
+    # Server-Timing header has to be written.
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                request_duration.observe(elapsed, method=scope["method"], route=stats.route, status=message["status"])
+                if settings.SERVER_TIMING:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries", '
+                        f"app;dur={elapsed * 1000:.1f}",
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            request_db_time.observe(stats.db_time, route=stats.route)
+            request_statements.observe(stats.statements, route=stats.route)
+            _report_repeats(stats)
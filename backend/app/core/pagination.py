@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+        limit: Optional[int] = Query(None, ge=1, description="Page size"),
+    ):
+        self.cursor = cursor
+        self.limit = min(limit or settings.PAGE_SIZE_DEFAULT, settings.PAGE_SIZE_MAX)
+
+
+def page_statement(
+    stmt: Select, model, limit: int, cursor: Optional[str] = None, descending: bool = True
+) -> Select:
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor))
+        stmt = stmt.where(key < after if descending else key > after)
+    if descending:
+        stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        stmt = stmt.order_by(model.created_at, model.id)
+    return stmt.limit(limit)
+
+
+def cursor_headers(response: Response) -> Dict[str, str]:
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+
+
+async def fetch_page(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    page: PageParams,
+    response: Response,
+    descending: bool = True,
+) -> List:
+    stmt = page_statement(stmt, model, page.limit + 1, page.cursor, descending)
+    rows = (await db.scalars(stmt)).all()
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows
+
+
+async def fetch_page_rows(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    page: PageParams,
+    response: Response,
+    descending: bool = True,
+) -> List[dict]:
+    # fetch_page for column selects (which must include created_at and id):
+    # returns plain dicts instead of ORM instances.
+    stmt = page_statement(stmt, model, page.limit + 1, page.cursor, descending)
+    rows = (await db.execute(stmt)).mappings().all()
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
+    return [dict(row) for row in rows]
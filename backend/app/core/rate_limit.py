@@ -0,0 +1,72 @@
+import ipaddress
+from typing import List, Optional, Union
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.coordination import coordination
+
+
+class RateLimiter:
+    # Sliding-window log per key, kept in the coordination backend so every
+    # worker counts against the same limit.
+    def __init__(self, name: str, limit: int, window: float):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _key(self, key: str) -> str:
+        return f"rate:{self.name}:{key}"
+
+    async def hit(self, key: str) -> Optional[float]:
+        # Records an attempt; returns seconds to wait if the key is over its limit.
+        if self.limit <= 0:
+            return None
+        return await coordination.hit(self._key(key), self.limit, self.window)
+
+    async def reset(self, key: str) -> None:
+        await coordination.delete(self._key(key))
+
+
+def parse_networks(spec: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+trusted_proxies = parse_networks(settings.TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    if not settings.TRUST_PROXY_HEADERS or not is_trusted_proxy(peer):
+        return peer
+    # Every proxy appends the address it received the request from, so the
+    # client is the rightmost hop that is not one of ours; anything further
+    # left was sent by the client and can be anything.
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+async def enforce(limiter: RateLimiter, key: str) -> None:
+    retry_after = await limiter.hit(key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+login_ip_limiter = RateLimiter("login_ip", settings.LOGIN_RATE_LIMIT_PER_IP, settings.LOGIN_RATE_WINDOW)
+login_email_limiter = RateLimiter("login_email", settings.LOGIN_RATE_LIMIT_PER_EMAIL, settings.LOGIN_RATE_WINDOW)
+register_ip_limiter = RateLimiter("register_ip", settings.REGISTER_RATE_LIMIT_PER_IP, settings.LOGIN_RATE_WINDOW)
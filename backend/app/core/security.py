@@ -1,25 +1,22 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.coordination import coordination
 from app.db.database import get_db
 from app.models.user import User
+from app.schemas.schemas import Principal
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
 
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+PRINCIPAL_FIELDS = ("id", "email", "full_name", "role", "phone", "created_at", "updated_at")
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+PRINCIPAL_CHANNEL = "principals"
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -41,15 +38,31 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+async def invalidate_principal(user_id: str) -> None:
+    principal_cache.delete(user_id)
+    await coordination.publish(PRINCIPAL_CHANNEL, {"user_id": user_id})
+
+
+async def _principal_changed(message: dict) -> None:
+    principal_cache.delete(message["user_id"])
+
+
+coordination.subscribe(PRINCIPAL_CHANNEL, _principal_changed)
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    credentials_exception = _credentials_exception()
     
     payload = decode_token(token)
     if payload is None:
@@ -59,21 +72,44 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Cached principals are handed out as fresh transient User instances so
+    # that no ORM object is shared between concurrent requests.
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return User(**cached)
+    
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
     
+    principal_cache.set(user_id, {field: getattr(user, field) for field in PRINCIPAL_FIELDS})
     return user
 
 
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    if settings.AUTH_TRUST_TOKEN_ROLE:
+        payload = decode_token(token)
+        if payload is None or payload.get("sub") is None:
+            raise _credentials_exception()
+        if payload.get("role"):
+            return Principal(id=payload["sub"], role=payload["role"])
+    user = await get_current_user(token, db)
+    return Principal(id=user.id, role=user.role)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
     return current_user
 
 
-def require_role(*roles: str):
-    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
+def require_role(*roles: str, read_only: bool = False):
+    dependency = get_current_principal if read_only else get_current_user
+
+    async def role_checker(current_user: User = Depends(dependency)) -> User:
         if current_user.role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
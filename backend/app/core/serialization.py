@@ -0,0 +1,46 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def serialize(adapter: TypeAdapter, rows) -> bytes:
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def response_columns(model, schema: Type[BaseModel]) -> List:
+    # The model columns behind a response schema, in the schema's field
+    # order, so rows selected with them dump to the same JSON the schema
+    # would produce.
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+class RawJSONResponse(Response):
+    # For plain rows selected with response_columns: encoded as they are,
+    # skipping per-row model validation.
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
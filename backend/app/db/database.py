@@ -1,20 +1,52 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.pool import engine_options, track_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    parsed = parsed.set(drivername=driver)
+    if settings.DB_PGBOUNCER_MODE and driver == "postgresql+asyncpg":
+        parsed = parsed.update_query_dict({"prepared_statement_cache_size": "0"})
+    return parsed.render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+
+async_database_url = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(async_database_url, **engine_options(async_database_url, is_async=True))
+
+track_engine("sync", engine)
+track_engine("async", async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
@@ -23,4 +55,5 @@ def get_db():
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    from app.db.migrations import run_migrations
+    run_migrations(engine)
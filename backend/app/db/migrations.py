@@ -0,0 +1,183 @@
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.db.database import Base, engine
+from app.models import user as models
+
+# Migrations run in version order, each in its own transaction, and are
+# recorded in schema_migrations. They must be safe to run against a schema
+# that already has their change: databases that predate this table are
+# upgraded by replaying every migration on top of whatever create_all built.
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# Arbitrary, but fixed: every node must ask for the same advisory lock.
+SCHEMA_LOCK_ID = 7263514
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    def register(func: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def create_indexes(conn: Connection, table: Table, *names: str) -> None:
+    for index in table.indexes:
+        if index.name in names:
+            index.create(bind=conn, checkfirst=True)
+
+
+def drop_index(conn: Connection, name: str) -> None:
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def add_column(conn: Connection, table: Table, name: str, ddl: str) -> None:
+    if name not in {column["name"] for column in inspect(conn).get_columns(table.name)}:
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {ddl}"))
+
+
+@migration(1, "Initial schema")
+def initial_schema(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+@migration(2, "Keyset pagination and availability indexes")
+def pagination_indexes(conn: Connection) -> None:
+    create_indexes(conn, models.User.__table__, "ix_users_created_at_id")
+    create_indexes(conn, models.Property.__table__, "ix_properties_created_at_id")
+    create_indexes(
+        conn, models.Booking.__table__,
+        "ix_bookings_created_at_id", "ix_bookings_user_created_at_id", "ix_bookings_room_dates",
+    )
+    create_indexes(conn, models.Message.__table__, "ix_messages_conversation_created_at_id")
+    create_indexes(conn, models.Document.__table__, "ix_documents_created_at_id")
+
+
+@migration(3, "Foreign key indexes and partial escalation index")
+def foreign_key_indexes(conn: Connection) -> None:
+    create_indexes(conn, models.Room.__table__, "ix_rooms_property_id")
+    create_indexes(conn, models.Booking.__table__, "ix_bookings_property_created_at_id")
+    create_indexes(conn, models.Message.__table__, "ix_messages_escalations_created_at_id")
+    # Superseded by the partial index and by the conversation_id prefix of
+    # ix_messages_conversation_created_at_id respectively.
+    drop_index(conn, "ix_messages_escalation_created_at_id")
+    drop_index(conn, "ix_messages_conversation_id")
+
+
+@migration(4, "Booking analytics rollups")
+def booking_rollups(conn: Connection) -> None:
+    from app.services.booking_analytics import rebuild
+    models.BookingDailyStat.__table__.create(bind=conn, checkfirst=True)
+    rebuild(conn)
+
+
+@migration(5, "Row versions for optimistic concurrency")
+def row_versions(conn: Connection) -> None:
+    for model in (models.Property, models.Room, models.Booking):
+        add_column(conn, model.__table__, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(6, "Booking transition log and idempotency keys")
+def booking_lifecycle(conn: Connection) -> None:
+    models.BookingTransition.__table__.create(bind=conn, checkfirst=True)
+    models.IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+    create_indexes(conn, models.Booking.__table__, "ix_bookings_status_check_out")
+
+
+@contextmanager
+def schema_lock(bind: Engine = engine):
+    # Nodes starting together would race through the same migrations; on
+    # PostgreSQL they queue on an advisory lock instead. The lock belongs to
+    # its own connection, so the caller's work must not wait on it.
+    if bind.dialect.name != "postgresql":
+        yield
+        return
+    with bind.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+            conn.commit()
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    return list(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(bind: Engine = engine) -> List[int]:
+    migration_metadata.create_all(bind=bind)
+    with bind.connect() as conn:
+        applied = set(applied_versions(conn))
+        fresh = not applied and not inspect(conn).has_table(models.User.__tablename__)
+
+    ran = []
+    if fresh:
+        # A new database gets the current models directly; replaying history
+        # would only rebuild the same schema step by step.
+        with bind.begin() as conn:
+            Base.metadata.create_all(bind=conn)
+            _record(conn, MIGRATIONS)
+        return [m.version for m in MIGRATIONS]
+
+    for m in MIGRATIONS:
+        if m.version in applied:
+            continue
+        with bind.begin() as conn:
+            m.apply(conn)
+            _record(conn, [m])
+        ran.append(m.version)
+    return ran
+
+
+def _record(conn: Connection, applied: List[Migration]) -> None:
+    now = datetime.utcnow()
+    conn.execute(schema_migrations.insert(), [
+        {"version": m.version, "description": m.description, "applied_at": now} for m in applied
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    parser.add_argument("command", choices=["upgrade", "status"], nargs="?", default="upgrade")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        with schema_lock():
+            ran = run_migrations()
+        print(f"Applied migrations: {', '.join(map(str, ran))}" if ran else "Database is up to date")
+        return
+
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = set(applied_versions(conn))
+    for m in MIGRATIONS:
+        print(f"{'applied' if m.version in applied else 'pending':8} {m.version:4d}  {m.description}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+pool_overflow_events = registry.counter(
+    "db_pool_overflow_total",
+    "Connections opened beyond pool_size (overflow)",
+    ["engine"],
+)
+pool_timeouts = registry.counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["engine"],
+)
+
+_tracked_engines: Dict[str, Engine] = {}
+
+
+def _pool_stats() -> Dict[str, Dict[tuple, float]]:
+    stats = {"size": {}, "checked_out": {}, "overflow": {}, "checked_in": {}}
+    for name, engine in _tracked_engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        stats["size"][(name,)] = pool.size()
+        stats["checked_out"][(name,)] = pool.checkedout()
+        stats["overflow"][(name,)] = max(pool.overflow(), 0)
+        stats["checked_in"][(name,)] = pool.checkedin()
+    return stats
+
+
+registry.gauge("db_pool_size", "Configured pool size", ["engine"], callback=lambda: _pool_stats()["size"])
+registry.gauge("db_pool_checked_out", "Connections currently in use", ["engine"], callback=lambda: _pool_stats()["checked_out"])
+registry.gauge("db_pool_overflow", "Overflow connections currently open", ["engine"], callback=lambda: _pool_stats()["overflow"])
+registry.gauge("db_pool_checked_in", "Idle connections held by the pool", ["engine"], callback=lambda: _pool_stats()["checked_in"])
+
+
+class _InstrumentedMixin:
+    # Times Pool.connect(), the public entry point every checkout goes
+    # through; overflow is counted from pool events in track_engine.
+    metrics_label = "default"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            pool_timeouts.inc(engine=self.metrics_label)
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start, engine=self.metrics_label)
+
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    metrics_label = "sync"
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    backend = make_url(url).get_backend_name()
+    connect_args = {}
+    if backend == "sqlite" and not is_async:
+        connect_args["check_same_thread"] = False
+
+    if settings.DB_PGBOUNCER_MODE and backend == "postgresql":
+        # PgBouncer in transaction mode owns pooling; server-side prepared
+        # statements cannot be reused across the backends it hands out.
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+        return {"poolclass": NullPool, "connect_args": connect_args}
+
+    if _is_memory_sqlite(url):
+        return {"connect_args": connect_args}
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def track_engine(name: str, engine: Engine) -> None:
+    _tracked_engines[name] = engine
+    if not isinstance(engine.pool, QueuePool):
+        return
+
+    # engine.pool is looked up on each call: dispose() swaps in a new pool,
+    # which inherits this listener.
+    def connected(dbapi_connection, connection_record) -> None:
+        # A new connection while overflow() is positive is one opened
+        # beyond pool_size.
+        if engine.pool.overflow() > 0:
+            pool_overflow_events.inc(engine=name)
+
+    event.listen(engine.pool, "connect", connected)
@@ -1,9 +1,21 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.db.database import init_db
-from app.api import auth, users, properties, bookings, messages, chat, documents
+from app.core.coordination import coordination
+from app.core.metrics import registry
+from app.core.instrumentation import InstrumentationMiddleware, instrument_engine
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.db.database import SessionLocal, engine, async_engine
+from app.startup import prepare, load_prepared
+from app.services.llm import llm_gateway
+from app.core.passwords import password_hasher
+from app.services.message_writer import message_writer
+from app.services.knowledge_base import flush_index
+from app.services.escalations import escalation_queue
+from app.api import auth, users, properties, bookings, messages, chat, documents, analytics
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -11,14 +23,19 @@ app = FastAPI(
     description="AI-powered travel agency agent"
 )
 
+app.add_middleware(InstrumentationMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
 )
 
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 app.include_router(auth.router, prefix=settings.API_PREFIX)
 app.include_router(users.router, prefix=settings.API_PREFIX)
 app.include_router(properties.router, prefix=settings.API_PREFIX)
@@ -26,11 +43,35 @@ app.include_router(bookings.router, prefix=settings.API_PREFIX)
 app.include_router(messages.router, prefix=settings.API_PREFIX)
 app.include_router(chat.router, prefix=settings.API_PREFIX)
 app.include_router(documents.router, prefix=settings.API_PREFIX)
+app.include_router(analytics.router, prefix=settings.API_PREFIX)
 
 
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    if settings.PREPARE_ON_STARTUP:
+        prepare()
+    else:
+        load_prepared()
+    db = SessionLocal()
+    try:
+        escalation_queue.rebuild(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def start_coordination():
+    await coordination.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await message_writer.drain()
+    await run_in_threadpool(flush_index)
+    await coordination.close()
+    await llm_gateway.aclose()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -45,3 +86,8 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return registry.render()
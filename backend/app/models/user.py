@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text, Enum, Integer, Numeric, ForeignKey, JSON, Boolean, Date
+from sqlalchemy import Column, String, DateTime, Text, Enum, Integer, Numeric, ForeignKey, JSON, Boolean, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -40,6 +40,9 @@ class MessageRole(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     email = Column(String, unique=True, index=True, nullable=False)
@@ -56,6 +59,9 @@ class User(Base):
 
 class Property(Base):
     __tablename__ = "properties"
+    __table_args__ = (
+        Index("ix_properties_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
@@ -66,6 +72,7 @@ class Property(Base):
     contact_phone = Column(String, nullable=True)
     images = Column(JSON, default=list)
     amenities = Column(JSON, default=list)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -75,6 +82,9 @@ class Property(Base):
 
 class Room(Base):
     __tablename__ = "rooms"
+    __table_args__ = (
+        Index("ix_rooms_property_id", "property_id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     property_id = Column(String, ForeignKey("properties.id"), nullable=False)
@@ -82,6 +92,7 @@ class Room(Base):
     description = Column(Text, nullable=True)
     max_occupancy = Column(Integer, default=2)
     base_rate = Column(Numeric(10, 2), default=0)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     
     property = relationship("Property", back_populates="rooms")
@@ -90,6 +101,13 @@ class Room(Base):
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        Index("ix_bookings_created_at_id", "created_at", "id"),
+        Index("ix_bookings_user_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_bookings_property_created_at_id", "property_id", "created_at", "id"),
+        Index("ix_bookings_room_dates", "room_id", "check_in", "check_out"),
+        Index("ix_bookings_status_check_out", "status", "check_out"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -104,6 +122,7 @@ class Booking(Base):
     stripe_payment_id = Column(String, nullable=True)
     voucher_code = Column(String, unique=True, nullable=True)
     notes = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -114,10 +133,13 @@ class Booking(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_created_at_id", "conversation_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=True)
-    conversation_id = Column(String, nullable=False, index=True)
+    conversation_id = Column(String, nullable=False)
     role = Column(String, default=MessageRole.USER.value)
     content = Column(Text, nullable=False)
     is_escalation = Column(Boolean, default=False)
@@ -128,11 +150,89 @@ class Message(Base):
     user = relationship("User", back_populates="messages")
 
 
+# Partial: only escalations are indexed, which keeps the admin queue scan
+# small no matter how many chat messages accumulate.
+Index(
+    "ix_messages_escalations_created_at_id",
+    Message.created_at,
+    Message.id,
+    postgresql_where=Message.is_escalation == True,
+    sqlite_where=Message.is_escalation == True,
+)
+
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     file_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ConversationContext(Base):
+    __tablename__ = "conversation_contexts"
+    
+    conversation_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    turns = Column(JSON, default=list)
+    turn_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BookingDailyStat(Base):
+    # Rollup maintained by app.services.booking_analytics. bookings and
+    # cancellations count events on the day they happened; nights and the
+    # revenue columns count stays on each night they cover.
+    __tablename__ = "booking_daily_stats"
+    __table_args__ = (
+        Index("ix_booking_daily_stats_property_day", "property_id", "day"),
+    )
+    
+    day = Column(Date, primary_key=True)
+    property_id = Column(String, primary_key=True)
+    room_id = Column(String, primary_key=True)
+    bookings = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    nights = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+    paid_revenue = Column(Numeric(12, 2), nullable=False, default=0)
+
+
+class BookingTransition(Base):
+    # Append-only history written by app.services.booking_lifecycle; the
+    # row for a new booking has no from_ states.
+    __tablename__ = "booking_transitions"
+    __table_args__ = (
+        Index("ix_booking_transitions_booking_created_at_id", "booking_id", "created_at", "id"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    booking_id = Column(String, ForeignKey("bookings.id"), nullable=False)
+    transition = Column(String, nullable=False)
+    from_status = Column(String, nullable=True)
+    to_status = Column(String, nullable=False)
+    from_payment_status = Column(String, nullable=True)
+    to_payment_status = Column(String, nullable=False)
+    actor_id = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    # Client-chosen keys of booking writes, stored in the same transaction
+    # as the write so a retried request finds the booking it created.
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+    
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    scope = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)
+    booking_id = Column(String, ForeignKey("bookings.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
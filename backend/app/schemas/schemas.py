@@ -38,6 +38,11 @@ class TokenData(BaseModel):
     user_id: Optional[str] = None
 
 
+class Principal(BaseModel):
+    id: str
+    role: str
+
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -59,11 +64,14 @@ class PropertyCreate(PropertyBase):
 
 
 class PropertyUpdate(PropertyBase):
-    pass
+    # The version the change was based on (or an If-Match header); a stale
+    # one is rejected with 409. Without either the last write wins.
+    version: Optional[int] = None
 
 
 class PropertyResponse(PropertyBase):
     id: str
+    version: int
     created_at: datetime
     
     class Config:
@@ -82,12 +90,13 @@ class RoomCreate(RoomBase):
 
 
 class RoomUpdate(RoomBase):
-    pass
+    version: Optional[int] = None
 
 
 class RoomResponse(RoomBase):
     id: str
     property_id: str
+    version: int
     created_at: datetime
     
     class Config:
@@ -120,6 +129,20 @@ class BookingResponse(BookingBase):
     payment_status: str
     stripe_payment_id: Optional[str] = None
     voucher_code: Optional[str] = None
+    version: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class BookingTransitionResponse(BaseModel):
+    transition: str
+    from_status: Optional[str] = None
+    to_status: str
+    from_payment_status: Optional[str] = None
+    to_payment_status: str
+    actor_id: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -180,3 +203,49 @@ class ChatResponse(BaseModel):
 class EscalationUpdate(BaseModel):
     admin_response: str
     status: str = "resolved"
+
+
+class EscalationTicket(BaseModel):
+    id: str
+    conversation_id: str
+    user_id: Optional[str] = None
+    content: str
+    priority: int
+    created_at: datetime
+    claimed_by: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+
+
+class AnalyticsTotals(BaseModel):
+    bookings: int
+    cancellations: int
+    nights: int
+    revenue: float
+    paid_revenue: float
+    occupancy: float
+
+
+class AnalyticsDay(AnalyticsTotals):
+    day: date
+
+
+class PropertyAnalytics(AnalyticsTotals):
+    property_id: str
+    name: Optional[str] = None
+
+
+class RoomAnalytics(AnalyticsTotals):
+    room_id: str
+    name: str
+
+
+class InventoryRowError(BaseModel):
+    line: int
+    error: str
+
+
+class InventoryImportReport(BaseModel):
+    properties_created: int
+    rooms_created: int
+    rows_failed: int
+    errors: List[InventoryRowError]
@@ -0,0 +1,192 @@
+import asyncio
+import bisect
+import time
+import weakref
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.coordination import coordination
+from app.models.user import Booking, BookingStatus, Room
+
+INACTIVE_STATUSES = (BookingStatus.CANCELLED.value,)
+AVAILABILITY_CHANNEL = "availability"
+
+
+class RoomUnavailableError(Exception):
+    pass
+
+
+def overlaps_clause(room_id, check_in: date, check_out: date):
+    # Half-open intervals: a stay ending on D does not clash with one starting on D.
+    return and_(
+        Booking.room_id == room_id,
+        Booking.check_in < check_out,
+        Booking.check_out > check_in,
+        Booking.status.notin_(INACTIVE_STATUSES),
+    )
+
+
+class RoomIntervals:
+    # Active stays of one room kept sorted by check-in. Stays of a room never
+    # overlap, so ends are sorted too and any clash with [start, end) can only
+    # be the last stay starting before `end`.
+    def __init__(self, stays: List[Tuple[date, date, str]]):
+        self._starts: List[date] = []
+        self._stays: List[Tuple[date, date, str]] = []
+        self.loaded_at = time.monotonic()
+        for stay in sorted(stays):
+            self.add(*stay)
+
+    def __len__(self) -> int:
+        return len(self._stays)
+
+    def conflict(self, check_in: date, check_out: date) -> Optional[str]:
+        i = bisect.bisect_left(self._starts, check_out)
+        if i and self._stays[i - 1][1] > check_in:
+            return self._stays[i - 1][2]
+        return None
+
+    def add(self, check_in: date, check_out: date, booking_id: str) -> None:
+        i = bisect.bisect_left(self._starts, check_in)
+        self._starts.insert(i, check_in)
+        self._stays.insert(i, (check_in, check_out, booking_id))
+
+    def remove(self, booking_id: str) -> None:
+        for i, stay in enumerate(self._stays):
+            if stay[2] == booking_id:
+                del self._starts[i]
+                del self._stays[i]
+                return
+
+
+class AvailabilityIndex:
+    def __init__(self, ttl: float = 30.0, max_rooms: int = 50000):
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self._rooms: Dict[str, RoomIntervals] = {}
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.db_guarded = False
+
+    def _fresh(self, room_id: str) -> Optional[RoomIntervals]:
+        intervals = self._rooms.get(room_id)
+        if intervals is not None and time.monotonic() - intervals.loaded_at < self.ttl:
+            return intervals
+        return None
+
+    async def _load(self, db: AsyncSession, room_id: str) -> RoomIntervals:
+        rows = await db.execute(
+            select(Booking.check_in, Booking.check_out, Booking.id)
+            .where(Booking.room_id == room_id, Booking.status.notin_(INACTIVE_STATUSES))
+        )
+        intervals = RoomIntervals([tuple(row) for row in rows])
+        if len(self._rooms) >= self.max_rooms:
+            self._rooms.pop(next(iter(self._rooms)))
+        self._rooms[room_id] = intervals
+        return intervals
+
+    @asynccontextmanager
+    async def reserve(self, db: AsyncSession, room_id: str, check_in: date, check_out: date):
+        # Serialises booking attempts for a room within this process and locks
+        # the room row (PostgreSQL) so other workers queue behind us.
+        lock = self._locks.get(room_id)
+        if lock is None:
+            lock = self._locks[room_id] = asyncio.Lock()
+        async with lock:
+            await db.execute(select(Room.id).where(Room.id == room_id).with_for_update())
+            intervals = self._fresh(room_id) or await self._load(db, room_id)
+            if intervals.conflict(check_in, check_out):
+                raise RoomUnavailableError(room_id)
+            if not self.db_guarded:
+                # Without the exclusion constraint a booking made by another
+                # worker since the cache was loaded would go unnoticed.
+                clash = await db.scalar(select(exists().where(overlaps_clause(room_id, check_in, check_out))))
+                if clash:
+                    raise RoomUnavailableError(room_id)
+            yield
+
+    async def booked(self, booking: Booking) -> None:
+        intervals = self._rooms.get(booking.room_id)
+        if intervals is not None:
+            intervals.add(booking.check_in, booking.check_out, booking.id)
+        await self._changed(booking.room_id)
+
+    async def released(self, booking: Booking) -> None:
+        intervals = self._rooms.get(booking.room_id)
+        if intervals is not None:
+            intervals.remove(booking.id)
+        await self._changed(booking.room_id)
+
+    async def _changed(self, room_id: str) -> None:
+        # Other workers drop their copy of the room and reload it on its next
+        # booking; otherwise a stay cancelled here would look taken there
+        # until the copy expired.
+        await coordination.publish(AVAILABILITY_CHANNEL, {"room_id": room_id})
+
+    def discard(self, room_id: str) -> None:
+        self._rooms.pop(room_id, None)
+
+    def clear(self) -> None:
+        self._rooms.clear()
+
+
+availability_index = AvailabilityIndex(ttl=settings.AVAILABILITY_CACHE_TTL)
+
+
+async def _room_changed(message: dict) -> None:
+    availability_index.discard(message["room_id"])
+
+
+async def _resync() -> None:
+    # Changes published while disconnected were missed.
+    availability_index.clear()
+
+
+coordination.subscribe(AVAILABILITY_CHANNEL, _room_changed)
+coordination.on_connect(_resync)
+
+
+async def available_rooms(
+    db: AsyncSession, property_id: str, check_in: date, check_out: date, guests: int = 1
+) -> List[Room]:
+    stmt = (
+        select(Room)
+        .where(
+            Room.property_id == property_id,
+            Room.max_occupancy >= guests,
+            ~exists().where(overlaps_clause(Room.id, check_in, check_out)),
+        )
+        .order_by(Room.base_rate, Room.name)
+    )
+    return list(await db.scalars(stmt))
+
+
+def init_availability(engine: Engine, create: bool = True) -> None:
+    # create=False only looks for a constraint added by another process.
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            present = conn.execute(text(
+                "SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap'"
+            )).scalar()
+            if not present:
+                if not create:
+                    return
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+                conn.execute(text(
+                    "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+                    "EXCLUDE USING gist (room_id WITH =, daterange(check_in, check_out) WITH &&) "
+                    "WHERE (status <> 'cancelled')"
+                ))
+        availability_index.db_guarded = True
+    except DBAPIError:
+        # Existing double bookings (or no permission to create the extension)
+        # leave us with the row-lock protection only.
+        pass
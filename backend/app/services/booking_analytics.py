@@ -0,0 +1,243 @@
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import engine
+from app.models.user import Booking, BookingDailyStat, BookingStatus, PaymentStatus, Property, Room
+from app.services.availability import INACTIVE_STATUSES
+
+METRICS = ("bookings", "cancellations", "nights", "revenue", "paid_revenue")
+CENT = Decimal("0.01")
+REBUILD_BATCH = 1000
+
+Key = Tuple[date, str, str]
+
+
+class BookingFacts(NamedTuple):
+    # The fields of a booking the rollups depend on, captured before and
+    # after a transition so that only the difference is written.
+    property_id: str
+    room_id: str
+    check_in: date
+    check_out: date
+    total_amount: Decimal
+    status: str
+    payment_status: str
+    created_on: date
+    changed_on: date
+
+    @classmethod
+    def of(cls, booking, changed_at: Optional[datetime] = None) -> "BookingFacts":
+        # Works for Booking instances and for rows selected with the same
+        # column names. changed_at overrides updated_at for a change that has
+        # not been flushed yet.
+        now = datetime.utcnow()
+        return cls(
+            booking.property_id, booking.room_id, booking.check_in, booking.check_out,
+            Decimal(str(booking.total_amount or 0)).quantize(CENT),
+            booking.status, booking.payment_status,
+            (booking.created_at or now).date(),
+            (changed_at or booking.updated_at or now).date(),
+        )
+
+
+def _empty() -> dict:
+    return dict.fromkeys(METRICS, 0)
+
+
+def contributions(facts: Optional[BookingFacts]) -> Dict[Key, dict]:
+    rows: Dict[Key, dict] = defaultdict(_empty)
+    if facts is None:
+        return rows
+    rows[(facts.created_on, facts.property_id, facts.room_id)]["bookings"] += 1
+    if facts.status == BookingStatus.CANCELLED.value:
+        # A cancellation is dated by the booking's last change.
+        rows[(facts.changed_on, facts.property_id, facts.room_id)]["cancellations"] += 1
+    if facts.status in INACTIVE_STATUSES:
+        return rows
+
+    nights = (facts.check_out - facts.check_in).days
+    if nights <= 0:
+        return rows
+    # Revenue is spread over the nights in whole cents, the remainder going
+    # to the first nights, so per-night amounts always add up to the total.
+    base, extra = divmod(int(facts.total_amount * 100), nights)
+    paid = facts.payment_status == PaymentStatus.PAID.value
+    for i in range(nights):
+        amount = Decimal(base + (1 if i < extra else 0)) * CENT
+        row = rows[(facts.check_in + timedelta(days=i), facts.property_id, facts.room_id)]
+        row["nights"] += 1
+        row["revenue"] += amount
+        if paid:
+            row["paid_revenue"] += amount
+    return rows
+
+
+def deltas(before: Optional[BookingFacts], after: Optional[BookingFacts]) -> List[dict]:
+    old, new = contributions(before), contributions(after)
+    changes = []
+    for key in old.keys() | new.keys():
+        change = {metric: new.get(key, _empty())[metric] - old.get(key, _empty())[metric] for metric in METRICS}
+        if any(change.values()):
+            day, property_id, room_id = key
+            changes.append({"day": day, "property_id": property_id, "room_id": room_id, **change})
+    return changes
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        stmt = postgresql.insert(BookingDailyStat)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(BookingDailyStat)
+    else:
+        raise NotImplementedError(f"Booking analytics does not support {dialect}")
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "property_id", "room_id"],
+        set_={metric: getattr(BookingDailyStat, metric) + getattr(stmt.excluded, metric) for metric in METRICS},
+    )
+
+
+async def record(db: AsyncSession, before: Optional[BookingFacts], booking: Booking) -> None:
+    # Call before committing the booking change so both land in one
+    # transaction. Increments are applied in the database, so concurrent
+    # transitions touching the same day never overwrite each other.
+    changes = deltas(before, BookingFacts.of(booking, changed_at=datetime.utcnow()))
+    if changes:
+        await db.execute(_upsert(db.bind.dialect.name), changes)
+
+
+def rebuild(conn: Connection) -> int:
+    # Recomputes every rollup row from the bookings table. On Postgres the
+    # table lock makes concurrent transitions wait and then apply their
+    # increments on top of the rebuilt rows.
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"LOCK TABLE {BookingDailyStat.__tablename__} IN EXCLUSIVE MODE"))
+    conn.execute(delete(BookingDailyStat))
+
+    totals: Dict[Key, dict] = defaultdict(_empty)
+    result = conn.execute(select(
+        Booking.property_id, Booking.room_id, Booking.check_in, Booking.check_out, Booking.total_amount,
+        Booking.status, Booking.payment_status, Booking.created_at, Booking.updated_at,
+    ).execution_options(yield_per=REBUILD_BATCH))
+    for row in result:
+        for key, values in contributions(BookingFacts.of(row)).items():
+            total = totals[key]
+            for metric in METRICS:
+                total[metric] += values[metric]
+
+    rows = [
+        {"day": day, "property_id": property_id, "room_id": room_id, **values}
+        for (day, property_id, room_id), values in totals.items()
+    ]
+    for start in range(0, len(rows), REBUILD_BATCH):
+        conn.execute(insert(BookingDailyStat), rows[start:start + REBUILD_BATCH])
+    return len(rows)
+
+
+async def rebuild_async(db: AsyncSession) -> int:
+    count = await db.run_sync(lambda session: rebuild(session.connection()))
+    await db.commit()
+    return count
+
+
+def _sums():
+    return [func.coalesce(func.sum(getattr(BookingDailyStat, metric)), 0).label(metric) for metric in METRICS]
+
+
+def _totals(row) -> dict:
+    return {
+        "bookings": int(row.bookings), "cancellations": int(row.cancellations), "nights": int(row.nights),
+        "revenue": float(row.revenue), "paid_revenue": float(row.paid_revenue),
+    }
+
+
+def _in_range(stmt, start: date, end: date):
+    return stmt.where(BookingDailyStat.day >= start, BookingDailyStat.day <= end)
+
+
+async def daily_series(
+    db: AsyncSession,
+    start: date,
+    end: date,
+    property_id: Optional[str] = None,
+    room_id: Optional[str] = None,
+) -> List[dict]:
+    stmt = _in_range(select(BookingDailyStat.day, *_sums()), start, end)
+    rooms = select(func.count(Room.id))
+    if property_id:
+        stmt = stmt.where(BookingDailyStat.property_id == property_id)
+        rooms = rooms.where(Room.property_id == property_id)
+    if room_id:
+        stmt = stmt.where(BookingDailyStat.room_id == room_id)
+        rooms = rooms.where(Room.id == room_id)
+    by_day = {row.day: row for row in await db.execute(stmt.group_by(BookingDailyStat.day))}
+    room_count = await db.scalar(rooms) or 0
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        totals = _totals(by_day[day]) if day in by_day else {metric: 0 for metric in METRICS}
+        occupancy = totals["nights"] / room_count if room_count else 0.0
+        series.append({"day": day, **totals, "occupancy": round(occupancy, 4)})
+    return series
+
+
+async def property_totals(db: AsyncSession, start: date, end: date) -> List[dict]:
+    days = (end - start).days + 1
+    stmt = _in_range(
+        select(BookingDailyStat.property_id, *_sums()).group_by(BookingDailyStat.property_id), start, end
+    )
+    rows = (await db.execute(stmt)).all()
+    ids = [row.property_id for row in rows]
+    names = dict((await db.execute(select(Property.id, Property.name).where(Property.id.in_(ids)))).all())
+    room_counts = dict((await db.execute(
+        select(Room.property_id, func.count(Room.id)).where(Room.property_id.in_(ids)).group_by(Room.property_id)
+    )).all())
+    results = []
+    for row in rows:
+        capacity = room_counts.get(row.property_id, 0) * days
+        totals = _totals(row)
+        results.append({
+            "property_id": row.property_id, "name": names.get(row.property_id), **totals,
+            "occupancy": round(totals["nights"] / capacity, 4) if capacity else 0.0,
+        })
+    return sorted(results, key=lambda item: item["revenue"], reverse=True)
+
+
+async def room_totals(db: AsyncSession, property_id: str, start: date, end: date) -> List[dict]:
+    days = (end - start).days + 1
+    stmt = _in_range(
+        select(BookingDailyStat.room_id, *_sums())
+        .where(BookingDailyStat.property_id == property_id)
+        .group_by(BookingDailyStat.room_id),
+        start, end,
+    )
+    by_room = {row.room_id: row for row in await db.execute(stmt)}
+    rooms = (await db.execute(select(Room.id, Room.name).where(Room.property_id == property_id))).all()
+    results = []
+    for room in rooms:
+        totals = _totals(by_room[room.id]) if room.id in by_room else {metric: 0 for metric in METRICS}
+        results.append({
+            "room_id": room.id, "name": room.name, **totals, "occupancy": round(totals["nights"] / days, 4),
+        })
+    return sorted(results, key=lambda item: item["revenue"], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the booking analytics rollups from the bookings table")
+    parser.parse_args()
+
+    with engine.begin() as conn:
+        count = rebuild(conn)
+    print(f"Rebuilt {count} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
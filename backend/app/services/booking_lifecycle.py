@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.concurrency import compare_and_swap
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.user import Booking, BookingStatus, BookingTransition, IdempotencyKey, PaymentStatus
+from app.services import booking_analytics
+from app.services.booking_analytics import BookingFacts
+
+PENDING = BookingStatus.PENDING.value
+CONFIRMED = BookingStatus.CONFIRMED.value
+CANCELLED = BookingStatus.CANCELLED.value
+COMPLETED = BookingStatus.COMPLETED.value
+UNPAID = PaymentStatus.PENDING.value
+PAID = PaymentStatus.PAID.value
+REFUNDED = PaymentStatus.REFUNDED.value
+
+ANY_PAYMENT = {value.value: value.value for value in PaymentStatus}
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyMismatch(Exception):
+    pass
+
+
+class Transition(NamedTuple):
+    # A transition applies to bookings whose status and payment status are
+    # keys of the two maps and moves each to the mapped value.
+    name: str
+    status: Dict[str, str]
+    payment: Dict[str, str]
+
+    def conditions(self) -> list:
+        conditions = [Booking.status.in_(list(self.status))]
+        if self.payment != ANY_PAYMENT:
+            conditions.append(Booking.payment_status.in_(list(self.payment)))
+        return conditions
+
+    def values(self) -> dict:
+        values = {}
+        for column, mapping in (("status", self.status), ("payment_status", self.payment)):
+            changed = {source: target for source, target in mapping.items() if source != target}
+            if not changed:
+                continue
+            targets = set(mapping.values())
+            if len(targets) == 1:
+                values[column] = targets.pop()
+            else:
+                attr = getattr(Booking, column)
+                values[column] = case(*((attr == source, target) for source, target in changed.items()), else_=attr)
+        return values
+
+    def origin(self, booking) -> Tuple[str, str]:
+        # The states a booking just moved by this transition came from,
+        # without having read them before the update.
+        statuses = [source for source, target in self.status.items() if target == booking.status]
+        if len(statuses) > 1:
+            # Only cancel has several sources; confirming is what issues a
+            # voucher code, so it tells them apart.
+            statuses = [CONFIRMED if booking.voucher_code else PENDING]
+        payments = [source for source, target in self.payment.items() if target == booking.payment_status]
+        return statuses[0], payments[0]
+
+
+CONFIRM = Transition("confirm", {PENDING: CONFIRMED}, ANY_PAYMENT)
+PAY = Transition("pay", {CONFIRMED: CONFIRMED}, {UNPAID: PAID})
+CANCEL = Transition("cancel", {PENDING: CANCELLED, CONFIRMED: CANCELLED}, {UNPAID: UNPAID, PAID: REFUNDED})
+COMPLETE = Transition("complete", {CONFIRMED: COMPLETED}, ANY_PAYMENT)
+
+
+def _log(booking, transition: str, origin: Tuple[Optional[str], Optional[str]], actor_id: Optional[str]) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "booking_id": booking.id, "transition": transition,
+        "from_status": origin[0], "to_status": booking.status,
+        "from_payment_status": origin[1], "to_payment_status": booking.payment_status,
+        "actor_id": actor_id, "created_at": datetime.utcnow(),
+    }
+
+
+async def create(db: AsyncSession, booking: Booking, actor_id: Optional[str]) -> None:
+    # Adds a new booking with its first log entry; the caller commits.
+    booking.id = booking.id or str(uuid.uuid4())
+    db.add(booking)
+    db.add(BookingTransition(**_log(booking, "create", (None, None), actor_id)))
+    await booking_analytics.record(db, None, booking)
+
+
+async def apply(
+    db: AsyncSession,
+    transition: Transition,
+    booking_id: str,
+    actor_id: Optional[str],
+    *conditions,
+    **values,
+) -> Optional[Booking]:
+    # One conditional UPDATE ... RETURNING plus its log entry and rollup
+    # change; the caller commits. Returns None when the booking does not
+    # exist or is not in a state the transition (and `conditions`) accept.
+    booking = await compare_and_swap(
+        db, Booking, booking_id, {**transition.values(), **values}, *transition.conditions(), *conditions
+    )
+    if booking is None:
+        return None
+    status, payment_status = transition.origin(booking)
+    db.add(BookingTransition(**_log(booking, transition.name, (status, payment_status), actor_id)))
+    before = BookingFacts.of(booking)._replace(status=status, payment_status=payment_status)
+    await booking_analytics.record(db, before, booking)
+    return booking
+
+
+async def complete_past(db: AsyncSession, as_of: Optional[date] = None) -> int:
+    # Completes every confirmed booking whose check-out day has passed with
+    # one UPDATE. Completed and confirmed bookings count alike in the
+    # rollups, so there is nothing to record there.
+    as_of = as_of or datetime.utcnow().date()
+    rows = (await db.execute(
+        update(Booking)
+        .where(*COMPLETE.conditions(), Booking.check_out < as_of)
+        .values(**COMPLETE.values(), version=Booking.version + 1)
+        .returning(Booking.id, Booking.status, Booking.payment_status)
+        .execution_options(synchronize_session=False)
+    )).all()
+    if rows:
+        await db.execute(insert(BookingTransition), [
+            _log(row, COMPLETE.name, (CONFIRMED, row.payment_status), None) for row in rows
+        ])
+    await db.commit()
+    return len(rows)
+
+
+def fingerprint(scope: str, payload: dict) -> str:
+    raw = json.dumps([scope, payload], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def replay(db: AsyncSession, user_id: str, key: str, scope: str, digest: str) -> Optional[Booking]:
+    # The booking an earlier request with this key wrote, in its current
+    # state. Reusing a key for a different request is an error.
+    stored = await db.get(IdempotencyKey, (user_id, key))
+    if stored is None:
+        return None
+    if stored.scope != scope or stored.fingerprint != digest:
+        raise IdempotencyMismatch(key)
+    return await db.get(Booking, stored.booking_id)
+
+
+def remember(db: AsyncSession, user_id: str, key: str, scope: str, digest: str, booking_id: str) -> None:
+    db.add(IdempotencyKey(user_id=user_id, key=key, scope=scope, fingerprint=digest, booking_id=booking_id))
+
+
+async def purge_keys(db: AsyncSession, older_than: Optional[datetime] = None) -> int:
+    older_than = older_than or datetime.utcnow() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < older_than))
+    await db.commit()
+    return result.rowcount
+
+
+async def _run(command: str) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            if command == "complete":
+                return await complete_past(db)
+            return await purge_keys(db)
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch booking lifecycle maintenance")
+    parser.add_argument("command", choices=["complete", "purge-keys"])
+    args = parser.parse_args()
+
+    count = asyncio.run(_run(args.command))
+    if args.command == "complete":
+        print(f"Completed {count} bookings")
+    else:
+        print(f"Purged {count} idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
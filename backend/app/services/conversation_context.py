@@ -0,0 +1,158 @@
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.coordination import coordination
+from app.db.database import AsyncSessionLocal
+from app.models.user import ConversationContext, Message
+from app.services.message_writer import message_writer
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+SUMMARY_SNIPPET_CHARS = 160
+CONTEXT_CHANNEL = "contexts"
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting
+    # without loading a tokenizer on every turn.
+    return max(1, (len(text) + 3) // 4)
+
+
+def summarize_turn(role: str, content: str) -> str:
+    snippet = SENTENCE_RE.split(content.strip(), 1)[0]
+    if len(snippet) > SUMMARY_SNIPPET_CHARS:
+        snippet = snippet[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+    return f"{role}: {snippet}"
+
+
+class ContextWindow:
+    # The last `max_turns` turns verbatim plus a rolling summary of older
+    # ones. Turns carry their token estimate so nothing is re-tokenized.
+    def __init__(
+        self,
+        conversation_id: str,
+        summary: str = "",
+        turns: Optional[List[dict]] = None,
+        turn_count: int = 0,
+    ):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.turns = list(turns or [])
+        self.turn_count = turn_count
+
+    def append(self, role: str, content: str, max_turns: int, summary_tokens: int) -> None:
+        self.turns.append({"role": role, "content": content, "tokens": estimate_tokens(content)})
+        self.turn_count += 1
+        evicted = self.turns[:-max_turns] if len(self.turns) > max_turns else []
+        if evicted:
+            self.turns = self.turns[-max_turns:]
+            lines = self.summary.splitlines() if self.summary else []
+            lines.extend(summarize_turn(turn["role"], turn["content"]) for turn in evicted)
+            # Oldest summary lines fall off first so the summary stays bounded.
+            while len(lines) > 1 and estimate_tokens("\n".join(lines)) > summary_tokens:
+                lines.pop(0)
+            self.summary = "\n".join(lines)
+
+    def prompt_messages(self, budget: int) -> List[dict]:
+        # Newest turns win; the summary may use at most a third of the budget.
+        include_summary = bool(self.summary) and estimate_tokens(self.summary) <= budget // 3
+        used = estimate_tokens(self.summary) if include_summary else 0
+        messages = []
+        for turn in reversed(self.turns):
+            if used + turn["tokens"] > budget:
+                break
+            messages.append({"role": turn["role"], "content": turn["content"]})
+            used += turn["tokens"]
+        messages.reverse()
+        if include_summary:
+            messages.insert(0, {
+                "role": "system",
+                "content": f"Summary of earlier conversation:\n{self.summary}",
+            })
+        return messages
+
+    def values(self) -> dict:
+        return {"summary": self.summary, "turns": list(self.turns), "turn_count": self.turn_count}
+
+
+class ContextStore:
+    # Per-process LRU of context windows backed by the conversation_contexts
+    # table. A miss costs one primary-key lookup; only conversations that
+    # predate the table fall back to reading their last `max_turns` messages.
+    # Other workers drop their copy whenever a turn is recorded.
+    def __init__(self, maxsize: int, max_turns: int, summary_tokens: int):
+        self.maxsize = maxsize
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self._windows: "OrderedDict[str, ContextWindow]" = OrderedDict()
+
+    def _remember(self, window: ContextWindow) -> ContextWindow:
+        # A concurrent load of the same conversation may have finished first;
+        # keep its window so both callers append to the same one.
+        existing = self._windows.get(window.conversation_id)
+        if existing is not None:
+            self._windows.move_to_end(window.conversation_id)
+            return existing
+        self._windows[window.conversation_id] = window
+        self._windows.move_to_end(window.conversation_id)
+        while len(self._windows) > self.maxsize:
+            self._windows.popitem(last=False)
+        return window
+
+    async def load(self, db: AsyncSession, conversation_id: str) -> ContextWindow:
+        window = self._windows.get(conversation_id)
+        if window is not None:
+            self._windows.move_to_end(conversation_id)
+            return window
+        row = await db.get(ConversationContext, conversation_id)
+        if row is not None:
+            return self._remember(ContextWindow(conversation_id, row.summary or "", row.turns, row.turn_count or 0))
+        result = await db.execute(
+            select(Message.role, Message.content)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(self.max_turns)
+        )
+        window = ContextWindow(conversation_id)
+        for role, content in reversed(result.all()):
+            window.append(role, content, self.max_turns, self.summary_tokens)
+        return self._remember(window)
+
+    async def record(self, message: Message) -> ContextWindow:
+        # Persists the message and the updated window together through the
+        # message writer. A window that is not cached is loaded on a session
+        # of our own, closed again before the write.
+        async with AsyncSessionLocal() as db:
+            window = await self.load(db, message.conversation_id)
+        window.append(message.role, message.content, self.max_turns, self.summary_tokens)
+        context = {"conversation_id": message.conversation_id, **window.values()}
+        await message_writer.write(message, context)
+        # The next turn may land on another worker; its cached window is
+        # now behind and must be reloaded.
+        await coordination.publish(CONTEXT_CHANNEL, {"conversation_id": message.conversation_id})
+        return window
+
+    def discard(self, conversation_id: str) -> None:
+        self._windows.pop(conversation_id, None)
+
+    def clear(self) -> None:
+        self._windows.clear()
+
+
+context_store = ContextStore(
+    maxsize=settings.CONTEXT_CACHE_SIZE,
+    max_turns=settings.CONTEXT_MAX_TURNS,
+    summary_tokens=settings.CONTEXT_SUMMARY_TOKENS,
+)
+message_writer.on_failure = context_store.discard
+
+
+async def _context_changed(message: dict) -> None:
+    context_store.discard(message["conversation_id"])
+
+
+coordination.subscribe(CONTEXT_CHANNEL, _context_changed)
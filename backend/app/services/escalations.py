@@ -0,0 +1,329 @@
+import asyncio
+import heapq
+import json
+import re
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.coordination import coordination
+from app.models.user import Message
+from app.schemas.schemas import EscalationTicket
+
+URGENT_RE = re.compile(
+    r"\b(urgent|emergency|asap|immediately|stranded|medical|refund|complain\w*|cancel\w*)\b", re.I
+)
+URGENT, NORMAL = 0, 1
+ESCALATION_CHANNEL = "escalations"
+
+
+def escalation_priority(text: str) -> int:
+    return URGENT if URGENT_RE.search(text or "") else NORMAL
+
+
+def _question():
+    # Tickets show the traveler's question, which is the user turn just
+    # before the escalated assistant reply.
+    turn = aliased(Message)
+    return (
+        select(turn.content)
+        .where(
+            turn.conversation_id == Message.conversation_id,
+            turn.role == "user",
+            turn.created_at <= Message.created_at,
+        )
+        .order_by(turn.created_at.desc(), turn.id.desc())
+        .limit(1)
+        .correlate(Message)
+        .scalar_subquery()
+    )
+
+
+async def load_ticket(db: AsyncSession, message: Message) -> "Ticket":
+    question = await db.scalar(select(_question()).select_from(Message).where(Message.id == message.id))
+    return Ticket.from_message(message, question)
+
+
+class EscalationClaimedError(Exception):
+    def __init__(self, ticket: "Ticket"):
+        super().__init__(f"Escalation {ticket.id} is claimed by another admin")
+        self.ticket = ticket
+
+
+class Ticket:
+    def __init__(
+        self,
+        id: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        content: str,
+        created_at: datetime,
+        priority: int = NORMAL,
+    ):
+        self.id = id
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.content = content
+        self.created_at = created_at
+        self.priority = priority
+        self.claimed_by: Optional[str] = None
+        self.lease_expires_at: Optional[datetime] = None
+
+    @classmethod
+    def from_message(cls, message: Message, question: Optional[str] = None) -> "Ticket":
+        content = question or message.content
+        return cls(
+            message.id, message.conversation_id, message.user_id, content,
+            message.created_at or datetime.utcnow(), escalation_priority(content),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Ticket":
+        fields = EscalationTicket(**data)
+        ticket = cls(
+            fields.id, fields.conversation_id, fields.user_id, fields.content,
+            fields.created_at, fields.priority,
+        )
+        ticket.claimed_by = fields.claimed_by
+        ticket.lease_expires_at = fields.lease_expires_at
+        return ticket
+
+    def sort_key(self) -> Tuple[int, datetime, str]:
+        return (self.priority, self.created_at, self.id)
+
+    def lease_active(self, now: datetime) -> bool:
+        return self.claimed_by is not None and self.lease_expires_at > now
+
+    def as_dict(self) -> dict:
+        return EscalationTicket(**vars(self)).model_dump(mode="json")
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def push(self, event: Optional[dict]) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class EscalationQueue:
+    # Pending escalations ordered by (priority, created_at). Resolved tickets
+    # are dropped from the dict and lazily skipped in the heap, so admin
+    # dashboards read the head of the queue instead of scanning the
+    # messages table on every poll.
+    #
+    # Every worker keeps its own copy, updated by the changes the others
+    # publish. Claims are also recorded in the coordination backend, which
+    # decides between two admins claiming through different workers.
+    def __init__(self, lease_seconds: float, feed_buffer: int = 100):
+        self.lease = timedelta(seconds=lease_seconds)
+        self.feed_buffer = feed_buffer
+        self._tickets: Dict[str, Ticket] = {}
+        self._heap: List[Tuple[int, datetime, str]] = []
+        self._subscribers: Set[Subscription] = set()
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def rebuild(self, db: Session) -> None:
+        rows = db.execute(
+            select(Message, _question())
+            .where(Message.is_escalation == True, Message.escalation_status == "pending")
+            .order_by(Message.created_at, Message.id)
+        ).all()
+        self._tickets = {m.id: Ticket.from_message(m, text) for m, text in rows}
+        self._heap = [ticket.sort_key() for ticket in self._tickets.values()]
+        heapq.heapify(self._heap)
+
+    def get(self, ticket_id: str) -> Optional[Ticket]:
+        return self._tickets.get(ticket_id)
+
+    def pending(self, limit: Optional[int] = None) -> List[Ticket]:
+        self.expire_leases()
+        if len(self._heap) > 2 * len(self._tickets) + 64:
+            self._heap = [ticket.sort_key() for ticket in self._tickets.values()]
+            heapq.heapify(self._heap)
+        live = (self._tickets[key[2]] for key in self._heap if key[2] in self._tickets)
+        if limit is None:
+            return sorted(live, key=Ticket.sort_key)
+        return heapq.nsmallest(limit, live, key=Ticket.sort_key)
+
+    def _insert(self, ticket: Ticket) -> None:
+        self._tickets[ticket.id] = ticket
+        heapq.heappush(self._heap, ticket.sort_key())
+
+    def _claim_key(self, ticket_id: str) -> str:
+        return f"escalation:claim:{ticket_id}"
+
+    async def _stored_claim(self, ticket: Ticket) -> Optional[dict]:
+        # The shared claim wins over this worker's copy, which may not have
+        # heard of a claim made elsewhere yet.
+        value = await coordination.get(self._claim_key(ticket.id))
+        if value is None:
+            return None
+        claim = json.loads(value)
+        ticket.claimed_by = claim["admin_id"]
+        ticket.lease_expires_at = datetime.fromisoformat(claim["lease_expires_at"])
+        return claim
+
+    async def _owner(self, ticket: Ticket) -> Optional[str]:
+        claim = await self._stored_claim(ticket)
+        return claim["admin_id"] if claim is not None else None
+
+    async def add(self, ticket: Ticket) -> None:
+        if ticket.id in self._tickets:
+            return
+        self._insert(ticket)
+        await self._announce("created", ticket)
+
+    async def claim(self, ticket_id: str, admin_id: str, missing: Optional[Ticket] = None) -> Optional[Ticket]:
+        # `missing` is the ticket as the database has it, for an escalation
+        # this worker never heard of: its created event was lost, or came
+        # before the worker loaded the queue.
+        ticket = self._tickets.get(ticket_id)
+        created = ticket is None and missing is not None
+        if created:
+            ticket = missing
+        if ticket is None:
+            return None
+        key = self._claim_key(ticket_id)
+        async with coordination.lock(key):
+            claim = await self._stored_claim(ticket)
+            if claim is not None and claim.get("resolved"):
+                # Answered through a worker whose resolved event has not
+                # reached this one yet.
+                self._tickets.pop(ticket_id, None)
+                return None
+            if claim is not None and claim["admin_id"] != admin_id:
+                raise EscalationClaimedError(ticket)
+            ticket.claimed_by = admin_id
+            ticket.lease_expires_at = datetime.utcnow() + self.lease
+            claim = {"admin_id": admin_id, "lease_expires_at": ticket.lease_expires_at.isoformat()}
+            await coordination.set(key, json.dumps(claim), ttl=self.lease.total_seconds())
+        if created:
+            self._insert(ticket)
+        await self._announce("created" if created else "claimed", ticket)
+        return ticket
+
+    async def release(self, ticket_id: str, admin_id: str) -> Optional[Ticket]:
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None:
+            return None
+        key = self._claim_key(ticket_id)
+        async with coordination.lock(key):
+            owner = await self._owner(ticket)
+            if owner is not None and owner != admin_id:
+                raise EscalationClaimedError(ticket)
+            await coordination.delete(key)
+        self._release(ticket)
+        await self._share("released", ticket)
+        return ticket
+
+    async def resolve(self, ticket_id: str, admin_id: str) -> None:
+        # The claim is replaced by a tombstone that outlives the resolved
+        # event, so no admin can claim the ticket again meanwhile.
+        ticket = self._tickets.pop(ticket_id, None)
+        tombstone = {
+            "admin_id": admin_id,
+            "lease_expires_at": (datetime.utcnow() + self.lease).isoformat(),
+            "resolved": True,
+        }
+        await coordination.set(self._claim_key(ticket_id), json.dumps(tombstone), ttl=self.lease.total_seconds())
+        if ticket is not None:
+            await self._announce("resolved", ticket)
+
+    async def sync_claims(self) -> None:
+        for ticket in list(self._tickets.values()):
+            if await self._owner(ticket) is None:
+                ticket.claimed_by = None
+                ticket.lease_expires_at = None
+
+    def apply(self, event: dict) -> None:
+        # A change published by another worker.
+        incoming = Ticket.from_dict(event["ticket"])
+        kind = event["type"]
+        if kind == "created":
+            if incoming.id not in self._tickets:
+                self._insert(incoming)
+                self._publish(kind, incoming)
+            return
+        if kind == "resolved":
+            ticket = self._tickets.pop(incoming.id, None)
+        else:
+            ticket = self._tickets.get(incoming.id)
+        if ticket is None:
+            return
+        ticket.claimed_by = incoming.claimed_by
+        ticket.lease_expires_at = incoming.lease_expires_at
+        self._publish(kind, ticket)
+
+    def expire_leases(self) -> None:
+        now = datetime.utcnow()
+        for ticket in self._tickets.values():
+            if ticket.claimed_by is not None and not ticket.lease_active(now):
+                self._release(ticket)
+
+    def _release(self, ticket: Ticket) -> None:
+        ticket.claimed_by = None
+        ticket.lease_expires_at = None
+        self._publish("released", ticket)
+
+    async def _announce(self, kind: str, ticket: Ticket) -> None:
+        self._publish(kind, ticket)
+        await self._share(kind, ticket)
+
+    async def _share(self, kind: str, ticket: Ticket) -> None:
+        await coordination.publish(ESCALATION_CHANNEL, {"type": kind, "ticket": ticket.as_dict()})
+
+    def _publish(self, kind: str, ticket: Ticket) -> None:
+        if not self._subscribers:
+            return
+        event = {"type": kind, "ticket": ticket.as_dict()}
+        for subscription in list(self._subscribers):
+            if not subscription.push(event):
+                # A dashboard that stopped reading is cut off rather than
+                # buffered without bound; it gets a fresh snapshot on reconnect.
+                self._subscribers.discard(subscription)
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.push(None)
+
+    async def feed(self, heartbeat: float) -> AsyncIterator[dict]:
+        subscription = Subscription(self.feed_buffer)
+        self._subscribers.add(subscription)
+        try:
+            yield {"type": "snapshot", "tickets": [t.as_dict() for t in self.pending()]}
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    self.expire_leases()
+                    yield {"type": "ping"}
+                    continue
+                if event is None:
+                    break
+                yield event
+        finally:
+            self._subscribers.discard(subscription)
+
+
+escalation_queue = EscalationQueue(
+    lease_seconds=settings.ESCALATION_LEASE_SECONDS,
+    feed_buffer=settings.ESCALATION_FEED_BUFFER,
+)
+
+
+async def _escalation_changed(event: dict) -> None:
+    escalation_queue.apply(event)
+
+
+coordination.subscribe(ESCALATION_CHANNEL, _escalation_changed)
+coordination.on_connect(escalation_queue.sync_claims)
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import sys
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.user import Property, Room
+from app.schemas.schemas import PropertyCreate, RoomCreate
+
+# One record per room, carrying its property's fields; a record without a
+# room_name only creates (or names) the property. Rows sharing a
+# property_ref (default: name + location) belong to one new property, and
+# property_id attaches rooms to an existing one. Exports use the same
+# layout, with property_id and room_id filled in.
+FIELDS = [
+    "property_id", "property_ref", "name", "location", "description",
+    "contact_name", "contact_email", "contact_phone", "amenities", "images",
+    "room_id", "room_name", "room_description", "max_occupancy", "base_rate",
+]
+PROPERTY_FIELDS = [
+    "name", "location", "description", "contact_name", "contact_email", "contact_phone", "amenities", "images",
+]
+ROOM_FIELDS = {"room_name": "name", "room_description": "description", "max_occupancy": "max_occupancy",
+               "base_rate": "base_rate"}
+LIST_FIELDS = ("amenities", "images")
+LIST_SEPARATOR = "|"
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class InventoryRowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.properties_created = 0
+        self.rooms_created = 0
+        self.rows_failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, line: int, error: str) -> None:
+        self.rows_failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "properties_created": self.properties_created,
+            "rooms_created": self.rooms_created,
+            "rows_failed": self.rows_failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+def format_for(content_type: Optional[str]) -> str:
+    if content_type and ("json" in content_type):
+        return "ndjson"
+    return "csv"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    # Yields (line number, record, error) without holding more than one
+    # record of the upload in memory.
+    if fmt == "ndjson":
+        line_no = 0
+        async for line in iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_no, None, f"Invalid JSON: {exc}"
+                continue
+            if isinstance(record, dict):
+                yield line_no, record, None
+            else:
+                yield line_no, None, "Expected a JSON object"
+        return
+
+    header: Optional[List[str]] = None
+    buffered, start, line_no = "", 0, 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not buffered:
+            start = line_no
+        buffered += line + "\n"
+        # A quoted field may span lines; the record ends once quotes balance.
+        if buffered.count('"') % 2:
+            continue
+        text, buffered = buffered, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as exc:
+            yield start, None, f"Invalid CSV: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            unknown = sorted(set(header) - set(FIELDS))
+            if unknown:
+                yield start, None, f"Unknown columns: {', '.join(unknown)}"
+                return
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield start, dict(zip(header, values)), None
+    if buffered.strip():
+        yield start, None, "Unterminated quoted field"
+
+
+def _clean(record: dict) -> dict:
+    cleaned = {}
+    for key, value in record.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if key in LIST_FIELDS:
+                value = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+        if value in ("", None):
+            continue
+        cleaned[key] = value
+    return cleaned
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+        )
+    return str(exc)
+
+
+def parse_record(record: dict) -> Tuple[Optional[str], str, Optional[dict], Optional[dict]]:
+    # -> (existing property id, property key, property values, room values)
+    record = _clean(record)
+    unknown = sorted(set(record) - set(FIELDS))
+    if unknown:
+        raise InventoryRowError(f"Unknown fields: {', '.join(unknown)}")
+    room = None
+    if "room_name" in record:
+        room = RoomCreate(**{
+            ROOM_FIELDS[field]: record[field] for field in ROOM_FIELDS if field in record
+        }).model_dump()
+    elif any(field in record for field in ROOM_FIELDS):
+        raise InventoryRowError("room_name is required for a room")
+    property_id = record.get("property_id")
+    if property_id:
+        # Property fields are ignored here; existing properties are not
+        # updated by an import.
+        return str(property_id), str(property_id), None, room
+    values = PropertyCreate(**{field: record[field] for field in PROPERTY_FIELDS if field in record}).model_dump()
+    key = str(record.get("property_ref") or f"{values['name']}\x00{values['location']}")
+    return None, key, values, room
+
+
+async def _import_batch(
+    db: AsyncSession, batch: List[Tuple[int, dict]], known: Dict[str, str], report: ImportReport
+) -> None:
+    parsed = []
+    for line, record in batch:
+        try:
+            parsed.append((line, *parse_record(record)))
+        except (ValidationError, InventoryRowError) as exc:
+            report.fail(line, _describe(exc))
+
+    referenced = {existing for _, existing, _, _, _ in parsed if existing}
+    found = set(await db.scalars(select(Property.id).where(Property.id.in_(referenced)))) if referenced else set()
+
+    now = datetime.utcnow()
+    properties, rooms, lines, created = [], [], [], []
+    for line, existing, key, values, room in parsed:
+        if existing:
+            if existing not in found:
+                report.fail(line, f"Unknown property_id {existing}")
+                continue
+            property_id = existing
+        else:
+            property_id = known.get(key)
+            if property_id is None:
+                property_id = known[key] = str(uuid.uuid4())
+                created.append(key)
+                properties.append({"id": property_id, **values, "created_at": now, "updated_at": now})
+        if room is not None:
+            rooms.append({"id": str(uuid.uuid4()), "property_id": property_id, **room, "created_at": now})
+        lines.append(line)
+
+    try:
+        if properties:
+            await db.execute(insert(Property), properties)
+        if rooms:
+            await db.execute(insert(Room), rooms)
+        await db.commit()
+    except SQLAlchemyError as exc:
+        await db.rollback()
+        for key in created:
+            known.pop(key, None)
+        for line in lines:
+            report.fail(line, f"Batch rejected by the database: {exc.__class__.__name__}")
+        return
+    report.properties_created += len(properties)
+    report.rooms_created += len(rooms)
+
+
+async def import_inventory(
+    db: AsyncSession,
+    records: AsyncIterator[Tuple[int, Optional[dict], Optional[str]]],
+    batch_size: int = settings.INVENTORY_BATCH_SIZE,
+) -> ImportReport:
+    # Each batch is validated, bulk inserted and committed on its own, so a
+    # bad row costs only itself and a database error only its batch.
+    report = ImportReport(settings.INVENTORY_MAX_ERRORS)
+    known: Dict[str, str] = {}
+    batch: List[Tuple[int, dict]] = []
+    async for line, record, error in records:
+        if error is not None:
+            report.fail(line, error)
+            continue
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            await _import_batch(db, batch, known, report)
+            batch = []
+    if batch:
+        await _import_batch(db, batch, known, report)
+    return report
+
+
+def _export_row(row) -> dict:
+    return {
+        "property_id": row.property_id, "property_ref": row.property_id, "name": row.name,
+        "location": row.location, "description": row.description, "contact_name": row.contact_name,
+        "contact_email": row.contact_email, "contact_phone": row.contact_phone,
+        "amenities": row.amenities or [], "images": row.images or [], "room_id": row.room_id,
+        "room_name": row.room_name, "room_description": row.room_description,
+        "max_occupancy": row.max_occupancy, "base_rate": row.base_rate,
+    }
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(value)
+    return str(value)
+
+
+async def export_inventory(fmt: str, batch_size: int = settings.INVENTORY_BATCH_SIZE) -> AsyncIterator[bytes]:
+    # Opens its own session: a streaming response outlives the request's
+    # dependencies. Rows come from a server-side cursor one batch at a time.
+    stmt = (
+        select(
+            Property.id.label("property_id"), Property.name, Property.location, Property.description,
+            Property.contact_name, Property.contact_email, Property.contact_phone,
+            Property.amenities, Property.images, Room.id.label("room_id"), Room.name.label("room_name"),
+            Room.description.label("room_description"), Room.max_occupancy, Room.base_rate,
+        )
+        .outerjoin(Room, Room.property_id == Property.id)
+        .order_by(Property.created_at, Property.id, Room.created_at, Room.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if fmt == "csv":
+        yield (",".join(FIELDS) + "\r\n").encode()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            if fmt == "ndjson":
+                yield b"".join(dumps(_export_row(row)) + b"\n" for row in rows)
+                continue
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                record = _export_row(row)
+                writer.writerow([_csv_value(record[field]) for field in FIELDS])
+            yield buffer.getvalue().encode()
+
+
+async def _read_file(path: str, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def _run_import(path: str, fmt: str) -> ImportReport:
+    try:
+        async with AsyncSessionLocal() as db:
+            return await import_inventory(db, iter_records(_read_file(path), fmt))
+    finally:
+        await async_engine.dispose()
+
+
+async def _run_export(path: Optional[str], fmt: str) -> None:
+    out = open(path, "wb") if path else sys.stdout.buffer
+    try:
+        async for chunk in export_inventory(fmt):
+            out.write(chunk)
+    finally:
+        if path:
+            out.close()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import or export properties and rooms")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="import a CSV or NDJSON file")
+    load.add_argument("path")
+    load.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    dump = commands.add_parser("export", help="export every property and room")
+    dump.add_argument("-o", "--output", help="default: stdout")
+    dump.add_argument("--format", choices=FORMATS, default="csv")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        asyncio.run(_run_export(args.output, args.format))
+        return
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    report = asyncio.run(_run_import(args.path, fmt))
+    for error in report.errors:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    summary = report.as_dict()
+    print(f"{summary['properties_created']} properties and {summary['rooms_created']} rooms created, "
+          f"{summary['rows_failed']} rows failed")
+    sys.exit(1 if report.rows_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.coordination import coordination
+from app.db.database import SessionLocal
+from app.models.user import Document
+from app.services.embeddings import get_embedder
+from app.services.vector_index import VectorIndex, replace_file
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it its "
+    "me my of on or our that the this to was what when where which who will "
+    "with you your".split()
+)
+PASSAGE_CHARS = 600
+INDEX_FORMAT_VERSION = 2
+SYNC_BATCH = 500
+DOCUMENT_CHANNEL = "documents"
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def split_passages(content: str, max_chars: int = PASSAGE_CHARS) -> List[str]:
+    passages = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            passages.append(current)
+            current = ""
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+def split_document(document_id: str, title: str, content: str) -> List[Tuple[str, str]]:
+    # (passage key, passage text) for every passage a document is split into.
+    return [(f"{document_id}:{position}", text) for position, text in enumerate(split_passages(content) or [title])]
+
+
+def content_hash(title: str, content: str) -> str:
+    return hashlib.blake2b(f"{title}\x00{content}".encode(), digest_size=16).hexdigest()
+
+
+class KnowledgeBaseIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        # passage key -> {"doc_id", "title", "text", "length"}
+        self._passages: Dict[str, dict] = {}
+        self._doc_passages: Dict[str, List[str]] = {}
+        # document id -> content_hash of what was indexed
+        self._doc_hashes: Dict[str, str] = {}
+        # term -> {passage key: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_passages)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._doc_passages
+
+    def add_document(self, document_id: str, title: str, content: str) -> None:
+        with self._lock:
+            self._remove(document_id)
+            keys = []
+            for key, text in split_document(document_id, title, content):
+                # The title is indexed with every passage so that a query for a
+                # policy name still ranks all of its passages.
+                terms = Counter(tokenize(title) + tokenize(text))
+                length = sum(terms.values())
+                self._passages[key] = {
+                    "doc_id": document_id,
+                    "title": title,
+                    "text": text,
+                    "length": length,
+                }
+                self._total_length += length
+                for term, freq in terms.items():
+                    self._postings.setdefault(term, {})[key] = freq
+                keys.append(key)
+            self._doc_passages[document_id] = keys
+            self._doc_hashes[document_id] = content_hash(title, content)
+
+    def remove_document(self, document_id: str) -> None:
+        with self._lock:
+            self._remove(document_id)
+
+    def _remove(self, document_id: str) -> None:
+        self._doc_hashes.pop(document_id, None)
+        for key in self._doc_passages.pop(document_id, []):
+            passage = self._passages.pop(key)
+            self._total_length -= passage["length"]
+            for term in set(tokenize(passage["title"]) + tokenize(passage["text"])):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, top_k: int = 3) -> List[dict]:
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            total = len(self._passages)
+            if not total:
+                return []
+            avg_length = self._total_length / total
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, freq in postings.items():
+                    length = self._passages[key]["length"]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[key] = scores.get(key, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {
+                    "key": key,
+                    "document_id": self._passages[key]["doc_id"],
+                    "title": self._passages[key]["title"],
+                    "passage": self._passages[key]["text"],
+                    "score": score,
+                }
+                for key, score in ranked
+            ]
+
+    def document_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._doc_passages)
+
+    def passage(self, key: str) -> Optional[dict]:
+        return self._passages.get(key)
+
+    def document_passages(self, document_id: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [
+                (key, f"{self._passages[key]['title']}\n{self._passages[key]['text']}")
+                for key in self._doc_passages.get(document_id, [])
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._passages.clear()
+            self._doc_passages.clear()
+            self._doc_hashes.clear()
+            self._postings.clear()
+            self._total_length = 0
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            # Passage entries are replaced, never modified, so shallow copies
+            # are enough for the dump to run outside the lock.
+            data = {
+                "version": INDEX_FORMAT_VERSION,
+                "passages": dict(self._passages),
+                "doc_passages": {doc_id: list(keys) for doc_id, keys in self._doc_passages.items()},
+                "doc_hashes": dict(self._doc_hashes),
+            }
+        replace_file(path, lambda f: json.dump(data, f))
+
+    def load(self, path: str) -> bool:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            return False
+        with self._lock:
+            self.clear()
+            self._passages = data["passages"]
+            self._doc_passages = data["doc_passages"]
+            self._doc_hashes = data["doc_hashes"]
+            for key, passage in self._passages.items():
+                self._total_length += passage["length"]
+                terms = Counter(tokenize(passage["title"]) + tokenize(passage["text"]))
+                for term, freq in terms.items():
+                    self._postings.setdefault(term, {})[key] = freq
+        return True
+
+    def sync(self, db: Session) -> List[str]:
+        # Catches up with documents added, deleted or edited in the database
+        # since the index was saved; returns the ids that were (re)indexed.
+        current_ids = set()
+        changed = []
+        rows = db.query(Document.id, Document.title, Document.content).yield_per(SYNC_BATCH)
+        for row in rows:
+            current_ids.add(row.id)
+            if self._doc_hashes.get(row.id) != content_hash(row.title, row.content):
+                self.add_document(row.id, row.title, row.content)
+                changed.append(row.id)
+        with self._lock:
+            for stale_id in set(self._doc_passages) - current_ids:
+                self._remove(stale_id)
+        return changed
+
+
+knowledge_index = KnowledgeBaseIndex()
+_vector_index: Optional[VectorIndex] = None
+# Only the process that prepared the index files writes them; gunicorn
+# workers keep private in-memory changes on top of that snapshot.
+_persist = True
+_persist_lock = threading.Lock()
+# Held while either index changes and while a hybrid search reads both, so a
+# search never sees a document in one index and not the other.
+_index_lock = threading.RLock()
+_saving = threading.Lock()
+_persist_timer: Optional[threading.Timer] = None
+
+
+def _index_path() -> Optional[str]:
+    return settings.KNOWLEDGE_INDEX_PATH or None
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    global _vector_index
+    if not settings.VECTOR_SEARCH_ENABLED:
+        return None
+    if _vector_index is None:
+        _vector_index = VectorIndex(
+            get_embedder().dim,
+            path=settings.VECTOR_INDEX_PATH or None,
+            nprobe=settings.VECTOR_NPROBE,
+        )
+        _vector_index.load(writable=_persist)
+        if not _persist:
+            _vector_index.path = None
+    return _vector_index
+
+
+def _embed_document(vectors: VectorIndex, document_id: str) -> None:
+    passages = knowledge_index.document_passages(document_id)
+    if passages:
+        keys, texts = zip(*passages)
+        vectors.add(list(keys), get_embedder().embed(list(texts)))
+
+
+def _embed_passages(document: Document) -> Tuple[List[str], np.ndarray]:
+    # Embeds the same text KnowledgeBaseIndex.document_passages returns.
+    passages = split_document(document.id, document.title, document.content)
+    keys = [key for key, _ in passages]
+    return keys, get_embedder().embed([f"{document.title}\n{text}" for _, text in passages])
+
+
+def _train(vectors: VectorIndex) -> None:
+    # Retraining the centroids only changes which lists a search probes, not
+    # which passages exist, so it runs outside _index_lock; VectorIndex.train
+    # holds its own lock just to swap the centroids in.
+    if vectors.needs_training():
+        vectors.train()
+
+
+def persist_index() -> None:
+    if not _persist:
+        return
+    path = _index_path()
+    if path:
+        knowledge_index.save(path)
+    vectors = get_vector_index()
+    if vectors is not None:
+        vectors.save()
+
+
+def schedule_persist() -> None:
+    # Saving rewrites both index files, so document changes are gathered for
+    # KNOWLEDGE_PERSIST_DELAY seconds and written once. Changes still pending
+    # at a crash are not lost: the next startup syncs the index against the
+    # documents table.
+    global _persist_timer
+    if not _persist:
+        return
+    if settings.KNOWLEDGE_PERSIST_DELAY <= 0:
+        persist_index()
+        return
+    with _persist_lock:
+        if _persist_timer is None:
+            _persist_timer = threading.Timer(settings.KNOWLEDGE_PERSIST_DELAY, flush_index)
+            _persist_timer.daemon = True
+            _persist_timer.start()
+
+
+def flush_index() -> None:
+    # Writes any scheduled save now; a change made while saving schedules
+    # the next one. A save already running is waited for, so shutdown never
+    # returns halfway through one.
+    global _persist_timer
+    with _saving:
+        with _persist_lock:
+            timer, _persist_timer = _persist_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        persist_index()
+
+
+def load_knowledge_index(db: Session, persist: bool = True) -> None:
+    global _persist
+    _persist = persist
+    path = _index_path()
+    if path:
+        knowledge_index.load(path)
+    with _index_lock:
+        changed = set(knowledge_index.sync(db))
+        vectors = get_vector_index()
+        if vectors is not None:
+            # Reconcile vectors with the lexical index: only documents that
+            # were (re)indexed or whose passages are missing are re-embedded.
+            live_keys = set()
+            for doc_id in knowledge_index.document_ids():
+                keys = [key for key, _ in knowledge_index.document_passages(doc_id)]
+                live_keys.update(keys)
+                if doc_id in changed or any(key not in vectors for key in keys):
+                    _embed_document(vectors, doc_id)
+            vectors.remove([key for key in vectors.keys() if key not in live_keys])
+    if vectors is not None:
+        _train(vectors)
+    persist_index()
+
+
+def index_document(document: Document) -> None:
+    vectors = get_vector_index()
+    # Embedding is the slow part, so it happens before the lock is taken.
+    keys, embeddings = _embed_passages(document) if vectors is not None else ([], None)
+    with _index_lock:
+        if vectors is not None:
+            vectors.remove([key for key, _ in knowledge_index.document_passages(document.id)])
+        knowledge_index.add_document(document.id, document.title, document.content)
+        if vectors is not None:
+            vectors.add(keys, embeddings)
+    if vectors is not None:
+        _train(vectors)
+    schedule_persist()
+
+
+def unindex_document(document_id: str) -> None:
+    vectors = get_vector_index()
+    with _index_lock:
+        if vectors is not None:
+            vectors.remove([key for key, _ in knowledge_index.document_passages(document_id)])
+        knowledge_index.remove_document(document_id)
+    schedule_persist()
+
+
+async def announce_document(document_id: str) -> None:
+    # Other workers re-read the document instead of trusting the message.
+    await coordination.publish(DOCUMENT_CHANNEL, {"document_id": document_id})
+
+
+def _reindex(document_id: str) -> None:
+    db = SessionLocal()
+    try:
+        document = db.get(Document, document_id)
+        if document is None:
+            unindex_document(document_id)
+        else:
+            index_document(document)
+    finally:
+        db.close()
+
+
+async def _document_changed(message: dict) -> None:
+    await run_in_threadpool(_reindex, message["document_id"])
+
+
+coordination.subscribe(DOCUMENT_CHANNEL, _document_changed)
+
+
+def search_documents(query: str, top_k: Optional[int] = None) -> List[dict]:
+    # Blocking: embeds the query and waits on _index_lock, so async callers
+    # run it in the threadpool.
+    top_k = top_k or settings.KNOWLEDGE_TOP_K
+    vectors = get_vector_index()
+    if vectors is None or not len(vectors):
+        return knowledge_index.search(query, top_k)
+
+    # Hybrid retrieval: BM25 scores are scaled to [0, 1] by the best hit and
+    # blended with cosine similarity over the union of both candidate sets.
+    pool = max(top_k * 4, 20)
+    query_vector = get_embedder().embed([query])[0]
+    with _index_lock:
+        lexical = {hit["key"]: hit["score"] for hit in knowledge_index.search(query, pool)}
+        semantic = dict(vectors.search(query_vector, pool))
+        best_lexical = max(lexical.values(), default=0.0) or 1.0
+        alpha = settings.HYBRID_LEXICAL_WEIGHT
+        scores = {
+            key: alpha * lexical.get(key, 0.0) / best_lexical + (1 - alpha) * max(semantic.get(key, 0.0), 0.0)
+            for key in set(lexical) | set(semantic)
+        }
+        results = []
+        for key, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            passage = knowledge_index.passage(key)
+            if passage is None or score < settings.HYBRID_MIN_SCORE:
+                continue
+            results.append({
+                "key": key,
+                "document_id": passage["doc_id"],
+                "title": passage["title"],
+                "passage": passage["text"],
+                "score": score,
+            })
+            if len(results) == top_k:
+                break
+    return results
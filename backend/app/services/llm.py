@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+SYSTEM_PROMPT = (
+    "You are TravelMate, a helpful travel agency assistant. Answer using the "
+    "knowledge base excerpts and the property list you are given. If nothing "
+    "relevant is available, ask the traveler for their destination, dates and "
+    "preferences."
+)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMError(Exception):
+    pass
+
+
+def llm_enabled() -> bool:
+    return bool(settings.OPENAI_API_KEY)
+
+
+def build_messages(
+    user_message: str, context: str, properties: list, history: Optional[List[dict]] = None
+) -> List[dict]:
+    facts = []
+    if context:
+        facts.append(f"Knowledge base:\n{context}")
+    if properties:
+        lines = []
+        for prop_data in properties:
+            prop = prop_data["property"]
+            rooms = ", ".join(f"{room.name} (${room.base_rate}/night)" for room in prop_data["rooms"])
+            lines.append(f"- {prop.name} ({prop.location}): {prop.description or ''} Rooms: {rooms or 'none listed'}")
+        facts.append("Matching properties:\n" + "\n".join(lines))
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if facts:
+        messages.append({"role": "system", "content": "\n\n".join(facts)})
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str],
+        model: str,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 60,
+        connect_timeout: float = 5,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Lets benchmarks and local runs swap in a stub LLM without a network.
+        self.transport: Optional[httpx.AsyncBaseTransport] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # The client and semaphore are bound to the running loop; a new loop
+        # (e.g. a fresh test client) gets fresh ones.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _payload(self, messages: List[dict], stream: bool, **params) -> dict:
+        return {"model": self.model, "messages": messages, "stream": stream, **params}
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), 30.0)
+                except ValueError:
+                    pass
+        # Full jitter keeps a burst of failed callers from retrying in lockstep.
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def _send(self, payload: dict, stream: bool, timeout: Optional[float]) -> httpx.Response:
+        client = self._ensure_client()
+        request_timeout = httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                request = client.build_request(
+                    "POST", "/chat/completions", json=payload, timeout=request_timeout
+                )
+                response = await client.send(request, stream=stream)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                        raise LLMError(f"LLM request failed with status {response.status_code}")
+                    return response
+                await response.aclose()
+                error = LLMError(f"LLM request failed with status {response.status_code}")
+            except httpx.TransportError as exc:
+                error = LLMError(str(exc) or exc.__class__.__name__)
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._retry_delay(attempt, response))
+        raise LLMError("LLM request failed")
+
+    async def _complete(self, payload: dict, timeout: Optional[float]) -> str:
+        self._ensure_client()
+        async with self._semaphore:
+            response = await self._send(payload, stream=False, timeout=timeout)
+            try:
+                data = response.json()
+                return data["choices"][0]["message"]["content"] or ""
+            except (ValueError, KeyError, IndexError) as exc:
+                raise LLMError("Malformed LLM response") from exc
+
+    async def complete(self, messages: List[dict], timeout: Optional[float] = None, **params) -> str:
+        self._ensure_client()
+        payload = self._payload(messages, stream=False, **params)
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        future = self._inflight.get(key)
+        if future is None:
+            # Identical prompts already in flight share one upstream call.
+            future = asyncio.ensure_future(self._complete(payload, timeout))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def stream(self, messages: List[dict], timeout: Optional[float] = None, **params) -> AsyncIterator[str]:
+        self._ensure_client()
+        payload = self._payload(messages, stream=True, **params)
+        async with self._semaphore:
+            response = await self._send(payload, stream=True, timeout=timeout)
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data).get("choices") or [{}]
+                    except ValueError as exc:
+                        raise LLMError("Malformed LLM stream chunk") from exc
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            except httpx.HTTPError as exc:
+                raise LLMError(str(exc) or exc.__class__.__name__) from exc
+            finally:
+                await response.aclose()
+
+
+llm_gateway = LLMGateway(
+    base_url=settings.OPENAI_BASE_URL,
+    api_key=settings.OPENAI_API_KEY,
+    model=settings.OPENAI_MODEL,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff=settings.LLM_RETRY_BACKOFF,
+    timeout=settings.LLM_TIMEOUT,
+    connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+)
+
+
+async def complete_chat(messages: List[dict]) -> str:
+    return await llm_gateway.complete(messages)
+
+
+async def stream_chat_completion(messages: List[dict]) -> AsyncIterator[str]:
+    async for token in llm_gateway.stream(messages):
+        yield token
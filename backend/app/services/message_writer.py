@@ -0,0 +1,209 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.instrumentation import current_request
+from app.core.metrics import registry
+from app.db.database import AsyncSessionLocal
+from app.models.user import ConversationContext, Message
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODES = ("sync", "group", "async")
+
+messages_written = registry.counter(
+    "chat_messages_written_total", "Chat messages persisted by the message writer", ["mode"]
+)
+write_batch_size = registry.histogram(
+    "chat_message_write_batch_size",
+    "Messages per write-behind transaction",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+write_failures = registry.counter(
+    "chat_message_write_failures_total", "Write-behind batches that failed to commit"
+)
+
+
+def materialize(message: Message) -> dict:
+    # Column defaults normally run at flush; queued messages need their id
+    # and timestamps up front so callers can return them immediately.
+    row = {}
+    for column in Message.__table__.columns:
+        value = getattr(message, column.key)
+        if value is None and column.default is not None:
+            default = column.default
+            value = default.arg(None) if default.is_callable else default.arg
+            setattr(message, column.key, value)
+        row[column.key] = value
+    return row
+
+
+class PendingWrite:
+    def __init__(self, row: dict, context: Optional[dict], future):
+        self.row = row
+        self.context = context
+        self.future = future
+
+
+class MessageWriter:
+    # Durability modes:
+    #   sync  - commit before returning (one transaction per call)
+    #   group - queue the write and wait until the batch holding it commits;
+    #           concurrent turns share a transaction (group commit)
+    #   async - queue and return immediately; a crash loses whatever is
+    #           still queued
+    def __init__(self, mode: str, batch_size: int, flush_interval: float, max_queue: int):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"MESSAGE_WRITE_MODE must be one of {', '.join(WRITE_MODES)}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.on_failure: Optional[Callable[[str], None]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_queue(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_queue)
+            self._task = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def write(self, message: Message, context: Optional[dict] = None) -> None:
+        # `context` is a conversation_contexts row, inserted or updated. The
+        # writer uses sessions of its own and never touches the caller's; a
+        # caller holding a connection while it waits keeps that connection
+        # from the writer, so callers end their transaction first.
+        item = PendingWrite(materialize(message), context, None)
+        if self.mode == "sync":
+            try:
+                await _write([item])
+            except Exception:
+                if context is not None and self.on_failure is not None:
+                    self.on_failure(context["conversation_id"])
+                raise
+            messages_written.inc(mode=self.mode)
+            return
+
+        queue = self._get_queue()
+        if self.mode == "group":
+            item.future = asyncio.get_running_loop().create_future()
+        await queue.put(item)
+        if item.future is not None:
+            await item.future
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        # The task inherits the context of the request that started it; its
+        # statements belong to no request.
+        current_request.set(None)
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+            batch: List[PendingWrite] = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingWrite]) -> None:
+        try:
+            await _write(batch)
+        except Exception as exc:
+            write_failures.inc()
+            if len(batch) > 1:
+                # One bad row fails the whole transaction; writing the items
+                # one by one loses only the ones that fail on their own.
+                logger.warning("Chat message batch of %d failed; retrying each message alone", len(batch), exc_info=True)
+                for item in batch:
+                    await self._flush([item])
+                return
+            self._failed(batch[0], exc)
+            return
+        write_batch_size.observe(len(batch))
+        messages_written.inc(len(batch), mode=self.mode)
+        for item in batch:
+            if item.future is not None and not item.future.done():
+                item.future.set_result(None)
+
+    def _failed(self, item: PendingWrite, exc: Exception) -> None:
+        if item.context is not None and self.on_failure is not None:
+            self.on_failure(item.context["conversation_id"])
+        if self.mode == "async":
+            logger.error("Dropped chat message %s after a failed write", item.row["id"], exc_info=exc)
+        if item.future is not None and not item.future.done():
+            item.future.set_exception(exc)
+
+    async def drain(self) -> None:
+        # Flushes everything queued so far and stops the flusher; the next
+        # write starts a new one.
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        queue, task = self._queue, self._task
+        self._queue = self._task = None
+        await queue.put(None)
+        await task
+
+
+async def _write(batch: List[PendingWrite]) -> None:
+    contexts = [item.context for item in batch if item.context is not None]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Message), [item.row for item in batch])
+        if contexts:
+            await _apply_contexts(db, contexts)
+        await db.commit()
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        stmt = postgresql.insert(ConversationContext)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(ConversationContext)
+    else:
+        raise NotImplementedError(f"Conversation contexts do not support {dialect}")
+    # Sessions committing concurrently (sync mode) may finish out of order;
+    # the turn_count guard keeps an older snapshot from winning.
+    return stmt.on_conflict_do_update(
+        index_elements=["conversation_id"],
+        set_={column: getattr(stmt.excluded, column) for column in ("summary", "turns", "turn_count", "updated_at")},
+        where=ConversationContext.turn_count < stmt.excluded.turn_count,
+    )
+
+
+async def _apply_contexts(db: AsyncSession, contexts: List[dict]) -> None:
+    # Only the newest state of each conversation is written. Whether its row
+    # exists yet is left to the database: a first turn racing another
+    # worker's updates it instead of failing on the duplicate key.
+    latest = {context["conversation_id"]: context for context in contexts}
+    await db.execute(_upsert(db.bind.dialect.name), list(latest.values()))
+
+
+message_writer = MessageWriter(
+    mode=settings.MESSAGE_WRITE_MODE,
+    batch_size=settings.MESSAGE_WRITE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_WRITE_FLUSH_INTERVAL,
+    max_queue=settings.MESSAGE_WRITE_QUEUE_SIZE,
+)
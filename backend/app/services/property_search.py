@@ -0,0 +1,205 @@
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.models.user import Property
+from app.services.knowledge_base import tokenize
+
+MAX_QUERY_TERMS = 16
+MIN_TERM_LENGTH = 3
+
+
+def _query_terms(query: str) -> List[str]:
+    # Fragments such as the "s" of "what's" would match nearly every row.
+    terms = []
+    for term in tokenize(query):
+        if len(term) >= MIN_TERM_LENGTH and term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _match_modes(terms: List[str]) -> List[str]:
+    # Every term must match first, so extra words narrow the results; only
+    # when that finds nothing does any single term do.
+    return ["all", "any"] if len(terms) > 1 else ["all"]
+
+
+class PropertySearchBackend:
+    def setup(self, engine: Engine) -> None:
+        pass
+
+    def check(self, engine: Engine) -> None:
+        # For processes that did not run setup themselves.
+        pass
+
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[Property]:
+        raise NotImplementedError
+
+
+class LikePropertySearch(PropertySearchBackend):
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[Property]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+        conditions = []
+        for term in terms:
+            pattern = f"%{term}%"
+            conditions.append(or_(
+                Property.name.ilike(pattern),
+                Property.location.ilike(pattern),
+                Property.description.ilike(pattern),
+            ))
+        for mode in _match_modes(terms):
+            stmt = (
+                select(Property)
+                .where(and_(*conditions) if mode == "all" else or_(*conditions))
+                .options(selectinload(Property.rooms))
+                .order_by(Property.name)
+                .limit(limit)
+            )
+            results = list(await db.scalars(stmt))
+            if results:
+                return results
+        return []
+
+
+class SQLiteFTSPropertySearch(PropertySearchBackend):
+    # A standalone FTS5 table keyed by property id, kept in sync by triggers.
+    # External-content tables are avoided because they rely on the implicit
+    # rowid of `properties`, which VACUUM is free to renumber.
+    SETUP_STATEMENTS = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS properties_fts USING fts5(
+            property_id UNINDEXED, name, location, description,
+            tokenize = 'porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS properties_fts_ai AFTER INSERT ON properties BEGIN
+            INSERT INTO properties_fts (property_id, name, location, description)
+            VALUES (new.id, new.name, new.location, coalesce(new.description, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS properties_fts_ad AFTER DELETE ON properties BEGIN
+            DELETE FROM properties_fts WHERE property_id = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS properties_fts_au AFTER UPDATE OF name, location, description ON properties BEGIN
+            DELETE FROM properties_fts WHERE property_id = old.id;
+            INSERT INTO properties_fts (property_id, name, location, description)
+            VALUES (new.id, new.name, new.location, coalesce(new.description, ''));
+        END
+        """,
+    ]
+
+    def setup(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            for statement in self.SETUP_STATEMENTS:
+                conn.execute(text(statement))
+            indexed = conn.execute(text("SELECT count(*) FROM properties_fts")).scalar()
+            total = conn.execute(text("SELECT count(*) FROM properties")).scalar()
+            if indexed != total:
+                conn.execute(text("DELETE FROM properties_fts"))
+                conn.execute(text(
+                    "INSERT INTO properties_fts (property_id, name, location, description) "
+                    "SELECT id, name, location, coalesce(description, '') FROM properties"
+                ))
+
+    def check(self, engine: Engine) -> None:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM properties_fts LIMIT 1"))
+
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[Property]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+        # Only the last term is a prefix, for a word the user is still typing.
+        phrases = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+        for mode in _match_modes(terms):
+            match = (" AND " if mode == "all" else " OR ").join(phrases)
+            stmt = (
+                select(Property)
+                .from_statement(text(
+                    "SELECT properties.* FROM properties_fts "
+                    "JOIN properties ON properties.id = properties_fts.property_id "
+                    "WHERE properties_fts MATCH :match "
+                    "ORDER BY bm25(properties_fts, 0.0, 10.0, 5.0, 1.0) "
+                    "LIMIT :limit"
+                ).bindparams(match=match, limit=limit))
+                .options(selectinload(Property.rooms))
+            )
+            results = list(await db.scalars(stmt))
+            if results:
+                return results
+        return []
+
+
+class PostgresFTSPropertySearch(PropertySearchBackend):
+    DOCUMENT = (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(location, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+    )
+
+    def setup(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_properties_search ON properties "
+                f"USING GIN (({self.DOCUMENT}))"
+            ))
+
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[Property]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+        lexemes = terms[:-1] + [f"{terms[-1]}:*"]
+        for mode in _match_modes(terms):
+            tsquery = (" & " if mode == "all" else " | ").join(lexemes)
+            stmt = (
+                select(Property)
+                .from_statement(text(
+                    f"SELECT properties.* FROM properties "
+                    f"WHERE ({self.DOCUMENT}) @@ to_tsquery('english', :tsquery) "
+                    f"ORDER BY ts_rank(({self.DOCUMENT}), to_tsquery('english', :tsquery)) DESC "
+                    f"LIMIT :limit"
+                ).bindparams(tsquery=tsquery, limit=limit))
+                .options(selectinload(Property.rooms))
+            )
+            results = list(await db.scalars(stmt))
+            if results:
+                return results
+        return []
+
+
+property_search: PropertySearchBackend = LikePropertySearch()
+
+
+def init_property_search(engine: Engine, setup: bool = True) -> None:
+    global property_search
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        backend = SQLiteFTSPropertySearch()
+    elif dialect == "postgresql":
+        backend = PostgresFTSPropertySearch()
+    else:
+        backend = LikePropertySearch()
+    try:
+        if setup:
+            backend.setup(engine)
+        else:
+            backend.check(engine)
+    except OperationalError:
+        # SQLite builds without FTS5 fall back to SQL-side LIKE filtering.
+        backend = LikePropertySearch()
+    property_search = backend
+
+
+async def search_properties(db: AsyncSession, query: str, limit: Optional[int] = None) -> List[Property]:
+    return await property_search.search(db, query, limit or settings.PROPERTY_SEARCH_LIMIT)
@@ -0,0 +1,176 @@
+import math
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.coordination import coordination
+from app.core.metrics import registry
+from app.services.knowledge_base import STOP_WORDS
+
+EMBEDDING_DIM = 512
+VERSION_CHANNEL = "versions"
+EPOCH_KEY = "version:epoch"
+
+cache_lookups = registry.counter(
+    "chat_response_cache_lookups_total",
+    "Chat response cache lookups by result (hit, semantic_hit, miss)",
+    ["result"],
+)
+registry.gauge(
+    "chat_response_cache_hit_ratio",
+    "Share of chat response cache lookups served from the cache",
+    callback=lambda: {(): _hit_ratio()},
+)
+
+
+def _hit_ratio() -> float:
+    hits = cache_lookups.value(result="hit") + cache_lookups.value(result="semantic_hit")
+    total = hits + cache_lookups.value(result="miss")
+    return hits / total if total else 0.0
+
+
+def normalize_message(message: str) -> str:
+    tokens = re.findall(r"[a-z0-9]+", message.lower())
+    return " ".join(t for t in tokens if len(t) > 1 and t not in STOP_WORDS)
+
+
+def embed_message(normalized: str) -> Dict[int, float]:
+    # Hashing-trick bag of words; crc32 keeps buckets stable across processes.
+    vector: Dict[int, float] = {}
+    for token in normalized.split():
+        bucket = zlib.crc32(token.encode()) % EMBEDDING_DIM
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class ResponseCache:
+    SCOPES = ("documents", "catalog")
+
+    def __init__(self, maxsize: int, ttl: float, semantic: bool = False, similarity: float = 0.92):
+        self.semantic = semantic
+        self.similarity = similarity
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._epoch = 0
+        self._versions = {scope: 0 for scope in self.SCOPES}
+        self._lock = threading.Lock()
+
+    def fingerprint(self) -> str:
+        # Any write to the documents or the catalog moves the fingerprint on,
+        # so entries computed against older data can never be served again.
+        return ".".join([f"{self._epoch:x}"] + [str(self._versions[scope]) for scope in self.SCOPES])
+
+    def version(self, scope: str) -> str:
+        return f"{self._epoch:x}.{self._versions[scope]}"
+
+    async def _shared_epoch(self) -> int:
+        # A Redis restarted without persistence counts versions from 1 again,
+        # reusing numbers that already named other data. The epoch key is lost
+        # with the counters, and a new epoch sets every version apart from
+        # the ones issued before the reset.
+        epoch = await coordination.get(EPOCH_KEY)
+        if epoch is None:
+            async with coordination.lock(EPOCH_KEY):
+                epoch = await coordination.get(EPOCH_KEY)
+                if epoch is None:
+                    epoch = str(max(int(time.time() * 1000), self._epoch + 1))
+                    await coordination.set(EPOCH_KEY, epoch)
+        return int(epoch)
+
+    async def invalidate(self, scope: str) -> None:
+        # Versions are counters in the coordination backend, so every worker
+        # moves to the same number and ETags agree whichever one answers.
+        while True:
+            epoch = await self._shared_epoch()
+            version = await coordination.incr(f"version:{scope}")
+            # A reset between reading the epoch and counting would pair the
+            # old epoch with a restarted count.
+            if await coordination.get(EPOCH_KEY) == str(epoch):
+                break
+        self.advance(scope, version, epoch)
+        await coordination.publish(VERSION_CHANNEL, {"scope": scope, "version": version, "epoch": epoch})
+
+    def advance(self, scope: str, version: int, epoch: int) -> None:
+        with self._lock:
+            if epoch < self._epoch:
+                # Sent before a reset this worker has already seen.
+                return
+            if epoch > self._epoch:
+                self._start_epoch(epoch)
+            self._versions[scope] = max(self._versions[scope], version)
+
+    def _start_epoch(self, epoch: int) -> None:
+        self._epoch = epoch
+        self._versions = {scope: 0 for scope in self.SCOPES}
+
+    async def sync_versions(self) -> None:
+        # The backend is authoritative here, even over a newer-looking local
+        # epoch: that one can only have come from before a reset.
+        epoch = await self._shared_epoch()
+        versions = {scope: await coordination.get(f"version:{scope}") for scope in self.SCOPES}
+        with self._lock:
+            if epoch != self._epoch:
+                self._start_epoch(epoch)
+        for scope, version in versions.items():
+            if version is not None:
+                self.advance(scope, int(version), epoch)
+
+    def get(self, message: str) -> Optional[dict]:
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        fingerprint = self.fingerprint()
+        entry = self._entries.get((normalized, fingerprint))
+        if entry is not None:
+            cache_lookups.inc(result="hit")
+            return entry["value"]
+        if self.semantic:
+            vector = embed_message(normalized)
+            best, best_score = None, self.similarity
+            for (_, entry_fingerprint), candidate in self._entries.items():
+                if entry_fingerprint != fingerprint:
+                    continue
+                score = cosine(vector, candidate["vector"])
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                cache_lookups.inc(result="semantic_hit")
+                return best["value"]
+        cache_lookups.inc(result="miss")
+        return None
+
+    def set(self, message: str, value: dict, fingerprint: Optional[str] = None) -> None:
+        normalized = normalize_message(message)
+        if not normalized:
+            return
+        entry = {"value": value, "vector": embed_message(normalized) if self.semantic else None}
+        self._entries.set((normalized, fingerprint or self.fingerprint()), entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+response_cache = ResponseCache(
+    maxsize=settings.CHAT_CACHE_SIZE,
+    ttl=settings.CHAT_CACHE_TTL,
+    semantic=settings.CHAT_CACHE_SEMANTIC,
+    similarity=settings.CHAT_CACHE_SIMILARITY,
+)
+
+
+async def _version_changed(message: dict) -> None:
+    response_cache.advance(message["scope"], message["version"], message["epoch"])
+
+
+coordination.subscribe(VERSION_CHANNEL, _version_changed)
+coordination.on_connect(response_cache.sync_versions)
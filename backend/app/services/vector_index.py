@@ -0,0 +1,225 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_FORMAT_VERSION = 1
+INITIAL_CAPACITY = 1024
+
+
+def replace_file(path: str, write: Callable, mode: str = "w") -> None:
+    # Writes to a private temp file next to `path` and renames it over the
+    # old one: readers see the old or the new file, never a partial one, and
+    # concurrent saves do not share a temp file.
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory or ".")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class VectorIndex:
+    # Unit vectors stored row-wise in a float32 matrix (memory-mapped when a
+    # path is given). Deleted rows are zeroed and recycled, so adds and
+    # deletes never rebuild the matrix. Once the index is large enough an
+    # IVF coarse quantiser (k-means centroids plus per-centroid slot lists)
+    # restricts each search to the `nprobe` closest lists.
+    def __init__(self, dim: int, path: Optional[str] = None, nprobe: int = 8, train_threshold: int = 4096):
+        self.dim = dim
+        self.path = path
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self._lock = threading.RLock()
+        self._matrix = self._allocate(INITIAL_CAPACITY)
+        self._keys: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[set] = []
+        self._assignment: Dict[int, int] = {}
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def keys(self) -> List[str]:
+        return list(self._slots)
+
+    def _matrix_path(self) -> Optional[str]:
+        return f"{self.path}.npy" if self.path else None
+
+    def _allocate(self, capacity: int, path: Optional[str] = None) -> np.ndarray:
+        if path:
+            return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        return np.zeros((capacity, self.dim), dtype=np.float32)
+
+    def _grow(self) -> None:
+        capacity = self._matrix.shape[0] * 2
+        matrix_path = self._matrix_path()
+        if matrix_path:
+            tmp_path = f"{self.path}.grow.npy"
+            grown = self._allocate(capacity, tmp_path)
+            grown[: self._matrix.shape[0]] = self._matrix
+            grown.flush()
+            del self._matrix
+            os.replace(tmp_path, matrix_path)
+            self._matrix = np.load(matrix_path, mmap_mode="r+")
+        else:
+            grown = self._allocate(capacity)
+            grown[: self._matrix.shape[0]] = self._matrix
+            self._matrix = grown
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def add(self, keys: List[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            self.remove([key for key in keys if key in self._slots])
+            slots = []
+            for key, vector in zip(keys, vectors):
+                if self._free:
+                    slot = self._free.pop()
+                    self._keys[slot] = key
+                else:
+                    slot = len(self._keys)
+                    if slot >= self._matrix.shape[0]:
+                        self._grow()
+                    self._keys.append(key)
+                self._matrix[slot] = vector
+                self._slots[key] = slot
+                slots.append(slot)
+            if self._centroids is not None and slots:
+                for slot, centroid in zip(slots, self._nearest_centroid(vectors)):
+                    self._lists[centroid].add(slot)
+                    self._assignment[slot] = int(centroid)
+
+    def needs_training(self) -> bool:
+        # True once the index has reached train_threshold and doubled since
+        # the centroids were last trained.
+        return len(self._slots) >= self.train_threshold and len(self._slots) >= 2 * self._trained_size
+
+    def remove(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                slot = self._slots.pop(key, None)
+                if slot is None:
+                    continue
+                self._keys[slot] = None
+                self._matrix[slot] = 0
+                self._free.append(slot)
+                centroid = self._assignment.pop(slot, None)
+                if centroid is not None:
+                    self._lists[centroid].discard(slot)
+
+    def train(self, iterations: int = 10, seed: int = 0) -> None:
+        # k-means runs on a copy of the live vectors without holding the lock,
+        # so searches and writes carry on; only swapping in the centroids
+        # locks. Vectors added meanwhile are assigned by _assign_all.
+        with self._lock:
+            live = np.array(sorted(self._slots.values()), dtype=np.int64)
+            if len(live) < 2:
+                return
+            vectors = np.array(self._matrix[live])
+        nlist = max(1, int(np.sqrt(len(live))))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(live), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[labels == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    norm = np.linalg.norm(mean)
+                    centroids[c] = mean / norm if norm else mean
+        with self._lock:
+            self._centroids = centroids.astype(np.float32)
+            self._assign_all()
+            self._trained_size = len(self._slots)
+
+    def _assign_all(self) -> None:
+        self._lists = [set() for _ in range(len(self._centroids))]
+        self._assignment = {}
+        live = np.array(sorted(self._slots.values()), dtype=np.int64)
+        if not len(live):
+            return
+        for slot, c in zip(live.tolist(), self._nearest_centroid(np.asarray(self._matrix[live])).tolist()):
+            self._lists[c].add(slot)
+            self._assignment[slot] = c
+
+    def search(self, vector: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
+        with self._lock:
+            if not self._slots:
+                return []
+            if self._centroids is None:
+                candidates = np.array(sorted(self._slots.values()), dtype=np.int64)
+            else:
+                probes = np.argsort(self._centroids @ vector)[-self.nprobe:]
+                candidates = np.fromiter(
+                    (slot for c in probes for slot in self._lists[c]), dtype=np.int64
+                )
+                if not len(candidates):
+                    return []
+            scores = np.asarray(self._matrix[candidates]) @ vector
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(self._keys[candidates[i]], float(scores[i])) for i in best]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not isinstance(self._matrix, np.memmap):
+                matrix = self._allocate(self._matrix.shape[0], self._matrix_path())
+                matrix[:] = self._matrix
+                self._matrix = matrix
+            self._matrix.flush()
+            meta = {"version": INDEX_FORMAT_VERSION, "dim": self.dim, "keys": list(self._keys)}
+            centroids = self._centroids
+            if centroids is not None:
+                meta["trained_size"] = self._trained_size
+        # train() replaces the centroid array rather than updating it, so the
+        # reference taken under the lock stays consistent.
+        if centroids is not None:
+            replace_file(f"{self.path}.centroids.npy", lambda f: np.save(f, centroids), mode="wb")
+        replace_file(f"{self.path}.json", lambda f: json.dump(meta, f))
+
+    def load(self, writable: bool = True) -> bool:
+        # A read-only load maps the matrix copy-on-write: changes stay in
+        # this process and never reach the file.
+        if not self.path:
+            return False
+        try:
+            with open(f"{self.path}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(self._matrix_path(), mmap_mode="r+" if writable else "c")
+        except (OSError, ValueError):
+            return False
+        if meta.get("version") != INDEX_FORMAT_VERSION or meta.get("dim") != self.dim:
+            return False
+        with self._lock:
+            self._matrix = matrix
+            self._keys = meta["keys"]
+            self._slots = {key: slot for slot, key in enumerate(self._keys) if key is not None}
+            self._free = [slot for slot, key in enumerate(self._keys) if key is None]
+            self._centroids = None
+            self._lists, self._assignment = [], {}
+            try:
+                centroids = np.load(f"{self.path}.centroids.npy")
+            except OSError:
+                centroids = None
+            if centroids is not None and self._slots:
+                self._centroids = centroids
+                self._assign_all()
+                self._trained_size = meta.get("trained_size", len(self._slots))
+        return True
@@ -0,0 +1,43 @@
+import argparse
+
+from app.db.database import SessionLocal, engine, init_db
+from app.db.migrations import schema_lock
+from app.services.availability import init_availability
+from app.services.knowledge_base import load_knowledge_index
+from app.services.property_search import init_property_search
+
+
+def prepare() -> None:
+    # Work that must happen once per deployment rather than once per worker:
+    # migrations, search and constraint DDL, and the knowledge index files.
+    with schema_lock(engine):
+        init_db()
+        init_property_search(engine)
+        init_availability(engine)
+    db = SessionLocal()
+    try:
+        load_knowledge_index(db)
+    finally:
+        db.close()
+
+
+def load_prepared() -> None:
+    # A worker started after prepare() ran elsewhere only picks up its results.
+    init_property_search(engine, setup=False)
+    init_availability(engine, create=False)
+    db = SessionLocal()
+    try:
+        load_knowledge_index(db, persist=False)
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run migrations and build search indexes before starting workers")
+    parser.parse_args()
+    prepare()
+    print("Database and indexes are ready")
+
+
+if __name__ == "__main__":
+    main()
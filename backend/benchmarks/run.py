@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+# Usage (from backend/):
+#   python -m benchmarks.run                       # run and print a report
+#   python -m benchmarks.run --save-baseline       # record benchmarks/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/baseline.json --ignore-latency   # CI
+# The app is driven in-process through httpx's ASGI transport against a
+# freshly seeded SQLite database (or --database-url), with a stub LLM.
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+PERCENTILES = (50, 95, 99)
+
+
+class Scenario(NamedTuple):
+    name: str
+    # (request index) -> (method, url, json body, auth key)
+    build: Optional[Callable[[int], tuple]] = None
+    # Or, instead of an HTTP request: (request index) -> awaitable
+    call: Optional[Callable[[int], Awaitable]] = None
+
+
+class Result(NamedTuple):
+    name: str
+    requests: int
+    errors: int
+    seconds: float
+    latencies: List[float]
+    queries: List[int]
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        report = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throughput": round(self.requests / self.seconds, 1) if self.seconds else 0.0,
+            "queries_per_request": round(sum(self.queries) / len(self.queries), 2) if self.queries else 0.0,
+        }
+        for p in PERCENTILES:
+            rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+            report[f"p{p}_ms"] = round(ordered[rank] * 1000, 2) if ordered else 0.0
+        return report
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    # Must run before anything under app/ is imported: settings are read once.
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/benchmark.db"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+    os.environ["KNOWLEDGE_INDEX_PATH"] = os.path.join(workdir, "knowledge_index.json")
+    os.environ["VECTOR_INDEX_PATH"] = os.path.join(workdir, "knowledge_vectors")
+    for limit in ("LOGIN_RATE_LIMIT_PER_IP", "LOGIN_RATE_LIMIT_PER_EMAIL", "REGISTER_RATE_LIMIT_PER_IP"):
+        os.environ[limit] = "0"
+
+
+def stub_llm_transport(latency: float):
+    import httpx
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        body = json.loads(request.content)
+        if body.get("stream"):
+            chunks = [
+                "data: " + json.dumps({"choices": [{"delta": {"content": word}}]}) + "\n\n"
+                for word in ("Here ", "are ", "some ", "options.")
+            ]
+            return httpx.Response(200, text="".join(chunks) + "data: [DONE]\n\n",
+                                  headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "Here are some options."}}]})
+
+    return httpx.MockTransport(handler)
+
+
+# Query counting: each benchmark request runs with its own counter in a
+# context variable; statements issued outside a request (background
+# flushers started during warm-up) are not attributed to anyone.
+current_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("current_queries", default=None)
+
+
+def count_queries(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = current_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def scenarios(data: Dict[str, list]) -> List[Scenario]:
+    emails = data["traveler_emails"]
+    property_ids = data["property_ids"]
+    rooms = data["rooms"]
+    questions = [
+        "What is the cancellation policy?", "Do you allow pets?", "Beach resorts in Bali",
+        "How do airport transfers work?", "Family friendly stay in Lisbon", "Can I get a refund?",
+    ]
+    # Far-future stays, one per request and room, so every booking succeeds.
+    first_night = date(2035, 1, 1)
+
+    def booking(i: int) -> tuple:
+        property_id, room_id = rooms[i % len(rooms)]
+        check_in = first_night + timedelta(days=3 * (i // len(rooms)))
+        return ("POST", "/api/bookings/", {
+            "property_id": property_id, "room_id": room_id, "guests": 2,
+            "check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=2)).isoformat(),
+        }, "traveler")
+
+    return [
+        Scenario("auth.login", lambda i: (
+            "POST", "/api/auth/login", {"email": emails[i % len(emails)], "password": "benchmark-password"}, None
+        )),
+        Scenario("chat", lambda i: (
+            "POST", "/api/chat",
+            {"message": questions[i % len(questions)], "conversation_id": f"load-{i % 25}"}, "traveler"
+        )),
+        Scenario("bookings.list", lambda i: ("GET", "/api/bookings/", None, "traveler" if i % 4 else "admin")),
+        Scenario("bookings.list.large", lambda i: ("GET", "/api/bookings/?limit=500", None, "admin")),
+        Scenario("bookings.create", booking),
+        Scenario("properties.list", lambda i: ("GET", "/api/properties/", None, None)),
+        # A different page size each time so the response cache cannot answer.
+        Scenario("properties.list.large", lambda i: (
+            "GET", f"/api/properties/?limit={400 + i}", None, None
+        )),
+        Scenario("properties.get", lambda i: (
+            "GET", f"/api/properties/{property_ids[i % len(property_ids)]}", None, None
+        )),
+        Scenario("properties.availability", lambda i: (
+            "GET", f"/api/properties/{property_ids[i % len(property_ids)]}/availability"
+            f"?check_in=2035-06-0{1 + i % 5}&check_out=2035-06-1{i % 5}&guests=2", None, None
+        )),
+    ]
+
+
+def serialization_scenarios() -> List[Scenario]:
+    # The same 500 bookings (and every property) encoded both ways: ORM
+    # instances validated against the response schema, as response_model
+    # does, and plain rows from response_columns dumped as they are, as the
+    # list endpoints do.
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+
+    from app.core.serialization import dumps, response_columns, serialize
+    from app.db.database import AsyncSessionLocal
+    from app.models.user import Booking, Property
+    from app.schemas.schemas import BookingResponse, PropertyResponse
+
+    def orm(model, schema):
+        adapter = TypeAdapter(List[schema])
+
+        async def call(i: int) -> bytes:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.scalars(
+                    select(model).order_by(model.created_at.desc(), model.id.desc()).limit(500)
+                )).all()
+            return serialize(adapter, rows)
+
+        return call
+
+    def raw(model, schema):
+        async def call(i: int) -> bytes:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(*response_columns(model, schema))
+                    .order_by(model.created_at.desc(), model.id.desc()).limit(500)
+                )).mappings().all()
+            return dumps([dict(row) for row in rows])
+
+        return call
+
+    return [
+        Scenario("serialize.bookings.orm", call=orm(Booking, BookingResponse)),
+        Scenario("serialize.bookings.raw", call=raw(Booking, BookingResponse)),
+        Scenario("serialize.properties.orm", call=orm(Property, PropertyResponse)),
+        Scenario("serialize.properties.raw", call=raw(Property, PropertyResponse)),
+    ]
+
+
+async def run_scenario(
+    client, scenario: Scenario, headers: Dict[str, dict], requests: int, concurrency: int, start: int = 0
+) -> Result:
+    latencies, queries = [], []
+    errors = 0
+    next_index = iter(range(start, start + requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in next_index:
+            counter = [0]
+            token = current_queries.set(counter)
+            started = time.perf_counter()
+            try:
+                if scenario.call is not None:
+                    await scenario.call(i)
+                else:
+                    method, url, body, auth = scenario.build(i)
+                    response = await client.request(method, url, json=body, headers=headers.get(auth, {}))
+                    if response.status_code >= 400:
+                        errors += 1
+            finally:
+                latencies.append(time.perf_counter() - started)
+                current_queries.reset(token)
+            queries.append(counter[0])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return Result(scenario.name, requests, errors, time.perf_counter() - started, latencies, queries)
+
+
+async def login(client, email: str) -> dict:
+    response = await client.post("/api/auth/login", json={"email": email, "password": "benchmark-password"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, dict]:
+    import httpx
+    from sqlalchemy import event
+
+    from app.db.database import async_engine, engine, init_db
+    from app.main import app, on_shutdown, on_startup, start_coordination
+    from app.services.llm import llm_gateway
+    from benchmarks.seed import ADMIN_EMAIL, scaled, seed
+
+    init_db()
+    data = seed(engine, scaled(args.scale), seed=args.seed)
+    on_startup()
+    await start_coordination()
+    llm_gateway.transport = stub_llm_transport(args.llm_latency)
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", count_queries)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            headers = {
+                "traveler": await login(client, data["traveler_emails"][0]),
+                "admin": await login(client, ADMIN_EMAIL),
+            }
+            for scenario in scenarios(data) + serialization_scenarios():
+                if args.only and scenario.name not in args.only:
+                    continue
+                # Warm-up uses indices past the measured range so writes such
+                # as bookings never collide with measured ones.
+                await run_scenario(client, scenario, headers, args.warmup, args.concurrency, start=args.requests)
+                result = await run_scenario(client, scenario, headers, args.requests, args.concurrency)
+                results[scenario.name] = result.summary()
+    finally:
+        await on_shutdown()
+    return results
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float, latency: bool = True
+) -> List[str]:
+    # Latency may drift by `tolerance`; query counts are deterministic and
+    # may not grow at all.
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("p95_ms", "p99_ms") if latency else ():
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]} > baseline {previous[metric]}")
+        if current["queries_per_request"] > previous["queries_per_request"] + 0.01:
+            regressions.append(
+                f"{name}: queries/request {current['queries_per_request']} > baseline {previous['queries_per_request']}"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors")
+    return regressions
+
+
+def print_report(results: Dict[str, dict]) -> None:
+    columns = ["requests", "errors", "throughput", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"]
+    print(f"{'scenario':26}" + "".join(f"{c:>21}" for c in columns))
+    for name, summary in results.items():
+        print(f"{name:26}" + "".join(f"{summary[c]:>21}" for c in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the API's hot paths in-process")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the seeded dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the stub LLM takes per call")
+    parser.add_argument("--database-url", help="benchmark an existing empty database instead of a temp SQLite file")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency growth over baseline")
+    parser.add_argument("--ignore-latency", action="store_true",
+                        help="compare only query counts and errors, for machines unlike the baseline's")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_PATH, help="write results as the new baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="travelagent-bench-")
+    configure_environment(args, workdir)
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, latency=not args.ignore_latency)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.core.passwords import hash_password
+from app.models.user import Booking, Document, Message, Property, Room, User
+from app.services.booking_analytics import rebuild
+
+PASSWORD = "benchmark-password"
+ADMIN_EMAIL = "admin@bench.example.com"
+LOCATIONS = ["Bali", "Lisbon", "Kyoto", "Cape Town", "Reykjavik", "Cusco", "Zanzibar", "Queenstown"]
+FEATURES = ["beachfront", "mountain view", "spa", "family friendly", "rooftop pool", "quiet", "historic"]
+TOPICS = [
+    ("Cancellation policy", "Free cancellation up to 48 hours before check-in. Later cancellations are charged one night."),
+    ("Pets", "Pets are welcome in villas for a cleaning fee. Service animals are always allowed."),
+    ("Airport transfers", "Private transfers can be booked up to 24 hours before arrival."),
+    ("Payments", "We accept all major cards. Deposits are refunded within five business days."),
+]
+CHUNK = 1000
+
+DEFAULT_SCALE = {
+    "users": 200,
+    "properties": 50,
+    "rooms_per_property": 4,
+    "bookings": 2000,
+    "documents": 40,
+    "messages": 5000,
+}
+
+
+def scaled(factor: float) -> Dict[str, int]:
+    return {
+        key: value if key == "rooms_per_property" else max(1, int(value * factor))
+        for key, value in DEFAULT_SCALE.items()
+    }
+
+
+def _insert(engine: Engine, model, rows: List[dict]) -> None:
+    with engine.begin() as conn:
+        for start in range(0, len(rows), CHUNK):
+            conn.execute(insert(model), rows[start:start + CHUNK])
+
+
+def seed(engine: Engine, scale: Dict[str, int], seed: int = 0) -> Dict[str, list]:
+    # Deterministic for a given seed so runs are comparable. Returns the ids
+    # and emails the benchmark scenarios need.
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = hash_password(PASSWORD)
+
+    def stamp(i: int) -> datetime:
+        return now - timedelta(minutes=i)
+
+    users = [{
+        "id": str(uuid.uuid4()), "email": ADMIN_EMAIL, "password_hash": password_hash,
+        "full_name": "Benchmark Admin", "role": "admin", "created_at": now, "updated_at": now,
+    }]
+    for i in range(scale["users"]):
+        users.append({
+            "id": str(uuid.uuid4()), "email": f"traveler{i}@bench.example.com", "password_hash": password_hash,
+            "full_name": f"Traveler {i}", "role": "traveler", "created_at": stamp(i), "updated_at": stamp(i),
+        })
+    _insert(engine, User, users)
+    travelers = users[1:]
+
+    properties, rooms = [], []
+    for i in range(scale["properties"]):
+        location = LOCATIONS[i % len(LOCATIONS)]
+        feature = rng.choice(FEATURES)
+        properties.append({
+            "id": str(uuid.uuid4()), "name": f"{location} {feature.title()} Resort {i}",
+            "location": location, "description": f"A {feature} stay in {location}.",
+            "images": [], "amenities": [feature], "created_at": stamp(i), "updated_at": stamp(i),
+        })
+        for j in range(scale["rooms_per_property"]):
+            rooms.append({
+                "id": str(uuid.uuid4()), "property_id": properties[-1]["id"], "name": f"Room {j + 1}",
+                "max_occupancy": rng.choice([2, 2, 3, 4]), "base_rate": rng.choice([90, 120, 180, 250]),
+                "created_at": stamp(i),
+            })
+    _insert(engine, Property, properties)
+    _insert(engine, Room, rooms)
+
+    # Stays per room are laid end to end from 2024 so none overlap.
+    next_free = {room["id"]: date(2024, 1, 1) for room in rooms}
+    bookings = []
+    for i in range(scale["bookings"]):
+        room = rng.choice(rooms)
+        check_in = next_free[room["id"]] + timedelta(days=rng.randint(0, 3))
+        check_out = check_in + timedelta(days=rng.randint(1, 5))
+        next_free[room["id"]] = check_out
+        bookings.append({
+            "id": str(uuid.uuid4()), "user_id": rng.choice(travelers)["id"],
+            "property_id": room["property_id"], "room_id": room["id"],
+            "check_in": check_in, "check_out": check_out, "guests": 2,
+            "total_amount": room["base_rate"] * (check_out - check_in).days,
+            "status": rng.choice(["confirmed", "confirmed", "completed", "pending", "cancelled"]),
+            "payment_status": "paid", "created_at": stamp(i), "updated_at": stamp(i),
+        })
+    _insert(engine, Booking, bookings)
+    with engine.begin() as conn:
+        rebuild(conn)
+
+    documents = []
+    for i in range(scale["documents"]):
+        title, body = TOPICS[i % len(TOPICS)]
+        documents.append({
+            "id": str(uuid.uuid4()), "title": f"{title} ({i})",
+            "content": f"{body}\n\n{rng.choice(LOCATIONS)} specifics: {rng.choice(FEATURES)}.",
+            "created_at": stamp(i),
+        })
+    _insert(engine, Document, documents)
+
+    messages = []
+    conversations = [f"bench-{i}" for i in range(max(1, scale["messages"] // 10))]
+    for i in range(scale["messages"]):
+        escalated = i % 20 == 19
+        messages.append({
+            "id": str(uuid.uuid4()), "user_id": rng.choice(travelers)["id"],
+            "conversation_id": conversations[i % len(conversations)],
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Message {i} about {rng.choice(LOCATIONS)}",
+            "is_escalation": escalated,
+            "escalation_status": ("pending" if i % 40 == 39 else "resolved") if escalated else None,
+            "created_at": stamp(scale["messages"] - i),
+        })
+    _insert(engine, Message, messages)
+
+    return {
+        "traveler_emails": [user["email"] for user in travelers],
+        "property_ids": [prop["id"] for prop in properties],
+        "rooms": [(room["property_id"], room["id"]) for room in rooms],
+    }
@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+from app.core.config import settings
+
+# Loaded by `gunicorn app.main:app` from the working directory. Every value
+# comes from Settings, so the same environment variables configure both
+# gunicorn and the app.
+bind = settings.WEB_BIND
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+timeout = settings.WEB_TIMEOUT
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT
+keepalive = settings.WEB_KEEPALIVE
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER
+accesslog = "-"
+
+# Caches, rate limits and escalation claims are only shared between
+# workers through Redis; with the in-memory backend they would diverge.
+single_worker = settings.COORDINATION_BACKEND == "memory" and workers > 1
+if single_worker:
+    workers = 1
+
+
+def on_starting(server):
+    if single_worker:
+        server.log.warning("COORDINATION_BACKEND=memory: starting 1 worker; set it to redis to use more")
+    if settings.PREPARE_ON_STARTUP:
+        # Once, in a child process: the master must not hold database
+        # connections or index files that forked workers would inherit.
+        subprocess.run([sys.executable, "-m", "app.startup"], check=True)
+        os.environ["PREPARE_ON_STARTUP"] = "false"
+        settings.PREPARE_ON_STARTUP = False
@@ -1,4 +1,6 @@
 import uvicorn
 
-if __name == "__main__":
+# Development server: one process with auto-reload. Production runs
+# gunicorn with the workers configured in gunicorn.conf.py.
+if __name__ == "__main__":
     uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
+# Settings are read once at import, so the environment has to be in place
+# before anything under app/ is imported.
+WORKDIR = tempfile.mkdtemp(prefix="travelmate-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/test.db")
+os.environ["KNOWLEDGE_INDEX_PATH"] = os.path.join(WORKDIR, "knowledge_index.json")
+os.environ["VECTOR_INDEX_PATH"] = os.path.join(WORKDIR, "knowledge_vectors")
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["COORDINATION_BACKEND"] = "memory"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+for limit in ("LOGIN_RATE_LIMIT_PER_IP", "LOGIN_RATE_LIMIT_PER_EMAIL", "REGISTER_RATE_LIMIT_PER_IP"):
+    os.environ[limit] = "0"
+
+import httpx
+import pytest
+
+from app.db.database import SessionLocal
+from app.main import app, on_shutdown, on_startup, start_coordination
+from app.models.user import Message
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def prepared():
+    on_startup()
+
+
+@pytest.fixture
+async def client():
+    await start_coordination()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        await on_shutdown()
+
+
+async def register(client: httpx.AsyncClient, role: str = "traveler") -> dict:
+    email = f"{role}-{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/api/auth/register", json={
+        "email": email, "password": PASSWORD, "full_name": role.title(), "role": role,
+    })
+    assert response.status_code == 200, response.text
+    return {**response.json(), "email": email}
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def user_headers(client: httpx.AsyncClient, role: str = "traveler") -> dict:
+    return await login(client, (await register(client, role))["email"])
+
+
+async def create_room(client, headers: dict) -> dict:
+    response = await client.post("/api/properties/", json={"name": "Plan Villa", "location": "Bali"}, headers=headers)
+    assert response.status_code == 200, response.text
+    property_id = response.json()["id"]
+    response = await client.post(
+        f"/api/properties/{property_id}/rooms", json={"name": "Garden", "base_rate": 100}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def create_booking(client, headers: dict, room: dict, check_in: date, nights: int = 2) -> dict:
+    response = await client.post("/api/bookings/", json={
+        "property_id": room["property_id"], "room_id": room["id"],
+        "check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=nights)).isoformat(),
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def add_escalation() -> str:
+    conversation_id = str(uuid.uuid4())
+    asked = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.add(Message(conversation_id=conversation_id, role="user", content="I need a refund", created_at=asked))
+        reply = Message(
+            conversation_id=conversation_id, role="assistant", content="Let me get someone for you.",
+            is_escalation=True, escalation_status="pending", created_at=asked + timedelta(seconds=1),
+        )
+        db.add(reply)
+        db.commit()
+        return reply.id
+    finally:
+        db.close()
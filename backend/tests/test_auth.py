@@ -0,0 +1,52 @@
+import pytest
+
+from app.core.coordination import MemoryBackend, coordination
+from app.core.security import PRINCIPAL_CHANNEL, principal_cache
+from conftest import login, register
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cached_principals_hold_no_credentials(client):
+    user = await register(client)
+    headers = await login(client, user["email"])
+    for _ in range(2):
+        response = await client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["email"] == user["email"]
+    cached = principal_cache.get(user["id"])
+    assert cached is not None and cached["role"] == "traveler"
+    assert "password_hash" not in cached
+
+
+async def me(client, headers: dict) -> dict:
+    response = await client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_updating_a_user_evicts_the_cached_principal(client):
+    user = await register(client)
+    headers = await login(client, user["email"])
+    assert (await me(client, headers))["full_name"] == "Traveler"
+    assert principal_cache.get(user["id"]) is not None
+
+    response = await client.put(f"/api/users/{user['id']}", json={"full_name": "Renamed"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert (await me(client, headers))["full_name"] == "Renamed"
+
+    # An admin's edit evicts the entry of the user edited.
+    admin = await login(client, (await register(client, "admin"))["email"])
+    response = await client.put(f"/api/users/{user['id']}", json={"phone": "+62 361 000"}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert (await me(client, headers))["phone"] == "+62 361 000"
+
+
+async def test_peer_update_evicts_the_cached_principal(client):
+    user = await register(client)
+    headers = await login(client, user["email"])
+    await me(client, headers)
+    assert principal_cache.get(user["id"]) is not None
+
+    await MemoryBackend(coordination.broker).publish(PRINCIPAL_CHANNEL, {"user_id": user["id"]})
+    assert principal_cache.get(user["id"]) is None
@@ -0,0 +1,218 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.db.database import AsyncSessionLocal
+from app.models.user import Booking
+from app.services.availability import RoomIntervals, availability_index
+from conftest import create_booking, create_room, user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def book(client, headers: dict, room: dict, check_in: date, nights: int = 2):
+    return await client.post("/api/bookings/", json={
+        "property_id": room["property_id"], "room_id": room["id"],
+        "check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=nights)).isoformat(),
+    }, headers=headers)
+
+
+async def available(client, room: dict, check_in: date, nights: int = 2) -> list:
+    response = await client.get(f"/api/properties/{room['property_id']}/availability", params={
+        "check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=nights)).isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    return [r["id"] for r in response.json()]
+
+
+@pytest.mark.parametrize("check_in, check_out, clash", [
+    (date(2032, 1, 10), date(2032, 1, 12), "b1"),
+    (date(2032, 1, 8), date(2032, 1, 11), "b1"),
+    (date(2032, 1, 14), date(2032, 1, 16), "b1"),
+    (date(2032, 1, 1), date(2032, 1, 30), "b2"),
+    (date(2032, 1, 5), date(2032, 1, 10), None),
+    (date(2032, 1, 15), date(2032, 1, 20), None),
+    (date(2032, 1, 15), date(2032, 1, 25), None),
+    (date(2032, 1, 15), date(2032, 1, 26), "b2"),
+])
+def test_room_intervals(check_in, check_out, clash):
+    intervals = RoomIntervals([
+        (date(2032, 1, 25), date(2032, 1, 27), "b2"),
+        (date(2032, 1, 10), date(2032, 1, 15), "b1"),
+    ])
+    assert intervals.conflict(check_in, check_out) == clash
+
+
+async def test_overlapping_stay_is_rejected(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    await create_booking(client, traveler, room, date(2032, 2, 10), nights=5)
+    for check_in, nights in [(date(2032, 2, 12), 1), (date(2032, 2, 8), 3), (date(2032, 2, 14), 4), (date(2032, 2, 1), 30)]:
+        response = await book(client, traveler, room, check_in, nights)
+        assert response.status_code == 409, (check_in, nights, response.text)
+        assert response.json()["detail"] == "Room is not available for the selected dates"
+
+    # Without the cached intervals the database check still finds the stay.
+    availability_index.clear()
+    assert (await book(client, traveler, room, date(2032, 2, 11))).status_code == 409
+
+
+async def test_room_from_another_property_is_rejected(client):
+    admin = await user_headers(client, "admin")
+    traveler = await user_headers(client)
+    room, other = await create_room(client, admin), await create_room(client, admin)
+    response = await book(client, traveler, {**room, "property_id": other["property_id"]}, date(2032, 2, 20))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Room does not belong to this property"
+    assert await own_bookings(client, traveler) == []
+
+
+async def test_adjacent_stays_are_accepted(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    await create_booking(client, traveler, room, date(2032, 3, 10), nights=5)
+    await create_booking(client, traveler, room, date(2032, 3, 8), nights=2)
+    await create_booking(client, traveler, room, date(2032, 3, 15), nights=2)
+
+
+async def test_concurrent_bookings_for_one_room(client):
+    room = await create_room(client, await user_headers(client, "admin"))
+    travelers = [await user_headers(client), await user_headers(client)]
+    availability_index.clear()
+    responses = await asyncio.gather(*(book(client, t, room, date(2032, 4, 1), nights=3) for t in travelers))
+    assert sorted(r.status_code for r in responses) == [200, 409]
+
+    response = await client.get("/api/bookings/", headers=travelers[0])
+    mine = [b for b in response.json() if b["room_id"] == room["id"]]
+    response = await client.get("/api/bookings/", headers=travelers[1])
+    theirs = [b for b in response.json() if b["room_id"] == room["id"]]
+    assert len(mine) + len(theirs) == 1
+
+
+async def test_cancelled_stay_frees_the_room(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    booking = await create_booking(client, traveler, room, date(2032, 5, 10), nights=4)
+    assert room["id"] not in await available(client, room, date(2032, 5, 12))
+    assert room["id"] in await available(client, room, date(2032, 5, 14))
+
+    response = await client.put(f"/api/bookings/{booking['id']}/cancel", headers=traveler)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "cancelled"
+    assert room["id"] in await available(client, room, date(2032, 5, 12))
+    await create_booking(client, await user_headers(client), room, date(2032, 5, 11))
+
+
+async def transitions(client, headers: dict, booking_id: str) -> list:
+    response = await client.get(f"/api/bookings/{booking_id}/transitions", headers=headers)
+    assert response.status_code == 200, response.text
+    return [t["transition"] for t in response.json()]
+
+
+async def own_bookings(client, headers: dict) -> list:
+    response = await client.get("/api/bookings/", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_create_replays_under_the_same_key(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    keyed = {**traveler, "Idempotency-Key": "create-once"}
+    first = await book(client, keyed, room, date(2032, 6, 1))
+    again = await book(client, keyed, room, date(2032, 6, 1))
+    assert first.status_code == again.status_code == 200, again.text
+    assert again.json()["id"] == first.json()["id"]
+    assert [b["id"] for b in await own_bookings(client, traveler)] == [first.json()["id"]]
+
+
+async def test_retry_racing_the_original_gets_its_booking(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    keyed = {**traveler, "Idempotency-Key": "raced"}
+    availability_index.clear()
+    responses = await asyncio.gather(*(book(client, keyed, room, date(2032, 6, 10)) for _ in range(2)))
+    assert [r.status_code for r in responses] == [200, 200], [r.text for r in responses]
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+    assert len(await own_bookings(client, traveler)) == 1
+
+
+async def test_key_reused_for_a_different_request(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    keyed = {**traveler, "Idempotency-Key": "reused"}
+    assert (await book(client, keyed, room, date(2032, 7, 1))).status_code == 200
+    response = await book(client, keyed, room, date(2032, 7, 20))
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Idempotency-Key was already used for a different request"
+    assert len(await own_bookings(client, traveler)) == 1
+
+
+async def test_pay_replays_without_a_second_transition(client):
+    admin = await user_headers(client, "admin")
+    traveler = await user_headers(client)
+    booking = await create_booking(client, traveler, await create_room(client, admin), date(2032, 8, 1))
+    response = await client.put(f"/api/bookings/{booking['id']}/confirm", headers=admin)
+    assert response.status_code == 200, response.text
+
+    keyed = {**traveler, "Idempotency-Key": "pay-once"}
+    first = await client.put(f"/api/bookings/{booking['id']}/pay", headers=keyed)
+    again = await client.put(f"/api/bookings/{booking['id']}/pay", headers=keyed)
+    assert first.status_code == again.status_code == 200, again.text
+    assert again.json()["payment_status"] == "paid"
+    assert again.json()["stripe_payment_id"] == first.json()["stripe_payment_id"]
+    assert await transitions(client, traveler, booking["id"]) == ["create", "confirm", "pay"]
+
+    response = await client.put(f"/api/bookings/{booking['id']}/pay", headers=traveler)
+    assert response.status_code == 409
+
+
+async def test_complete_moves_only_past_confirmed_bookings(client):
+    admin = await user_headers(client, "admin")
+    traveler = await user_headers(client)
+    room = await create_room(client, admin)
+    past = await create_booking(client, traveler, room, date(2020, 6, 1))
+    past_pending = await create_booking(client, traveler, room, date(2020, 7, 1))
+    future = await create_booking(client, traveler, room, date(2032, 9, 1))
+    for booking in (past, future):
+        response = await client.put(f"/api/bookings/{booking['id']}/confirm", headers=admin)
+        assert response.status_code == 200, response.text
+
+    response = await client.post("/api/bookings/complete", headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["completed"] >= 1
+    statuses = {b["id"]: b["status"] for b in await own_bookings(client, traveler)}
+    assert statuses == {past["id"]: "completed", past_pending["id"]: "pending", future["id"]: "confirmed"}
+    assert await transitions(client, traveler, past["id"]) == ["create", "confirm", "complete"]
+    assert await transitions(client, traveler, future["id"]) == ["create", "confirm"]
+
+
+async def test_cursor_walks_every_booking_once(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    created = [await create_booking(client, traveler, room, date(2032, 10, 1) + timedelta(days=3 * i)) for i in range(5)]
+    ids = [b["id"] for b in created]
+    # Three bookings share a created_at, so only the id breaks the tie and
+    # one of them falls on a page boundary.
+    async with AsyncSessionLocal() as db:
+        for booking_id, created_at in zip(ids, [datetime(2030, 1, 2)] * 3 + [datetime(2030, 1, 1), datetime(2030, 1, 3)]):
+            await db.execute(update(Booking).where(Booking.id == booking_id).values(created_at=created_at))
+        await db.commit()
+
+    walked, params, pages = [], {"limit": 2}, 0
+    while True:
+        response = await client.get("/api/bookings/", params=params, headers=traveler)
+        assert response.status_code == 200, response.text
+        walked += [b["id"] for b in response.json()]
+        pages += 1
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert pages == 3
+    assert walked == [ids[4]] + sorted(ids[:3], reverse=True) + [ids[3]]
+
+    response = await client.get("/api/bookings/", params={"cursor": "not-a-cursor"}, headers=traveler)
+    assert response.status_code == 400
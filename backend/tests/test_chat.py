@@ -0,0 +1,269 @@
+import json
+import uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.api import chat
+from app.db.database import async_engine
+from app.main import app
+from app.services.llm import llm_gateway
+from app.services.response_cache import cache_lookups
+from conftest import PASSWORD, user_headers
+
+TOKENS = ["Bali ", "has ", "great ", "villas."]
+
+
+def stream_chunks(tokens) -> list:
+    return [f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n".encode() for token in tokens]
+
+
+def streaming(tokens, fail: bool = False):
+    async def body():
+        for chunk in stream_chunks(tokens):
+            yield chunk
+        if fail:
+            raise httpx.ReadError("connection lost")
+        yield b"data: [DONE]\n\n"
+
+    def handler(request):
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    return handler
+
+
+def unavailable(request):
+    return httpx.Response(503)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    # Turns the LLM on; each upstream call is answered by the next handler
+    # the test queued, the last one answering everything after it.
+    handlers = []
+
+    def handler(request):
+        return (handlers.pop(0) if len(handlers) > 1 else handlers[0])(request)
+
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_gateway, "backoff", 0)
+    monkeypatch.setattr(llm_gateway, "transport", httpx.MockTransport(handler))
+    return handlers.extend
+
+
+def sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        data = [line[len("data: "):] for line in block.splitlines() if line.startswith("data: ")]
+        events.append(json.loads(data[0]))
+    return events
+
+
+def question() -> str:
+    # Distinct text per test so no reply comes from the response cache.
+    return f"Villas in Bali? {uuid.uuid4().hex[:8]}"
+
+
+async def stream_chat(client, headers: dict, conversation_id: str) -> list:
+    response = await client.post(
+        "/api/chat/stream", json={"message": question(), "conversation_id": conversation_id}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return sse_events(response.text)
+
+
+async def saved_reply(client, headers: dict, conversation_id: str) -> str:
+    response = await client.get(f"/api/messages/conversations/{conversation_id}", headers=headers)
+    assert response.status_code == 200
+    messages = response.json()
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    return messages[1]["content"]
+
+
+@pytest.mark.anyio
+async def test_stream_relays_tokens(client, llm):
+    llm([streaming(TOKENS)])
+    headers = await user_headers(client)
+    conversation_id = str(uuid.uuid4())
+    events = await stream_chat(client, headers, conversation_id)
+    assert [e["type"] for e in events] == ["properties"] + ["token"] * len(TOKENS) + ["done"]
+    assert [e["text"] for e in events if e["type"] == "token"] == TOKENS
+    assert await saved_reply(client, headers, conversation_id) == "".join(TOKENS)
+
+
+@pytest.mark.anyio
+async def test_stream_failure_midway_keeps_partial_reply(client, llm):
+    llm([streaming(TOKENS[:2], fail=True)])
+    headers = await user_headers(client)
+    conversation_id = str(uuid.uuid4())
+    events = await stream_chat(client, headers, conversation_id)
+    assert [e["type"] for e in events] == ["properties", "token", "token", "error", "done"]
+    assert events[-1]["conversation_id"] == conversation_id
+    assert await saved_reply(client, headers, conversation_id) == "".join(TOKENS[:2])
+
+
+@pytest.mark.anyio
+async def test_stream_falls_back_when_llm_is_down(client, llm):
+    llm([unavailable])
+    headers = await user_headers(client)
+    conversation_id = str(uuid.uuid4())
+    events = await stream_chat(client, headers, conversation_id)
+    types = [e["type"] for e in events]
+    assert "error" not in types and types[-1] == "done"
+    fallback = "".join(e["text"] for e in events if e["type"] == "token")
+    assert fallback
+    assert await saved_reply(client, headers, conversation_id) == fallback
+
+
+@pytest.mark.anyio
+async def test_llm_call_holds_no_connection(client, llm):
+    checked_out = []
+
+    def completion(request):
+        checked_out.append(async_engine.pool.checkedout())
+        if json.loads(request.content).get("stream"):
+            return streaming(TOKENS)(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "".join(TOKENS)}}]})
+
+    llm([completion])
+    headers = await user_headers(client)
+    await stream_chat(client, headers, str(uuid.uuid4()))
+    response = await client.post(
+        "/api/chat", json={"message": question(), "conversation_id": str(uuid.uuid4())}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["response"] == "".join(TOKENS)
+    assert checked_out == [0, 0]
+
+
+def counting_completions(llm) -> list:
+    # Each LLM call answers with a numbered reply, so a cached reply shows
+    # up as a repeated number and a recomputed one as a new number.
+    calls = []
+
+    def completion(request):
+        calls.append(json.loads(request.content)["messages"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"Reply {len(calls)}"}}]})
+
+    llm([completion])
+    return calls
+
+
+async def ask(client, headers: dict, message: str, conversation_id: str = None) -> str:
+    response = await client.post("/api/chat", json={
+        "message": message, "conversation_id": conversation_id or str(uuid.uuid4()),
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["response"]
+
+
+@pytest.mark.anyio
+async def test_repeated_question_is_served_from_the_cache(client, llm):
+    calls = counting_completions(llm)
+    headers = await user_headers(client)
+    marker = uuid.uuid4().hex[:8]
+    hits, misses = cache_lookups.value(result="hit"), cache_lookups.value(result="miss")
+
+    assert await ask(client, headers, f"Villas in Bali {marker}?") == "Reply 1"
+    # Case, punctuation and stop words do not make a different question.
+    assert await ask(client, headers, f"villas in BALI {marker}") == "Reply 1"
+    assert len(calls) == 1
+    assert cache_lookups.value(result="hit") == hits + 1
+    assert cache_lookups.value(result="miss") == misses + 1
+
+
+@pytest.mark.anyio
+async def test_writes_invalidate_cached_replies(client, llm):
+    calls = counting_completions(llm)
+    headers = await user_headers(client)
+    admin = await user_headers(client, "admin")
+    question = f"Villas in Bali {uuid.uuid4().hex[:8]}?"
+    assert await ask(client, headers, question) == "Reply 1"
+
+    response = await client.post(
+        "/api/documents/", json={"title": "Villas", "content": "Villas come with a cook."}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    assert await ask(client, headers, question) == "Reply 2"
+    assert await ask(client, headers, question) == "Reply 2"
+
+    response = await client.post("/api/properties/", json={"name": "Cache Villa", "location": "Bali"}, headers=admin)
+    assert response.status_code == 200, response.text
+    prop = response.json()
+    assert await ask(client, headers, question) == "Reply 3"
+    response = await client.put(f"/api/properties/{prop['id']}", json={
+        "name": "Cache Villa", "location": "Ubud", "version": prop["version"],
+    }, headers=admin)
+    assert response.status_code == 200, response.text
+    assert await ask(client, headers, question) == "Reply 4"
+    assert len(calls) == 4
+
+
+@pytest.mark.anyio
+async def test_follow_up_llm_turns_skip_the_cache(client, llm):
+    calls = counting_completions(llm)
+    headers = await user_headers(client)
+    question = f"Villas in Bali {uuid.uuid4().hex[:8]}?"
+    conversation_id = str(uuid.uuid4())
+    hits = cache_lookups.value(result="hit")
+
+    assert await ask(client, headers, question, conversation_id) == "Reply 1"
+    # The same words later in a conversation depend on what came before.
+    assert await ask(client, headers, question, conversation_id) == "Reply 2"
+    assert [m["content"] for m in calls[1] if m["role"] == "assistant"] == ["Reply 1"]
+    assert cache_lookups.value(result="hit") == hits
+    # Only the opening turn was stored.
+    assert await ask(client, headers, question) == "Reply 1"
+
+
+def websocket_token(test_client: TestClient) -> str:
+    email = f"ws-{uuid.uuid4().hex[:12]}@example.com"
+    response = test_client.post("/api/auth/register", json={"email": email, "password": PASSWORD, "full_name": "Ws"})
+    assert response.status_code == 200, response.text
+    response = test_client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    return response.json()["access_token"]
+
+
+def test_websocket_survives_failed_stream(llm):
+    with TestClient(app) as test_client:
+        token = websocket_token(test_client)
+        with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+            llm([streaming(TOKENS[:2], fail=True), streaming(TOKENS)])
+            websocket.send_json({"message": question(), "conversation_id": str(uuid.uuid4())})
+            events = [websocket.receive_json() for _ in range(5)]
+            assert [e["type"] for e in events] == ["properties", "token", "token", "error", "done"]
+
+            websocket.send_json({"message": question(), "conversation_id": str(uuid.uuid4())})
+            events = [websocket.receive_json() for _ in range(len(TOKENS) + 2)]
+            assert [e["type"] for e in events] == ["properties"] + ["token"] * len(TOKENS) + ["done"]
+            assert "".join(e["text"] for e in events if e["type"] == "token") == "".join(TOKENS)
+
+
+def test_websocket_rejects_invalid_requests():
+    with TestClient(app) as test_client:
+        token = websocket_token(test_client)
+        with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+            websocket.send_json({"conversation_id": "missing message"})
+            assert websocket.receive_json() == {"type": "error", "detail": "Invalid chat request"}
+
+
+def test_websocket_reports_unexpected_errors(monkeypatch):
+    async def broken_search(query, db):
+        raise RuntimeError("search is down")
+
+    with TestClient(app) as test_client:
+        token = websocket_token(test_client)
+        with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+            with monkeypatch.context() as patch:
+                patch.setattr(chat, "search_properties", broken_search)
+                websocket.send_json({"message": question(), "conversation_id": str(uuid.uuid4())})
+                assert websocket.receive_json() == {"type": "error", "detail": chat.FAILED}
+
+            websocket.send_json({"message": question(), "conversation_id": str(uuid.uuid4())})
+            events = [websocket.receive_json()]
+            while events[-1]["type"] != "done":
+                events.append(websocket.receive_json())
+            assert events[0]["type"] == "properties"
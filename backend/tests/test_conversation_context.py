@@ -0,0 +1,116 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.coordination import MemoryBackend, coordination
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.models.user import ConversationContext, Message
+from app.services.conversation_context import (
+    CONTEXT_CHANNEL, ContextStore, ContextWindow, context_store, estimate_tokens,
+)
+
+TURNS = [
+    ("user", "Do you have villas in Bali? We are four adults."),
+    ("assistant", "Yes, three villas. Reef House sleeps six."),
+    ("user", "Is breakfast included? And parking?"),
+    ("assistant", "Breakfast is included. Parking is free."),
+    ("user", "Great, book Reef House for May."),
+]
+
+
+def window_of(turns, max_turns: int = 3, summary_tokens: int = 300) -> ContextWindow:
+    window = ContextWindow("c")
+    for role, content in turns:
+        window.append(role, content, max_turns, summary_tokens)
+    return window
+
+
+def test_window_keeps_the_last_turns():
+    window = window_of(TURNS)
+    assert [turn["content"] for turn in window.turns] == [content for _, content in TURNS[2:]]
+    assert window.turn_count == len(TURNS)
+
+
+def test_older_turns_roll_into_the_summary():
+    window = window_of(TURNS)
+    # One line per evicted turn, cut at its first sentence.
+    assert window.summary == "user: Do you have villas in Bali?\nassistant: Yes, three villas."
+
+    # A full summary drops its oldest lines first.
+    window = window_of(TURNS, max_turns=1, summary_tokens=estimate_tokens("user: Is breakfast included?") + 10)
+    assert window.summary.splitlines() == ["user: Is breakfast included?", "assistant: Breakfast is included."]
+
+
+def test_prompt_messages_fit_the_budget():
+    window = window_of(TURNS)
+    tokens = [turn["tokens"] for turn in window.turns]
+    summary = {"role": "system", "content": f"Summary of earlier conversation:\n{window.summary}"}
+    everything = window.prompt_messages(1000)
+    assert everything == [summary] + [{"role": role, "content": content} for role, content in TURNS[2:]]
+
+    # The newest turns win; older ones are left out whole.
+    assert window.prompt_messages(tokens[-1] + tokens[-2]) == everything[-2:]
+    assert window.prompt_messages(tokens[-1]) == everything[-1:]
+    # The summary only goes in while it fits a third of the budget.
+    assert window.prompt_messages(estimate_tokens(window.summary) * 3 - 1)[0]["role"] != "system"
+    assert window.prompt_messages(0) == []
+
+
+def add_messages(conversation_id: str, turns) -> None:
+    start = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for i, (role, content) in enumerate(turns):
+            db.add(Message(conversation_id=conversation_id, role=role, content=content,
+                           created_at=start + timedelta(seconds=i)))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def load(store: ContextStore, conversation_id: str) -> ContextWindow:
+    async with AsyncSessionLocal() as db:
+        return await store.load(db, conversation_id)
+
+
+@pytest.mark.anyio
+async def test_cold_load_reads_the_stored_context(client):
+    conversation_id = str(uuid.uuid4())
+    store = ContextStore(maxsize=8, max_turns=3, summary_tokens=300)
+    for role, content in TURNS:
+        await store.record(Message(conversation_id=conversation_id, role=role, content=content))
+
+    cold = await load(ContextStore(maxsize=8, max_turns=3, summary_tokens=300), conversation_id)
+    assert cold.values() == window_of(TURNS).values()
+
+
+@pytest.mark.anyio
+async def test_cold_load_without_a_stored_context_reads_messages(client):
+    conversation_id = str(uuid.uuid4())
+    add_messages(conversation_id, TURNS)
+    window = await load(ContextStore(maxsize=8, max_turns=3, summary_tokens=300), conversation_id)
+    assert [(turn["role"], turn["content"]) for turn in window.turns] == TURNS[2:]
+    assert window.summary == ""
+
+
+@pytest.mark.anyio
+async def test_peer_update_evicts_the_local_window(client):
+    conversation_id = str(uuid.uuid4())
+    await context_store.record(Message(conversation_id=conversation_id, role="user", content="Hello"))
+    assert [turn["content"] for turn in (await load(context_store, conversation_id)).turns] == ["Hello"]
+
+    # Another worker records a turn: the row changes, then it announces it.
+    turns = [{"role": "user", "content": "Hello", "tokens": 2}, {"role": "assistant", "content": "Hi", "tokens": 1}]
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(ConversationContext)
+                         .where(ConversationContext.conversation_id == conversation_id)
+                         .values(turns=turns, turn_count=2))
+        await db.commit()
+    assert len((await load(context_store, conversation_id)).turns) == 1
+
+    peer = MemoryBackend(coordination.broker)
+    await peer.publish(CONTEXT_CHANNEL, {"conversation_id": conversation_id})
+    window = await load(context_store, conversation_id)
+    assert window.turns == turns and window.turn_count == 2
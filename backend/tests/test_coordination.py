@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+from app.core.coordination import MemoryBackend, MemoryBroker
+from app.models.user import Booking
+from app.services import availability, response_cache as response_cache_module
+from app.services.availability import AVAILABILITY_CHANNEL, AvailabilityIndex, RoomIntervals
+from app.services.response_cache import VERSION_CHANNEL, ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Worker:
+    # One process of a multi-worker deployment: its own backend on the shared
+    # broker (standing in for Redis) and its own copies of the caches.
+    def __init__(self, broker: MemoryBroker):
+        self.backend = MemoryBackend(broker)
+        self.cache = ResponseCache(maxsize=16, ttl=60)
+        self.availability = AvailabilityIndex()
+        self.received = []
+        self.backend.subscribe(VERSION_CHANNEL, self._version_changed)
+        self.backend.subscribe(AVAILABILITY_CHANNEL, self._room_changed)
+
+    async def _version_changed(self, message: dict) -> None:
+        self.received.append(message)
+        self.cache.advance(message["scope"], message["version"], message["epoch"])
+
+    async def _room_changed(self, message: dict) -> None:
+        self.availability.discard(message["room_id"])
+
+
+@pytest.fixture
+def broker():
+    return MemoryBroker(max_keys=1000)
+
+
+@pytest.fixture
+def acting_as(monkeypatch):
+    # The services publish through the module-level backend; point it at the
+    # worker whose code is running.
+    @contextmanager
+    def acting_as(worker: Worker):
+        with monkeypatch.context() as patch:
+            patch.setattr(response_cache_module, "coordination", worker.backend)
+            patch.setattr(availability, "coordination", worker.backend)
+            yield
+
+    return acting_as
+
+
+async def started(broker: MemoryBroker, count: int) -> list:
+    workers = [Worker(broker) for _ in range(count)]
+    for worker in workers:
+        await worker.backend.start()
+    return workers
+
+
+async def test_messages_reach_every_other_worker(broker):
+    a, b, c = await started(broker, 3)
+    await a.backend.publish(VERSION_CHANNEL, {"scope": "catalog", "version": 7, "epoch": 1})
+    assert a.received == []
+    assert b.received == c.received == [{"scope": "catalog", "version": 7, "epoch": 1}]
+
+
+async def test_workers_share_values_and_counters(broker):
+    a, b = await started(broker, 2)
+    await a.backend.set("claim", "a")
+    assert await b.backend.get("claim") == "a"
+    assert [await a.backend.incr("n"), await b.backend.incr("n"), await a.backend.incr("n")] == [1, 2, 3]
+    assert await b.backend.hit("login", limit=1, window=60) is None
+    assert await a.backend.hit("login", limit=1, window=60) > 0
+
+
+async def test_versions_agree_across_workers(broker, acting_as):
+    a, b = await started(broker, 2)
+    with acting_as(a):
+        await a.cache.invalidate("catalog")
+        await a.cache.invalidate("catalog")
+    with acting_as(b):
+        await b.cache.invalidate("documents")
+    assert a.cache.fingerprint() == b.cache.fingerprint()
+    assert a.cache.version("catalog") == b.cache.version("catalog")
+
+    late = Worker(broker)
+    with acting_as(late):
+        await late.backend.start()
+        await late.cache.sync_versions()
+    assert late.cache.fingerprint() == a.cache.fingerprint()
+
+
+async def test_versions_stay_unique_when_the_backend_loses_its_data(broker, acting_as):
+    a, b = await started(broker, 2)
+    with acting_as(a):
+        await a.cache.invalidate("catalog")
+    before = a.cache.version("catalog")
+
+    # A Redis restarted without persistence: every counter starts again.
+    broker.values.clear()
+    with acting_as(b):
+        await b.cache.invalidate("catalog")
+    assert b.cache.version("catalog") != before
+    assert a.cache.version("catalog") == b.cache.version("catalog")
+
+    # A worker cut off while the backend restarted catches up on reconnect,
+    # although its own counters are ahead of the restarted ones.
+    c = Worker(broker)
+    with acting_as(c):
+        await c.backend.start()
+        for _ in range(3):
+            await c.cache.invalidate("documents")
+    broker.backends.discard(c.backend)
+    broker.values.clear()
+    with acting_as(a):
+        await a.cache.invalidate("documents")
+    assert c.cache.fingerprint() != a.cache.fingerprint()
+    broker.backends.add(c.backend)
+    with acting_as(c):
+        await c.cache.sync_versions()
+    assert c.cache.fingerprint() == a.cache.fingerprint()
+
+
+async def test_late_messages_from_before_a_reset_are_ignored(broker, acting_as):
+    a, b = await started(broker, 2)
+    with acting_as(a):
+        await a.cache.invalidate("catalog")
+    stale = dict(b.received[-1], version=5)
+    broker.values.clear()
+    with acting_as(a):
+        await a.cache.invalidate("catalog")
+    fingerprint = b.cache.fingerprint()
+    await b._version_changed(stale)
+    assert b.cache.fingerprint() == fingerprint
+
+
+async def test_cancellation_frees_the_room_on_other_workers(broker, acting_as):
+    a, b = await started(broker, 2)
+    booking = Booking(id="b1", room_id="r1", check_in=date(2031, 1, 1), check_out=date(2031, 1, 3))
+    for worker in (a, b):
+        worker.availability._rooms["r1"] = RoomIntervals([(booking.check_in, booking.check_out, booking.id)])
+
+    with acting_as(a):
+        await a.availability.released(booking)
+    assert a.availability._fresh("r1").conflict(date(2031, 1, 1), date(2031, 1, 2)) is None
+    # The other worker reloads the room from the database on its next booking.
+    assert b.availability._fresh("r1") is None
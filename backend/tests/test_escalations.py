@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.escalations import escalation_queue
+from conftest import add_escalation, user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_answering_an_escalation_missing_from_the_queue(client):
+    # Written to the database without this worker hearing of it, as when the
+    # created event from another worker is lost.
+    message_id = add_escalation()
+    assert escalation_queue.get(message_id) is None
+    admin = await user_headers(client, "admin")
+
+    response = await client.put(
+        f"/api/messages/escalations/{message_id}", json={"admin_response": "Refund issued"}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["escalation_status"] == "resolved"
+    assert escalation_queue.get(message_id) is None
+
+    response = await client.put(
+        f"/api/messages/escalations/{message_id}", json={"admin_response": "Again"}, headers=admin
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Escalation was already resolved"
+
+
+async def test_claiming_an_escalation_missing_from_the_queue(client):
+    message_id = add_escalation()
+    admin = await user_headers(client, "admin")
+    response = await client.post(f"/api/messages/escalations/{message_id}/claim", headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["content"] == "I need a refund"
+    assert escalation_queue.get(message_id).claimed_by is not None
+
+    other = await user_headers(client, "admin")
+    response = await client.put(
+        f"/api/messages/escalations/{message_id}", json={"admin_response": "Mine"}, headers=other
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"]["message"] == "Escalation is being handled by another admin"
@@ -0,0 +1,230 @@
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.user import Document
+from app.services import knowledge_base
+from app.services.embeddings import get_embedder
+from app.services.knowledge_base import KnowledgeBaseIndex
+from app.services.vector_index import VectorIndex
+
+
+def test_bm25_ranks_by_term_weight():
+    index = KnowledgeBaseIndex()
+    index.add_document("pets", "Pet policy", "Pets are welcome. Pets stay free; pets need a leash.")
+    index.add_document("parking", "Parking", "Parking is free for guests who stay two nights.")
+    index.add_document("checkin", "Check-in", "Check-in starts at 3pm. Guests who stay late can store luggage.")
+    index.add_document("long", "House rules", "Quiet hours start at 10pm. " * 30 + "Small pets on request.")
+
+    hits = index.search("pets")
+    assert [hit["document_id"] for hit in hits] == ["pets", "long"]
+    # A term every passage shares weighs less than a rare one.
+    assert index.search("stay parking")[0]["document_id"] == "parking"
+    assert index.search("free")[0]["score"] > index.search("stay")[0]["score"]
+    assert index.search("the and") == []
+
+
+def test_search_returns_the_best_passages():
+    index = KnowledgeBaseIndex()
+    sections = [f"Section {n} covers topic{n} in detail. " * 10 for n in range(6)]
+    index.add_document("handbook", "Guest handbook", "\n\n".join(sections))
+    index.add_document("faq", "FAQ", "Questions about topic4 and topic5.")
+    assert len(index.document_passages("handbook")) > 1
+
+    hits = index.search("topic4", top_k=2)
+    assert len(hits) == 2
+    assert hits[0]["key"].startswith("handbook:")
+    assert "topic4" in hits[0]["passage"] and "topic5" not in hits[0]["passage"]
+    assert hits[1]["document_id"] == "faq"
+    assert hits[0]["title"] == "Guest handbook"
+    assert [hit["key"] for hit in index.search("topic4 topic5", top_k=1)] == ["faq:0"]
+
+    index.remove_document("handbook")
+    assert [hit["key"] for hit in index.search("topic4")] == ["faq:0"]
+
+
+@pytest.fixture
+def scheduled(monkeypatch, tmp_path):
+    saves = []
+    monkeypatch.setattr(knowledge_base, "knowledge_index", KnowledgeBaseIndex())
+    monkeypatch.setattr(knowledge_base, "persist_index", lambda: saves.append(len(knowledge_base.knowledge_index)))
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_ENABLED", False)
+    monkeypatch.setattr(settings, "KNOWLEDGE_PERSIST_DELAY", 60)
+    yield saves
+    knowledge_base.flush_index()
+
+
+def test_document_changes_are_saved_together(scheduled):
+    for n in range(5):
+        knowledge_base.index_document(Document(id=f"doc-{n}", title="Policy", content=f"Rule {n}"))
+    knowledge_base.unindex_document("doc-0")
+    assert scheduled == []
+    knowledge_base.flush_index()
+    assert scheduled == [4]
+    knowledge_base.flush_index()
+    assert scheduled == [4]
+
+
+def test_document_changes_are_saved_after_the_delay(scheduled, monkeypatch):
+    monkeypatch.setattr(settings, "KNOWLEDGE_PERSIST_DELAY", 0.01)
+    knowledge_base.index_document(Document(id="doc", title="Policy", content="Rule"))
+    timer = knowledge_base._persist_timer
+    timer.join(5)
+    assert scheduled == [1]
+    assert knowledge_base._persist_timer is None
+
+
+def test_knowledge_index_saves_while_documents_change(tmp_path):
+    index = KnowledgeBaseIndex()
+    path = str(tmp_path / "knowledge.json")
+    stop = threading.Event()
+
+    def edit():
+        n = 0
+        while not stop.is_set():
+            index.add_document(f"doc-{n % 500}", "Cancellation policy", "Free cancellation up to 48 hours. " * 20)
+            index.remove_document(f"doc-{(n + 250) % 500}")
+            n += 1
+
+    errors = []
+
+    def save():
+        for _ in range(20):
+            try:
+                index.save(path)
+            except Exception as exc:
+                errors.append(exc)
+
+    editors = [threading.Thread(target=edit) for _ in range(2)]
+    for editor in editors:
+        editor.start()
+    try:
+        savers = [threading.Thread(target=save) for _ in range(2)]
+        for saver in savers:
+            saver.start()
+        for saver in savers:
+            saver.join()
+    finally:
+        stop.set()
+        for editor in editors:
+            editor.join()
+
+    assert errors == []
+    loaded = KnowledgeBaseIndex()
+    assert loaded.load(path)
+    assert loaded.search("cancellation")
+    assert [p.name for p in tmp_path.iterdir()] == ["knowledge.json"]
+
+
+def test_vector_index_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    path = str(tmp_path / "vectors")
+    index = VectorIndex(dim=8, path=path, train_threshold=16)
+    index.add([f"k{i}" for i in range(40)], vectors)
+    assert index.needs_training()
+    index.train()
+    assert not index.needs_training()
+    index.save()
+
+    loaded = VectorIndex(dim=8, path=path, train_threshold=16)
+    assert loaded.load()
+    assert sorted(loaded.keys()) == sorted(index.keys())
+    assert loaded.search(vectors[3], top_k=1)[0][0] == "k3"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["vectors.centroids.npy", "vectors.json", "vectors.npy"]
+
+
+def edit_document(document_id: str, content: str) -> None:
+    db = SessionLocal()
+    try:
+        document = db.get(Document, document_id)
+        if document is None:
+            db.add(Document(id=document_id, title="Pool hours", content=content))
+        else:
+            document.content = content
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync(index: KnowledgeBaseIndex) -> list:
+    db = SessionLocal()
+    try:
+        return index.sync(db)
+    finally:
+        db.close()
+
+
+def test_sync_reindexes_edited_documents(tmp_path):
+    document_id = f"pool-{uuid.uuid4().hex[:8]}"
+    edit_document(document_id, "The pool opens at sunrise.")
+    index = KnowledgeBaseIndex()
+    assert document_id in sync(index)
+    assert sync(index) == []
+    path = str(tmp_path / "knowledge.json")
+    index.save(path)
+
+    edit_document(document_id, "The pool closes at midnight.")
+    loaded = KnowledgeBaseIndex()
+    assert loaded.load(path)
+    assert sync(loaded) == [document_id]
+    assert [hit["document_id"] for hit in loaded.search("midnight")] == [document_id]
+    assert document_id not in [hit["document_id"] for hit in loaded.search("sunrise")]
+
+
+def test_startup_reembeds_edited_documents(monkeypatch):
+    monkeypatch.setattr(settings, "KNOWLEDGE_INDEX_PATH", "")
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_ENABLED", True)
+    monkeypatch.setattr(knowledge_base, "knowledge_index", KnowledgeBaseIndex())
+    monkeypatch.setattr(knowledge_base, "_vector_index", VectorIndex(get_embedder().dim))
+    monkeypatch.setattr(knowledge_base, "persist_index", lambda: None)
+    document_id = f"spa-{uuid.uuid4().hex[:8]}"
+
+    def embedded() -> np.ndarray:
+        vectors = knowledge_base._vector_index
+        return np.asarray(vectors._matrix[vectors._slots[f"{document_id}:0"]])
+
+    def load() -> None:
+        db = SessionLocal()
+        try:
+            knowledge_base.load_knowledge_index(db)
+        finally:
+            db.close()
+
+    edit_document(document_id, "The spa opens at noon.")
+    load()
+    edit_document(document_id, "The spa is closed on Mondays.")
+    load()
+    expected = get_embedder().embed(["Pool hours\nThe spa is closed on Mondays."])[0]
+    assert np.allclose(embedded(), expected)
+    assert knowledge_base.search_documents("spa closed mondays")[0]["document_id"] == document_id
+
+
+def test_training_runs_outside_the_index_lock(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_ENABLED", True)
+    monkeypatch.setattr(knowledge_base, "knowledge_index", KnowledgeBaseIndex())
+    monkeypatch.setattr(knowledge_base, "_vector_index", VectorIndex(get_embedder().dim, train_threshold=2))
+    monkeypatch.setattr(knowledge_base, "schedule_persist", lambda: None)
+    searches = []
+    train = VectorIndex.train
+
+    def training(self, *args, **kwargs):
+        # A search from another thread must not wait for k-means.
+        searcher = threading.Thread(target=lambda: searches.append(knowledge_base.search_documents("sauna")))
+        searcher.start()
+        searcher.join(timeout=5)
+        assert not searcher.is_alive()
+        train(self, *args, **kwargs)
+
+    monkeypatch.setattr(VectorIndex, "train", training)
+    for i, content in enumerate(["The sauna is heated.", "Breakfast is at eight."]):
+        knowledge_base.index_document(Document(id=f"train-{i}", title="Amenities", content=content))
+
+    assert searches and searches[0][0]["document_id"] == "train-0"
+    assert knowledge_base._vector_index._centroids is not None
+    assert knowledge_base.search_documents("breakfast")[0]["document_id"] == "train-1"
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.instrumentation import RequestStats, current_request, failed_queries, instrument_engine
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE vouchers (code TEXT PRIMARY KEY)"))
+    yield engine
+    engine.dispose()
+
+
+def test_failed_statements_are_recorded(engine, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    failed_before = failed_queries.value(route="unmatched")
+    stats = RequestStats({})
+    token = current_request.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO vouchers VALUES ('A')"))
+            for _ in range(3):
+                with pytest.raises(IntegrityError):
+                    conn.execute(text("INSERT INTO vouchers VALUES ('A')"))
+            conn.execute(text("SELECT code FROM vouchers"))
+            assert "query_start" not in conn.info
+    finally:
+        current_request.reset(token)
+
+    assert stats.statements == 5
+    assert stats.shapes["INSERT INTO vouchers VALUES ('A')"] == 4
+    assert failed_queries.value(route="unmatched") - failed_before == 3
+    assert sum("(failed)" in record.getMessage() for record in caplog.records) == 3
@@ -0,0 +1,172 @@
+import csv
+import io
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import AsyncSessionLocal
+from app.models.user import Property, Room
+from app.services import inventory
+from conftest import create_room, user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunked(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def records(data: str, fmt: str = "csv") -> list:
+    return [record async for record in inventory.iter_records(chunked(data.encode()), fmt)]
+
+
+async def import_csv(client, headers: dict, data: str) -> dict:
+    response = await client.post(
+        "/api/properties/import", content=data.encode(), headers={**headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def rooms_of(property_id: str) -> list:
+    async with AsyncSessionLocal() as db:
+        return sorted(await db.scalars(select(Room.name).where(Room.property_id == property_id)))
+
+
+async def test_quoted_field_spanning_lines():
+    data = 'name,location,description\r\nReef House,Bali,"Two floors,\nsea view ""and"" a pool"\r\nHut,Lombok,\r\n'
+    assert await records(data) == [
+        (2, {"name": "Reef House", "location": "Bali", "description": 'Two floors,\nsea view "and" a pool'}, None),
+        (4, {"name": "Hut", "location": "Lombok", "description": ""}, None),
+    ]
+
+
+async def test_malformed_records():
+    assert await records('name,location\r\nA,Bali,extra\r\nB,"Bali\r\n') == [
+        (2, None, "Expected 2 columns, got 3"),
+        (3, None, "Unterminated quoted field"),
+    ]
+    assert await records('{"name": "A"}\nnot json\n[1]\n', "ndjson") == [
+        (1, {"name": "A"}, None),
+        (2, None, "Invalid JSON: Expecting value: line 1 column 1 (char 0)"),
+        (3, None, "Expected a JSON object"),
+    ]
+
+
+async def test_unknown_column_rejects_the_file(client):
+    admin = await user_headers(client, "admin")
+    report = await import_csv(client, admin, "name,location,colour\r\nBlue House,Bali,blue\r\n")
+    assert report == {
+        "properties_created": 0, "rooms_created": 0, "rows_failed": 1,
+        "errors": [{"line": 1, "error": "Unknown columns: colour"}],
+    }
+
+
+async def test_rows_fail_on_their_own(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    missing = str(uuid.uuid4())
+    report = await import_csv(client, admin, (
+        "property_id,name,location,room_name,base_rate\r\n"
+        f"{room['property_id']},,,Annex,80\r\n"
+        f"{missing},,,Ghost,80\r\n"
+        ",Cliff House,Bali,Top,abc\r\n"
+        ",Cliff House,Bali,,50\r\n"
+    ))
+    assert report["rooms_created"] == 1 and report["properties_created"] == 0
+    assert [error["line"] for error in report["errors"]] == [3, 4, 5]
+    assert report["errors"][0]["error"] == f"Unknown property_id {missing}"
+    assert report["errors"][1]["error"].startswith("base_rate:")
+    assert report["errors"][2]["error"] == "room_name is required for a room"
+    assert await rooms_of(room["property_id"]) == ["Annex", "Garden"]
+
+
+async def test_rejected_batch_reports_every_row(monkeypatch):
+    marker = uuid.uuid4().hex[:8]
+    rows = [
+        {"property_ref": "a", "name": f"A {marker}", "location": "Bali", "room_name": "One"},
+        {"property_ref": "a", "name": f"A {marker}", "location": "Bali", "room_name": "Two"},
+        {"property_ref": "b", "name": f"B {marker}", "location": "Bali", "room_name": "One"},
+        {"property_ref": "a", "name": f"A {marker}", "location": "Bali", "room_name": "Three"},
+        {"property_ref": "b", "name": f"B {marker}", "location": "Bali", "room_name": "Two"},
+        {"property_ref": "b", "name": f"B {marker}", "location": "Bali", "room_name": "Three"},
+    ]
+
+    async def source():
+        for line, row in enumerate(rows, start=1):
+            yield line, row, None
+
+    async with AsyncSessionLocal() as db:
+        execute = db.execute
+        calls = []
+
+        async def rejecting(statement, *args, **kwargs):
+            # The second batch's room insert fails.
+            calls.append(statement)
+            if len(calls) == 4:
+                raise IntegrityError(str(statement), None, Exception("rejected"))
+            return await execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db, "execute", rejecting)
+        report = await inventory.import_inventory(db, source(), batch_size=2)
+
+    assert report.as_dict() == {
+        "properties_created": 2, "rooms_created": 4, "rows_failed": 2,
+        "errors": [
+            {"line": 3, "error": "Batch rejected by the database: IntegrityError"},
+            {"line": 4, "error": "Batch rejected by the database: IntegrityError"},
+        ],
+    }
+    async with AsyncSessionLocal() as db:
+        created = {
+            p.name: p.id for p in await db.scalars(select(Property).where(Property.name.endswith(marker)))
+        }
+    # Rows of one property_ref share a property across batches; "b" is
+    # created by the batch after the one that was rolled back.
+    assert sorted(created) == [f"A {marker}", f"B {marker}"]
+    assert await rooms_of(created[f"A {marker}"]) == ["One", "Two"]
+    assert await rooms_of(created[f"B {marker}"]) == ["Three", "Two"]
+
+
+async def exported_rows(client, headers: dict, property_id: str) -> list:
+    response = await client.get("/api/properties/export", headers=headers)
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    return [row for row in rows if row["property_id"] == property_id]
+
+
+def as_csv(rows: list) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=inventory.FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def test_reimporting_an_export(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    response = await client.post(
+        f"/api/properties/{room['property_id']}/rooms", json={"name": "Loft", "base_rate": 150}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    rows = await exported_rows(client, admin, room["property_id"])
+    assert [row["room_name"] for row in rows] == ["Garden", "Loft"]
+
+    # As exported, the rows add rooms to the property they came from.
+    report = await import_csv(client, admin, as_csv(rows))
+    assert report == {"properties_created": 0, "rooms_created": 2, "rows_failed": 0, "errors": []}
+    assert await rooms_of(room["property_id"]) == ["Garden", "Garden", "Loft", "Loft"]
+
+    # Without property_id, property_ref groups them into one new property.
+    name = f"Copy {uuid.uuid4().hex[:8]}"
+    for row in rows:
+        row["property_id"], row["name"] = "", name
+    report = await import_csv(client, admin, as_csv(rows))
+    assert report == {"properties_created": 1, "rooms_created": 2, "rows_failed": 0, "errors": []}
+    async with AsyncSessionLocal() as db:
+        copy = await db.scalar(select(Property.id).where(Property.name == name))
+    assert await rooms_of(copy) == ["Garden", "Loft"]
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.llm import LLMError, LLMGateway
+
+pytestmark = pytest.mark.anyio
+
+
+def gateway(handler, **options) -> LLMGateway:
+    llm = LLMGateway(base_url="http://llm.test", api_key="test-key", model="test-model", backoff=0, **options)
+    llm.transport = httpx.MockTransport(handler)
+    return llm
+
+
+def completion(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def stream_body(*tokens: str) -> str:
+    chunks = [f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n" for token in tokens]
+    return "".join(chunks) + "data: [DONE]\n\n"
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+async def test_retries_retryable_statuses(status):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(status, headers={"Retry-After": "0"})
+        return completion("Hello")
+
+    llm = gateway(handler)
+    try:
+        assert await llm.complete([{"role": "user", "content": "hi"}]) == "Hello"
+    finally:
+        await llm.aclose()
+    assert len(calls) == 3
+    assert calls[0].headers["Authorization"] == "Bearer test-key"
+
+
+async def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    llm = gateway(handler, max_retries=2)
+    try:
+        with pytest.raises(LLMError):
+            await llm.complete([{"role": "user", "content": "hi"}])
+    finally:
+        await llm.aclose()
+    assert len(calls) == 3
+
+
+async def test_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad request"})
+
+    llm = gateway(handler)
+    try:
+        with pytest.raises(LLMError):
+            await llm.complete([{"role": "user", "content": "hi"}])
+    finally:
+        await llm.aclose()
+    assert len(calls) == 1
+
+
+async def test_retries_transport_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused")
+        return completion("Hello")
+
+    llm = gateway(handler)
+    try:
+        assert await llm.complete([{"role": "user", "content": "hi"}]) == "Hello"
+    finally:
+        await llm.aclose()
+    assert len(calls) == 2
+
+
+async def test_coalesces_identical_requests():
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        calls.append(json.loads(request.content))
+        await release.wait()
+        return completion("Shared")
+
+    llm = gateway(handler)
+    try:
+        same = [asyncio.ensure_future(llm.complete([{"role": "user", "content": "hi"}])) for _ in range(5)]
+        other = asyncio.ensure_future(llm.complete([{"role": "user", "content": "bye"}]))
+        await asyncio.sleep(0.05)
+        release.set()
+        assert await asyncio.gather(*same) == ["Shared"] * 5
+        await other
+    finally:
+        await llm.aclose()
+    assert sorted(call["messages"][0]["content"] for call in calls) == ["bye", "hi"]
+
+
+async def test_streams_tokens():
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=stream_body("Here ", "you ", "go."),
+                              headers={"content-type": "text/event-stream"})
+
+    llm = gateway(handler)
+    try:
+        tokens = [token async for token in llm.stream([{"role": "user", "content": "hi"}])]
+    finally:
+        await llm.aclose()
+    assert tokens == ["Here ", "you ", "go."]
+
+
+async def test_stream_failure_midway_raises_llm_error():
+    async def body():
+        yield stream_body("Here ").replace("data: [DONE]\n\n", "").encode()
+        raise httpx.ReadError("connection lost")
+
+    def handler(request):
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    llm = gateway(handler)
+    tokens = []
+    try:
+        with pytest.raises(LLMError):
+            async for token in llm.stream([{"role": "user", "content": "hi"}]):
+                tokens.append(token)
+    finally:
+        await llm.aclose()
+    assert tokens == ["Here "]
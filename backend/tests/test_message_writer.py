@@ -0,0 +1,113 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.models.user import ConversationContext, Message
+from app.services.message_writer import MessageWriter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def writer(request):
+    writer = MessageWriter(request.param, batch_size=10, flush_interval=0.05, max_queue=100)
+    writer.failed = []
+    writer.on_failure = writer.failed.append
+    yield writer
+    await writer.drain()
+    await async_engine.dispose()
+
+
+def stored_message(conversation_id: str) -> str:
+    db = SessionLocal()
+    try:
+        message = Message(conversation_id=conversation_id, role="user", content="stored")
+        db.add(message)
+        db.commit()
+        return message.id
+    finally:
+        db.close()
+
+
+def context(conversation_id: str, turn_count: int) -> dict:
+    return {"conversation_id": conversation_id, "summary": "", "turns": [], "turn_count": turn_count}
+
+
+async def write(writer: MessageWriter, message: Message, context: dict = None) -> None:
+    await writer.write(message, context)
+
+
+async def contents(conversation_id: str) -> list:
+    async with AsyncSessionLocal() as db:
+        return list(await db.scalars(
+            select(Message.content).where(Message.conversation_id == conversation_id).order_by(Message.content)
+        ))
+
+
+async def turn_count(conversation_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.get(ConversationContext, conversation_id)).turn_count
+
+
+@pytest.mark.parametrize("writer", ["group"], indirect=True)
+async def test_a_bad_message_fails_alone(writer):
+    conversation_id = str(uuid.uuid4())
+    taken = stored_message(conversation_id)
+    results = await asyncio.gather(
+        write(writer, Message(conversation_id=conversation_id, role="user", content="first"),
+              context(conversation_id, 1)),
+        write(writer, Message(id=taken, conversation_id=conversation_id, role="user", content="duplicate"),
+              context(conversation_id, 2)),
+        write(writer, Message(conversation_id=conversation_id, role="assistant", content="second"),
+              context(conversation_id, 3)),
+        return_exceptions=True,
+    )
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], IntegrityError)
+    assert writer.failed == [conversation_id]
+    assert await contents(conversation_id) == ["first", "second", "stored"]
+    assert await turn_count(conversation_id) == 3
+
+
+@pytest.mark.parametrize("writer", ["async"], indirect=True)
+async def test_async_mode_keeps_the_rest_of_the_batch(writer):
+    conversation_id = str(uuid.uuid4())
+    taken = stored_message(conversation_id)
+    await write(writer, Message(conversation_id=conversation_id, role="user", content="first"))
+    await write(writer, Message(id=taken, conversation_id=conversation_id, role="user", content="duplicate"))
+    await write(writer, Message(conversation_id=conversation_id, role="assistant", content="second"))
+    await writer.drain()
+    assert await contents(conversation_id) == ["first", "second", "stored"]
+
+
+@pytest.mark.parametrize("writer", ["group", "sync"], indirect=True)
+async def test_contexts_are_upserted_newest_first(writer):
+    conversation_id = str(uuid.uuid4())
+    # Another worker wrote the first context row after this one loaded an
+    # empty window.
+    await write(writer, Message(conversation_id=conversation_id, role="user", content="a"), context(conversation_id, 2))
+    await write(writer, Message(conversation_id=conversation_id, role="user", content="b"), context(conversation_id, 4))
+    assert await turn_count(conversation_id) == 4
+    # A stale snapshot that commits late does not win.
+    await write(writer, Message(conversation_id=conversation_id, role="user", content="c"), context(conversation_id, 3))
+    assert await turn_count(conversation_id) == 4
+    assert writer.failed == []
+
+
+@pytest.mark.parametrize("writer", ["sync", "group", "async"], indirect=True)
+async def test_the_callers_session_is_left_alone(writer):
+    conversation_id = str(uuid.uuid4())
+    stored_id = stored_message(conversation_id)
+    async with AsyncSessionLocal() as db:
+        stored = await db.get(Message, stored_id)
+        stored.content = "edited"
+        await write(writer, Message(conversation_id=conversation_id, role="user", content="new"),
+                    context(conversation_id, 1))
+        assert stored in db.dirty
+        await db.commit()
+    await writer.drain()
+    assert await contents(conversation_id) == ["edited", "new"]
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import pool
+from app.db.pool import InstrumentedQueuePool, pool_checkout_wait, pool_overflow_events, pool_timeouts
+
+
+class SmallPool(InstrumentedQueuePool):
+    metrics_label = "small"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool, "_tracked_engines", {})
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db", poolclass=SmallPool, pool_size=1, max_overflow=1, pool_timeout=0.05,
+    )
+    pool.track_engine("small", engine)
+    yield engine
+    engine.dispose()
+
+
+def checkout_waits() -> float:
+    line = next(line for line in pool_checkout_wait.samples() if line.startswith(
+        'db_pool_checkout_wait_seconds_count{engine="small"}'
+    ))
+    return float(line.split()[-1])
+
+
+def test_overflow_and_timeouts_are_counted(engine):
+    overflow, timeouts = pool_overflow_events.value(engine="small"), pool_timeouts.value(engine="small")
+    for _ in range(2):
+        first, second = engine.connect(), engine.connect()
+        assert pool._pool_stats()["overflow"][("small",)] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        second.close()
+        first.close()
+        # A new pool keeps counting once per overflow connection.
+        engine.dispose()
+    assert pool_overflow_events.value(engine="small") == overflow + 2
+    assert pool_timeouts.value(engine="small") == timeouts + 2
+    assert checkout_waits() >= 6
+
+
+def test_pooled_connections_are_not_overflow(engine):
+    overflow = pool_overflow_events.value(engine="small")
+    for _ in range(3):
+        with engine.connect():
+            pass
+    assert pool_overflow_events.value(engine="small") == overflow
+    assert pool._pool_stats()["checked_out"][("small",)] == 0
@@ -0,0 +1,142 @@
+import pytest
+
+from conftest import create_room, user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stale_version_is_rejected(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    url = f"/api/properties/{room['property_id']}"
+    prop = (await client.get(url)).json()
+
+    first = await client.put(url, json={"name": "First", "location": "Bali", "version": prop["version"]}, headers=admin)
+    assert first.status_code == 200, first.text
+    assert first.json()["version"] == prop["version"] + 1
+
+    second = await client.put(url, json={"name": "Second", "location": "Bali", "version": prop["version"]}, headers=admin)
+    assert second.status_code == 409
+    assert second.json()["detail"] == f"Property was changed by another request (now at version {prop['version'] + 1})"
+    assert (await client.get(url)).json()["name"] == "First"
+
+
+async def test_update_without_version_writes_last(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    response = await client.put(
+        f"/api/properties/{room['property_id']}", json={"name": "Blind", "location": "Bali"}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["version"] == 2
+    response = await client.put(f"/api/properties/rooms/{room['id']}", json={"name": "Blind"}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert (response.json()["name"], response.json()["version"]) == ("Blind", room["version"] + 1)
+
+
+async def test_if_match_carries_the_version(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    url = f"/api/properties/{room['property_id']}"
+    body = {"name": "Matched", "location": "Bali"}
+    response = await client.put(url, json=body, headers={**admin, "If-Match": '"1"'})
+    assert response.status_code == 200, response.text
+    response = await client.put(url, json=body, headers={**admin, "If-Match": 'W/"1"'})
+    assert response.status_code == 409
+    # A version in the body takes precedence over the header.
+    response = await client.put(url, json={**body, "version": 2}, headers={**admin, "If-Match": '"1"'})
+    assert response.status_code == 200, response.text
+    response = await client.put(url, json=body, headers={**admin, "If-Match": "*"})
+    assert response.status_code == 200, response.text
+    response = await client.put(url, json=body, headers={**admin, "If-Match": '"abc"'})
+    assert response.status_code == 400
+
+    room_url = f"/api/properties/rooms/{room['id']}"
+    response = await client.put(room_url, json={"name": "Sea"}, headers={**admin, "If-Match": '"7"'})
+    assert response.status_code == 409
+
+
+async def test_stale_room_version_is_rejected(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    url = f"/api/properties/rooms/{room['id']}"
+    response = await client.put(url, json={"name": "Sea", "version": room["version"]}, headers=admin)
+    assert response.status_code == 200, response.text
+    response = await client.put(url, json={"name": "Pool", "version": room["version"]}, headers=admin)
+    assert response.status_code == 409
+
+
+async def test_conditional_get(client):
+    room = await create_room(client, await user_headers(client, "admin"))
+    url = f"/api/properties/{room['property_id']}"
+    response = await client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = await client.get(url, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    response = await client.get(url, headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+async def test_etag_changes_after_an_update(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    url = f"/api/properties/{room['property_id']}"
+    before = await client.get(url)
+    response = await client.put(url, json={
+        "name": "Renamed Villa", "location": "Bali", "version": before.json()["version"],
+    }, headers=admin)
+    assert response.status_code == 200, response.text
+
+    after = await client.get(url, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert after.json()["name"] == "Renamed Villa"
+
+
+async def test_writes_are_not_served_stale(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    rooms_url = f"/api/properties/{room['property_id']}/rooms"
+    assert [r["name"] for r in (await client.get(rooms_url)).json()] == ["Garden"]
+    assert (await client.get("/api/properties/", params={"limit": 100})).status_code == 200
+
+    response = await client.put(
+        f"/api/properties/rooms/{room['id']}", json={"name": "Terrace", "version": room["version"]}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    assert [r["name"] for r in (await client.get(rooms_url)).json()] == ["Terrace"]
+
+    response = await client.post("/api/properties/", json={"name": "Fresh Villa", "location": "Bali"}, headers=admin)
+    assert response.status_code == 200, response.text
+    listed = (await client.get("/api/properties/", params={"limit": 100})).json()
+    assert response.json()["id"] in [p["id"] for p in listed]
+
+    response = await client.delete(f"/api/properties/rooms/{room['id']}", headers=admin)
+    assert response.status_code == 200, response.text
+    assert (await client.get(rooms_url)).json() == []
+
+
+async def test_document_writes_are_not_served_stale(client):
+    admin = await user_headers(client, "admin")
+    before = await client.get("/api/documents/", params={"limit": 100})
+    response = await client.post(
+        "/api/documents/", json={"title": "Towels", "content": "Towels are provided."}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    document_id = response.json()["id"]
+
+    listed = await client.get(
+        "/api/documents/", params={"limit": 100}, headers={"If-None-Match": before.headers["ETag"]}
+    )
+    assert listed.status_code == 200
+    assert document_id in [d["id"] for d in listed.json()]
+
+    response = await client.delete(f"/api/documents/{document_id}", headers=admin)
+    assert response.status_code == 200, response.text
+    listed = await client.get("/api/documents/", params={"limit": 100})
+    assert document_id not in [d["id"] for d in listed.json()]
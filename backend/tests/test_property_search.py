@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+
+from app.db.database import AsyncSessionLocal
+from app.services import property_search
+from conftest import user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["configured", "like"])
+def backend(request):
+    if request.param == "like":
+        return property_search.LikePropertySearch()
+    return property_search.property_search
+
+
+async def add_properties(client, marker: str) -> dict:
+    admin = await user_headers(client, "admin")
+    ids = {}
+    for name, description in [
+        ("Beach Villa", "Beachfront villa with a private pool."),
+        ("Hill Lodge", "Quiet lodge in the hills with a pool."),
+        ("City Studio", "Studio flat close to the old town."),
+    ]:
+        response = await client.post("/api/properties/", json={
+            "name": name, "location": f"{marker} Island", "description": description,
+        }, headers=admin)
+        assert response.status_code == 200, response.text
+        ids[name] = response.json()["id"]
+    return ids
+
+
+async def search(backend, query: str) -> set:
+    async with AsyncSessionLocal() as db:
+        return {p.id for p in await backend.search(db, query, 1000)}
+
+
+async def test_question_without_property_words_matches_nothing(client, backend):
+    ids = await add_properties(client, f"Faq{uuid.uuid4().hex[:8]}")
+    found = await search(backend, "What's the cancellation policy?")
+    assert not found & set(ids.values())
+
+
+async def test_extra_words_narrow_the_results(client, backend):
+    marker = f"Narrow{uuid.uuid4().hex[:8]}"
+    ids = await add_properties(client, marker)
+    assert await search(backend, marker) == set(ids.values())
+    assert await search(backend, f"{marker} pool") == {ids["Beach Villa"], ids["Hill Lodge"]}
+    assert await search(backend, f"private pool on {marker}") == {ids["Beach Villa"]}
+
+
+async def test_any_term_matches_when_no_property_has_them_all(client, backend):
+    marker = f"Either{uuid.uuid4().hex[:8]}"
+    ids = await add_properties(client, marker)
+    assert await search(backend, f"{marker} castle") == set(ids.values())
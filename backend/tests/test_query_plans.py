@@ -0,0 +1,270 @@
+import json
+import re
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Iterator, List, NamedTuple
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.instrumentation import current_request
+from app.db.database import SessionLocal, async_engine, engine
+from app.services.escalations import escalation_queue
+from conftest import add_escalation, create_booking, create_room, register, user_headers
+
+pytestmark = pytest.mark.anyio
+
+# Every statement the API emits while serving a request is EXPLAINed. None
+# of them may read a whole table, and each index a test names must answer one
+# of them, without a separate sort step unless the test says the rows are
+# reordered anyway.
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\S+)$")
+RECORDED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+class Statement(NamedTuple):
+    route: str
+    bind: Engine
+    sql: str
+    parameters: Any
+
+
+@contextmanager
+def recording() -> Iterator[List[Statement]]:
+    statements: List[Statement] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(RECORDED):
+            return
+        stats = current_request.get()
+        route = stats.route if stats is not None else "background"
+        statements.append(Statement(route, conn.engine, statement, parameters))
+
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", record)
+
+
+def _postgres_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _postgres_nodes(child)
+
+
+def explain(conn: Connection, statement: Statement) -> List[str]:
+    if conn.dialect.name == "postgresql":
+        # Empty test tables make sequential scans look cheapest; disabling
+        # them shows which index the planner would pick once the table grows.
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement.sql}", statement.parameters).scalar()
+        plan = raw if isinstance(raw, list) else json.loads(raw)
+        return [
+            " ".join(filter(None, [node["Node Type"], node.get("Index Name"), node.get("Relation Name")]))
+            for node in _postgres_nodes(plan[0]["Plan"])
+        ]
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement.sql}", statement.parameters)]
+
+
+def full_scan(plan: List[str]) -> str:
+    return next((line for line in plan if line.startswith("Seq Scan") or SQLITE_FULL_SCAN.match(line)), "")
+
+
+def sorts(plan: List[str]) -> bool:
+    return any(line.startswith(("Sort", "Incremental Sort")) or "TEMP B-TREE" in line for line in plan)
+
+
+async def plan_of(statement: Statement) -> List[str]:
+    # Explained on the engine (and so the driver and parameter style) that
+    # issued the statement.
+    if statement.bind is engine:
+        with engine.connect() as conn:
+            return explain(conn, statement)
+    async with async_engine.connect() as conn:
+        return await conn.run_sync(explain, statement)
+
+
+async def assert_indexed(statements: List[Statement], *indexes: str, ordered: bool = True) -> None:
+    assert statements, "nothing was recorded"
+    plans = [(statement, await plan_of(statement)) for statement in statements]
+    scans = [
+        f"{statement.route}: {scan}\n    {' '.join(statement.sql.split())}"
+        for statement, plan in plans
+        if (scan := full_scan(plan))
+    ]
+    assert not scans, "\n".join(scans)
+    for index in indexes:
+        using = [(statement, plan) for statement, plan in plans if any(index in line for line in plan)]
+        assert using, f"no statement used {index}:\n" + "\n".join(
+            f"{statement.route}: {' '.join(statement.sql.split())}\n    {plan}" for statement, plan in plans
+        )
+        assert not ordered or not any(sorts(plan) for _, plan in using), f"{index} is read and then sorted: {using}"
+
+
+async def test_login(client):
+    user = await register(client)
+    with recording() as statements:
+        response = await client.post("/api/auth/login", json={"email": user["email"], "password": "test-password"})
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_users_email")
+
+
+async def test_users_page(client):
+    admin = await user_headers(client, "admin")
+    with recording() as statements:
+        response = await client.get("/api/users/", headers=admin)
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_users_created_at_id")
+
+
+async def test_properties_page(client):
+    admin = await user_headers(client, "admin")
+    # Creating a property also invalidates any cached page.
+    await create_room(client, admin)
+    with recording() as statements:
+        response = await client.get("/api/properties/")
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_properties_created_at_id")
+
+
+async def test_rooms(client):
+    room = await create_room(client, await user_headers(client, "admin"))
+    with recording() as statements:
+        response = await client.get(f"/api/properties/{room['property_id']}/rooms")
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_rooms_property_id")
+
+
+async def test_documents_page(client):
+    admin = await user_headers(client, "admin")
+    response = await client.post("/api/documents/", json={"title": "Pets", "content": "Pets are welcome."}, headers=admin)
+    assert response.status_code == 200, response.text
+    with recording() as statements:
+        response = await client.get("/api/documents/")
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_documents_created_at_id")
+
+
+@pytest.mark.parametrize("role, index", [
+    ("admin", "ix_bookings_created_at_id"),
+    ("traveler", "ix_bookings_user_created_at_id"),
+    ("property_sales", "ix_bookings_created_at_id"),
+])
+async def test_bookings_page(client, role, index):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    await create_booking(client, traveler, room, date(2031, 1, 1))
+    headers = traveler if role == "traveler" else await user_headers(client, role)
+    with recording() as statements:
+        response = await client.get("/api/bookings/", headers=headers)
+    assert response.status_code == 200
+    await assert_indexed(statements, index)
+
+
+async def test_create_booking(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    with recording() as statements:
+        await create_booking(client, traveler, room, date(2031, 2, 1))
+    await assert_indexed(statements, "ix_bookings_room_dates")
+
+
+async def test_availability(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    await create_booking(client, traveler, room, date(2031, 3, 1))
+    with recording() as statements:
+        response = await client.get(
+            f"/api/properties/{room['property_id']}/availability",
+            params={"check_in": "2031-03-02", "check_out": "2031-03-05"},
+        )
+    assert response.status_code == 200
+    # Free rooms are listed by rate, not in booking order.
+    await assert_indexed(statements, "ix_bookings_room_dates", ordered=False)
+
+
+async def test_transitions(client):
+    traveler = await user_headers(client)
+    room = await create_room(client, await user_headers(client, "admin"))
+    booking = await create_booking(client, traveler, room, date(2031, 4, 1))
+    with recording() as statements:
+        response = await client.get(f"/api/bookings/{booking['id']}/transitions", headers=traveler)
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_booking_transitions_booking_created_at_id")
+
+
+async def test_complete_bookings(client):
+    admin = await user_headers(client, "admin")
+    traveler = await user_headers(client)
+    room = await create_room(client, admin)
+    booking = await create_booking(client, traveler, room, date(2020, 1, 1))
+    response = await client.put(f"/api/bookings/{booking['id']}/confirm", headers=admin)
+    assert response.status_code == 200, response.text
+    with recording() as statements:
+        response = await client.post("/api/bookings/complete", headers=admin)
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_bookings_status_check_out")
+
+
+async def test_conversation_messages(client):
+    traveler = await user_headers(client)
+    conversation_id = str(uuid.uuid4())
+    response = await client.post("/api/chat", json={"message": "Hello", "conversation_id": conversation_id}, headers=traveler)
+    assert response.status_code == 200, response.text
+    with recording() as statements:
+        response = await client.get(f"/api/messages/conversations/{conversation_id}", headers=traveler)
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_messages_conversation_created_at_id")
+
+
+async def test_chat_loads_context_from_messages(client):
+    # A conversation without a stored context row is rebuilt from its
+    # latest messages.
+    traveler = await user_headers(client)
+    with recording() as statements:
+        response = await client.post(
+            "/api/chat", json={"message": "Do you allow pets?", "conversation_id": str(uuid.uuid4())}, headers=traveler
+        )
+    assert response.status_code == 200, response.text
+    await assert_indexed(statements, "ix_messages_conversation_created_at_id")
+
+
+async def test_escalations_page(client):
+    add_escalation()
+    admin = await user_headers(client, "admin")
+    with recording() as statements:
+        response = await client.get("/api/messages/escalations", headers=admin)
+    assert response.status_code == 200
+    await assert_indexed(statements, "ix_messages_escalations_created_at_id")
+
+
+async def test_escalation_queue_rebuild():
+    message_id = add_escalation()
+    db = SessionLocal()
+    try:
+        with recording() as statements:
+            escalation_queue.rebuild(db)
+    finally:
+        db.close()
+    assert escalation_queue.get(message_id).content == "I need a refund"
+    await assert_indexed(statements, "ix_messages_escalations_created_at_id", "ix_messages_conversation_created_at_id")
+
+
+async def test_room_analytics(client):
+    admin = await user_headers(client, "admin")
+    room = await create_room(client, admin)
+    await create_booking(client, await user_headers(client), room, date(2031, 5, 1))
+    with recording() as statements:
+        response = await client.get(
+            f"/api/analytics/properties/{room['property_id']}/rooms",
+            params={"start": "2031-05-01", "end": "2031-05-31"}, headers=admin,
+        )
+    assert response.status_code == 200
+    # Days are summed per room, so the totals are grouped by room id.
+    await assert_indexed(statements, "ix_booking_daily_stats_property_day", ordered=False)
@@ -0,0 +1,77 @@
+import asyncio
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, client_ip, login_email_limiter, login_ip_limiter
+from conftest import register
+
+pytestmark = pytest.mark.anyio
+
+
+def request_from(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+async def test_sliding_window(client):
+    limiter = RateLimiter(f"test-{uuid.uuid4().hex[:8]}", limit=2, window=0.2)
+    assert await limiter.hit("key") is None
+    assert await limiter.hit("key") is None
+    retry_after = await limiter.hit("key")
+    assert retry_after is not None and 0 < retry_after <= 0.2
+    assert await limiter.hit("other") is None
+    await asyncio.sleep(0.25)
+    assert await limiter.hit("key") is None
+
+
+@pytest.mark.parametrize("peer, forwarded_for, expected", [
+    # Headers from a peer that is not one of our proxies are ignored.
+    ("198.51.100.7", "203.0.113.5", "198.51.100.7"),
+    ("10.0.0.2", "203.0.113.5", "203.0.113.5"),
+    # Hops the client wrote itself sit left of the one our proxy appended.
+    ("10.0.0.2", "1.2.3.4, 203.0.113.5", "203.0.113.5"),
+    ("10.0.0.2", "1.2.3.4, 203.0.113.5, 10.0.0.9", "203.0.113.5"),
+    ("10.0.0.2", "10.0.0.8", "10.0.0.8"),
+    ("10.0.0.2", None, "10.0.0.2"),
+])
+def test_client_ip(monkeypatch, peer, forwarded_for, expected):
+    monkeypatch.setattr(settings, "TRUST_PROXY_HEADERS", True)
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit.parse_networks("10.0.0.0/8"))
+    assert client_ip(request_from(peer, forwarded_for)) == expected
+
+
+def test_forwarded_for_is_ignored_unless_enabled(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit.parse_networks("10.0.0.0/8"))
+    assert client_ip(request_from("10.0.0.2", "203.0.113.5")) == "10.0.0.2"
+
+
+async def failed_login(client, email: str, forwarded_for: str = None):
+    headers = {"X-Forwarded-For": forwarded_for} if forwarded_for else {}
+    return await client.post("/api/auth/login", json={"email": email, "password": "wrong"}, headers=headers)
+
+
+async def test_login_is_limited_per_email(client, monkeypatch):
+    monkeypatch.setattr(login_email_limiter, "limit", 2)
+    user = await register(client)
+    assert (await failed_login(client, user["email"])).status_code == 401
+    assert (await failed_login(client, user["email"])).status_code == 401
+    response = await failed_login(client, user["email"])
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+async def test_login_is_limited_per_forwarded_client(client, monkeypatch):
+    # The test client connects from 127.0.0.1, a trusted proxy by default.
+    monkeypatch.setattr(settings, "TRUST_PROXY_HEADERS", True)
+    monkeypatch.setattr(login_ip_limiter, "limit", 1)
+    email = f"nobody-{uuid.uuid4().hex[:8]}@example.com"
+    address = f"203.0.113.{uuid.uuid4().int % 250 + 1}"
+    assert (await failed_login(client, email, address)).status_code == 401
+    assert (await failed_login(client, email, address)).status_code == 429
+    # A spoofed hop in front of the real one does not buy a fresh window.
+    assert (await failed_login(client, email, f"1.2.3.4, {address}")).status_code == 429
+    assert (await failed_login(client, email, "198.51.100.1")).status_code == 401
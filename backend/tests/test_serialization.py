@@ -0,0 +1,62 @@
+from datetime import date
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app.core.serialization import serialize
+from app.db.database import AsyncSessionLocal
+from app.models.user import Booking, Property, Room
+from app.schemas.schemas import BookingResponse, PropertyResponse, RoomResponse
+from conftest import create_booking, user_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def response_model_json(model, schema, ids: list) -> bytes:
+    # What the list would encode to through ORM instances and response_model.
+    async with AsyncSessionLocal() as db:
+        rows = {row.id: row for row in await db.scalars(select(model).where(model.id.in_(ids)))}
+    return serialize(TypeAdapter(List[schema]), [rows[row_id] for row_id in ids])
+
+
+async def listed(client, url: str, headers: dict = None) -> tuple:
+    response = await client.get(url, params={"limit": 20}, headers=headers or {})
+    assert response.status_code == 200, response.text
+    return response.content, [row["id"] for row in response.json()]
+
+
+async def add_catalog(client, admin: dict) -> dict:
+    response = await client.post("/api/properties/", json={
+        "name": "Raw Villa", "location": "Bali", "description": "Ünïcode \"quoted\" text",
+        "contact_email": "desk@example.com", "images": ["a.jpg", "b.jpg"], "amenities": ["pool"],
+    }, headers=admin)
+    assert response.status_code == 200, response.text
+    response = await client.post(
+        f"/api/properties/{response.json()['id']}/rooms", json={"name": "Suite", "base_rate": 123.45}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_property_and_room_lists_match_the_response_model(client):
+    room = await add_catalog(client, await user_headers(client, "admin"))
+    for url, model, schema in [
+        ("/api/properties/", Property, PropertyResponse),
+        (f"/api/properties/{room['property_id']}/rooms", Room, RoomResponse),
+    ]:
+        content, ids = await listed(client, url)
+        assert ids and room["property_id" if model is Property else "id"] == ids[0]
+        assert content == await response_model_json(model, schema, ids), url
+
+
+async def test_booking_list_matches_the_response_model(client):
+    traveler = await user_headers(client)
+    room = await add_catalog(client, await user_headers(client, "admin"))
+    await create_booking(client, traveler, room, date(2033, 1, 1), nights=3)
+    await create_booking(client, traveler, room, date(2033, 2, 1))
+
+    content, ids = await listed(client, "/api/bookings/", traveler)
+    assert len(ids) == 2
+    assert content == await response_model_json(Booking, BookingResponse, ids)
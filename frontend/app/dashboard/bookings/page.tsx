@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Link from 'next/link';
 import { useAuth } from '@/context/AuthContext';
-import { bookings } from '@/lib/api';
+import { allPages, bookings } from '@/lib/api';
 
 export default function BookingsPage() {
   const { user, loading: authLoading, logout } = useAuth();
@@ -26,8 +26,7 @@ export default function BookingsPage() {
 
   const loadBookings = async () => {
     try {
-      const res = await bookings.list();
-      setBookingsList(res.data);
+      setBookingsList(await allPages(bookings.list));
     } catch (err) {
       console.error('Error loading bookings:', err);
     } finally {
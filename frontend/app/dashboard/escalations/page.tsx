@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Link from 'next/link';
 import { useAuth } from '@/context/AuthContext';
-import { messages } from '@/lib/api';
+import { allPages, messages } from '@/lib/api';
 
 export default function EscalationsPage() {
   const { user, loading: authLoading, logout } = useAuth();
@@ -31,8 +31,7 @@ export default function EscalationsPage() {
 
   const loadEscalations = async () => {
     try {
-      const res = await messages.getEscalations();
-      setEscalations(res.data);
+      setEscalations(await allPages(messages.getEscalations));
     } catch (err) {
       console.error('Error loading escalations:', err);
     } finally {
@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Link from 'next/link';
 import { useAuth } from '@/context/AuthContext';
-import { bookings, properties } from '@/lib/api';
+import { allPages, bookings } from '@/lib/api';
 
 export default function DashboardPage() {
   const { user, loading: authLoading, logout } = useAuth();
@@ -32,14 +32,14 @@ export default function DashboardPage() {
 
   const loadData = async () => {
     try {
-      const bookingsRes = await bookings.list();
-      setRecentBookings(bookingsRes.data.slice(0, 5));
+      const allBookings = await allPages(bookings.list);
+      setRecentBookings(allBookings.slice(0, 5));
       
       const stats = {
-        total: bookingsRes.data.length,
-        pending: bookingsRes.data.filter((b: any) => b.status === 'pending').length,
-        confirmed: bookingsRes.data.filter((b: any) => b.status === 'confirmed').length,
-        completed: bookingsRes.data.filter((b: any) => b.status === 'completed').length,
+        total: allBookings.length,
+        pending: allBookings.filter((b: any) => b.status === 'pending').length,
+        confirmed: allBookings.filter((b: any) => b.status === 'confirmed').length,
+        completed: allBookings.filter((b: any) => b.status === 'completed').length,
       };
       setBookingStats(stats);
     } catch (err) {
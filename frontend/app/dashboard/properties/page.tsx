@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Link from 'next/link';
 import { useAuth } from '@/context/AuthContext';
-import { properties } from '@/lib/api';
+import { allPages, properties } from '@/lib/api';
 
 export default function PropertiesPage() {
   const { user, loading: authLoading, logout } = useAuth();
@@ -38,8 +38,7 @@ export default function PropertiesPage() {
 
   const loadProperties = async () => {
     try {
-      const res = await properties.list();
-      setPropertiesList(res.data);
+      setPropertiesList(await allPages(properties.list));
     } catch (err) {
       console.error('Error loading properties:', err);
     } finally {
@@ -41,9 +41,12 @@ export const auth = {
 };
 
 export const properties = {
-  list: () => api.get('/properties'),
+  list: (cursor?: string) => api.get('/properties', { params: { cursor } }),
   get: (id: string) => api.get(`/properties/${id}`),
   create: (data: any) => api.post('/properties', data),
+  // Include the `version` that was read (or send If-Match: "<version>") to get
+  // a 409 instead of overwriting a concurrent edit; without it the last write
+  // wins.
   update: (id: string, data: any) => api.put(`/properties/${id}`, data),
   delete: (id: string) => api.delete(`/properties/${id}`),
   getRooms: (id: string) => api.get(`/properties/${id}/rooms`),
@@ -51,7 +54,7 @@ export const properties = {
 };
 
 export const bookings = {
-  list: () => api.get('/bookings'),
+  list: (cursor?: string) => api.get('/bookings', { params: { cursor } }),
   get: (id: string) => api.get(`/bookings/${id}`),
   create: (data: any) => api.post('/bookings', data),
   confirm: (id: string) => api.put(`/bookings/${id}/confirm`),
@@ -62,20 +65,60 @@ export const bookings = {
 export const chat = {
   send: (message: string, conversationId: string) =>
     api.post('/chat', { message, conversation_id: conversationId }),
-  getMessages: (conversationId: string) =>
-    api.get(`/messages/conversations/${conversationId}`),
+  getMessages: (conversationId: string, cursor?: string) =>
+    api.get(`/messages/conversations/${conversationId}`, { params: { cursor } }),
 };
 
 export const messages = {
-  getEscalations: () => api.get('/messages/escalations'),
+  getEscalations: (cursor?: string) => api.get('/messages/escalations', { params: { cursor } }),
   respondEscalation: (messageId: string, data: { admin_response: string; status: string }) =>
     api.put(`/messages/escalations/${messageId}`, data),
+  getEscalationQueue: (limit?: number) => api.get('/messages/escalations/queue', { params: { limit } }),
+  claimEscalation: (messageId: string) => api.post(`/messages/escalations/${messageId}/claim`),
+  releaseEscalation: (messageId: string) => api.post(`/messages/escalations/${messageId}/release`),
+  // Pushes a snapshot of pending escalations, then created/claimed/released/
+  // resolved events, so dashboards no longer need to poll.
+  escalationFeed: (token: string) =>
+    new WebSocket(`${API_URL.replace(/^http/, 'ws')}/messages/escalations/ws?token=${encodeURIComponent(token)}`),
 };
 
 export const documents = {
-  list: () => api.get('/documents'),
+  list: (cursor?: string) => api.get('/documents', { params: { cursor } }),
   create: (data: any) => api.post('/documents', data),
   delete: (id: string) => api.delete(`/documents/${id}`),
 };
 
+// Precomputed per-day rollups; dates are YYYY-MM-DD and default to the last
+// 30 days.
+type DateRange = { start?: string; end?: string };
+
+export const analytics = {
+  daily: (params: DateRange & { property_id?: string; room_id?: string } = {}) =>
+    api.get('/analytics/daily', { params }),
+  properties: (params: DateRange = {}) => api.get('/analytics/properties', { params }),
+  rooms: (propertyId: string, params: DateRange = {}) =>
+    api.get(`/analytics/properties/${propertyId}/rooms`, { params }),
+  rebuild: () => api.post('/analytics/rebuild'),
+};
+
+// List endpoints are keyset-paginated; the next page's cursor comes back in
+// the X-Next-Cursor response header and is absent on the last page.
+export const nextCursor = (response: { headers: Record<string, any> }): string | undefined =>
+  response.headers['x-next-cursor'] || undefined;
+
+// Follows X-Next-Cursor until the last page and returns every row, for views
+// that show or count a whole list.
+export const allPages = async <T = any>(
+  fetchPage: (cursor?: string) => Promise<{ data: T[]; headers: Record<string, any> }>
+): Promise<T[]> => {
+  const rows: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await fetchPage(cursor);
+    rows.push(...res.data);
+    cursor = nextCursor(res);
+  } while (cursor);
+  return rows;
+};
+
 export default api;